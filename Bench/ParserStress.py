@@ -0,0 +1,125 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# Стресс-тест парсеров на зашумлённой линии:
+#   python Bench/ParserStress.py [количество блоков] [seed] [скорость порта]
+import os
+import sys
+import json
+import random
+import time
+from typing import List, Tuple, Callable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Parser import Parser, PARSER_CLASSES
+
+DEFAULT_COUNT = 20000
+DEFAULT_SEED = 1
+DEFAULT_BAUDRATE = 9600
+BITS_PER_BYTE = 10
+
+
+def MakeFrame(Random: random.Random) -> Tuple[bytes, dict]:
+	obj = {
+		'CMDType': 1,
+		'Side': Random.randint(1, 4),
+		'Nozzle': Random.randint(1, 6),
+		'Price': round(Random.uniform(40, 80), 2),
+		'Quantity': round(Random.uniform(0, 100), 2),
+		'Amount': round(Random.uniform(0, 8000), 2)
+	}
+	return json.dumps(obj).encode(), obj
+
+
+def Garbage(Random: random.Random, Size: int) -> bytes:
+	return bytes(Random.getrandbits(8) for i in range(Size))
+
+
+# каждая мутация возвращает блок, ожидаемые кадры и смещение первого целого кадра после порчи
+def Clean(Random: random.Random):
+	Data, obj = MakeFrame(Random)
+	return Data, [obj], 0
+
+
+def BitFlip(Random: random.Random):
+	Data, obj = MakeFrame(Random)
+	Data = bytearray(Data)
+	Bit = Random.randrange(len(Data) * 8)
+	Data[Bit // 8] ^= 1 << (Bit % 8)
+	Next, NextObj = MakeFrame(Random)
+	return bytes(Data) + Next, [NextObj], len(Data)
+
+
+def Truncate(Random: random.Random):
+	Data, obj = MakeFrame(Random)
+	Next, NextObj = MakeFrame(Random)
+	Data = Data[:Random.randrange(1, len(Data))]
+	return Data + Next, [NextObj], len(Data)
+
+
+def GarbageBurst(Random: random.Random):
+	Burst = Garbage(Random, Random.randint(1, 64))
+	Data, obj = MakeFrame(Random)
+	return Burst + Data, [obj], len(Burst)
+
+
+def Concatenated(Random: random.Random):
+	Frames = [MakeFrame(Random) for i in range(Random.randint(2, 4))]
+	return b''.join(Data for Data, obj in Frames), [obj for Data, obj in Frames], 0
+
+
+MUTATIONS: List[Callable] = [Clean, BitFlip, Truncate, GarbageBurst, Concatenated]
+
+
+def Run(ParserObj: Parser, Method: str, Samples: list, Baudrate: int) -> dict:
+	Parse = getattr(ParserObj, Method)
+	Recovered = 0
+	Expected = 0
+	FalseAccepts = 0
+	ResyncBytes = []
+	Started = time.perf_counter()
+	for Data, Objects, Offset in Samples:
+		if Method == 'Parse':
+			Command = Parse(bytearray(Data))
+			Commands = [Command] if Command else []
+		else:
+			Commands = Parse(bytearray(Data))
+		Expected += len(Objects)
+		for Command in Commands:
+			if Command.Params in Objects:
+				Recovered += 1
+			else:
+				FalseAccepts += 1
+		if Offset and Commands and Commands[-1].Params == Objects[-1]:
+			ResyncBytes.append(Offset)
+	Elapsed = time.perf_counter() - Started
+	MeanResync = sum(ResyncBytes) / len(ResyncBytes) if ResyncBytes else 0
+	return {
+		'Recovered': Recovered,
+		'Expected': Expected,
+		'FalseAccepts': FalseAccepts,
+		'FramesPerSecond': Recovered / Elapsed if Elapsed else 0,
+		'Resynced': len(ResyncBytes),
+		'ResyncBytes': MeanResync,
+		'ResyncMs': MeanResync * BITS_PER_BYTE * 1000 / Baudrate
+	}
+
+
+def main():
+	Count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_COUNT
+	Seed = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_SEED
+	Baudrate = int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_BAUDRATE
+	print('%-12s %-14s %-12s %9s %9s %7s %12s %8s %10s %9s' % (
+		'Parser', 'Mutation', 'Method', 'Recovered', 'Expected', 'False', 'Frames/s', 'Resynced', 'SkipBytes', 'Resync ms'))
+	for cls in PARSER_CLASSES:
+		ParserObj = cls()
+		for Mutation in MUTATIONS:
+			Random = random.Random(Seed)
+			Samples = [Mutation(Random) for i in range(Count)]
+			for Method in ['Parse', 'ParseFrames']:
+				res = Run(ParserObj, Method, Samples, Baudrate)
+				print('%-12s %-14s %-12s %9d %9d %7d %12.0f %8d %10.1f %9.1f' % (
+					cls.__name__, Mutation.__name__, Method, res['Recovered'], res['Expected'], res['FalseAccepts'],
+					res['FramesPerSecond'], res['Resynced'], res['ResyncBytes'], res['ResyncMs']))
+
+
+if __name__ == '__main__':
+	main()
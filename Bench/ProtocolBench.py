@@ -0,0 +1,114 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# Проверка и замер примитивов протоколов (контрольные суммы, кадры, стаффинг, BCD):
+#   python Bench/ProtocolBench.py [повторов] [seed]
+import os
+import sys
+import random
+import timeit
+from typing import Callable, List, Tuple
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Protocol import CRC_MODELS, CRC16_MODBUS, CRC, LRC, XorSum, FindFrames, FindDLEFrames, DLEPayload, Destuff, \
+	BCDToInt, BCDToFloat, IntToBCD, STX, ETX, DLE
+
+DEFAULT_NUMBER = 2000
+DEFAULT_SEED = 1
+SIZES = [32, 256]
+CHECK_DATA = b'123456789'
+
+
+def Check() -> List[str]:
+	Errors = []
+	for Model in CRC_MODELS:
+		for Data in [CHECK_DATA, bytearray(CHECK_DATA), memoryview(b'#' + CHECK_DATA + b'#')[1:-1]]:
+			Value = CRC(Model, Data)
+			if Value != Model.Check:
+				Errors.append('%s: %04X вместо %04X (%s)' % (Model.Name, Value, Model.Check, type(Data).__name__))
+	if LRC(b'\x01\x02\xFD') != 0 or XorSum(b'\x0F\xF0\xFF') != 0:
+		Errors.append('LRC/XOR')
+	Frames, Consumed = FindFrames(b'\xAA\x02ab\x03\x11\x02cd\x03\x22\x02e', 1)
+	if [bytes(Frame) for Frame in Frames] != [b'\x02ab\x03\x11', b'\x02cd\x03\x22'] or Consumed != 11:
+		Errors.append('FindFrames: %s %d' % (Frames, Consumed))
+	# кадр с потерянным ETX не должен поглощать следующий целый кадр
+	Frames, Consumed = FindFrames(b'\x02junk\x02GOOD\x03\xAA', 1)
+	if [bytes(Frame) for Frame in Frames] != [b'\x02GOOD\x03\xAA'] or Consumed != 12:
+		Errors.append('FindFrames resync: %s %d' % ([bytes(Frame) for Frame in Frames], Consumed))
+	Frames, Consumed = FindDLEFrames(b'\x10\x02a\x10\x10b\x10\x03\x10\x02c')
+	if [bytes(Destuff(DLEPayload(Frame))) for Frame in Frames] != [b'a\x10b'] or Consumed != 8:
+		Errors.append('FindDLEFrames: %s %d' % (Frames, Consumed))
+	if BCDToInt(b'\x12\x34\x56') != 123456 or BCDToFloat(IntToBCD(4599, 3), 2) != 45.99:
+		Errors.append('BCD')
+	try:
+		BCDToInt(b'\x1A')
+		Errors.append('BCD: нет ошибки на 1A')
+	except ValueError:
+		pass
+	return Errors
+
+
+def MakePayload(Random: random.Random, Size: int, Excluded: bytes) -> bytes:
+	return bytes(Random.choice([Byte for Byte in range(256) if Byte not in Excluded]) for i in range(Size))
+
+
+def MakeDLEPayload(Random: random.Random, Size: int) -> bytes:
+	# около 1/16 байт данных требуют стаффинга, как в цифровых значениях с DLE
+	return bytes(DLE if Random.random() < 1 / 16 else Random.randrange(256) for i in range(Size))
+
+
+def Stuff(Data: bytes) -> bytes:
+	return Data.replace(bytes([DLE]), bytes([DLE, DLE]))
+
+
+#данные каждого замера лежат внутри большего буфера, как кадр внутри принятого блока:
+#примитив получает срез memoryview, а для сравнения - копию среза в bytes
+def Slice(Data: bytes) -> memoryview:
+	return memoryview(b'\xFF' * 8 + Data + b'\xFF' * 8)[8:-8]
+
+
+def MakeCases(Random: random.Random, Size: int) -> List[Tuple[str, Callable, memoryview]]:
+	Payload = Slice(MakePayload(Random, Size, bytes([STX, ETX])))
+	# блок из нескольких кадров с CRC-16 и началом следующего, как приходит из порта за один вызов read
+	Block = bytearray()
+	for i in range(4):
+		Frame = bytes([STX]) + MakePayload(Random, Size, bytes([STX, ETX])) + bytes([ETX])
+		Block += Frame + CRC(CRC16_MODBUS, Frame).to_bytes(2, 'little')
+	Block += bytes([STX]) + bytes(Payload[:Size // 2])
+	DLEBlock = bytes([DLE, STX]) + Stuff(MakeDLEPayload(Random, Size)) + bytes([DLE, ETX])
+	Cases = [(Model.Name, lambda Data, Model=Model: CRC(Model, Data), Payload) for Model in CRC_MODELS]
+	Cases += [
+		('LRC', LRC, Payload),
+		('XorSum', XorSum, Payload),
+		('FindFrames x4', lambda Data: FindFrames(Data, 2), Slice(bytes(Block))),
+		('FindDLEFrames', FindDLEFrames, Slice(DLEBlock)),
+		('Destuff', Destuff, DLEPayload(memoryview(DLEBlock))),
+		('Destuff clean', Destuff, Slice(MakePayload(Random, Size, bytes([DLE])))),
+		('BCDToInt', BCDToInt, Slice(IntToBCD(Random.randrange(10 ** (Size * 2)), Size)))
+	]
+	return Cases
+
+
+def Measure(Function: Callable, Number: int) -> float:
+	return min(timeit.repeat(Function, number=Number, repeat=5)) / Number * 1e9
+
+
+def main():
+	Number = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_NUMBER
+	Seed = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_SEED
+	Errors = Check()
+	for Error in Errors:
+		print('Ошибка:', Error)
+	if Errors:
+		sys.exit(1)
+	print('Контрольные значения совпали: %s' % ', '.join(Model.Name for Model in CRC_MODELS))
+	Random = random.Random(Seed)
+	# copy ns - тот же вызов с копией среза в bytes
+	print('%-20s %6s %12s %10s %12s' % ('Primitive', 'Size', 'ns/call', 'MB/s', 'copy ns'))
+	for Size in SIZES:
+		for Name, Function, Data in MakeCases(Random, Size):
+			Time = Measure(lambda: Function(Data), Number)
+			Copy = Measure(lambda: Function(bytes(Data)), Number)
+			print('%-20s %6d %12.0f %10.1f %12.0f' % (Name, len(Data), Time, len(Data) / Time * 1e3, Copy))
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,133 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+# Замер отрисовки дисплея без экрана:
+#   python Bench/RenderBench.py [секунд на частоту]
+import os
+import sys
+import time
+import random
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from PyQt5.QtWidgets import QApplication, QWidget, QLineEdit, QGridLayout
+from PyQt5.QtCore import QTimer, QEventLoop
+from Display import GasStationDisplay, path
+
+GEOMETRIES = [(480, 160), (800, 240), (1280, 400), (1920, 600)]
+RATES = [10, 50, 200]
+DEFAULT_DURATION = 2
+REPEATS = 20
+
+
+class BenchDisplay(GasStationDisplay):
+
+	def onSettings(self):
+		pass
+
+
+class PaintMeter():
+
+	def __init__(self, Edits):
+		self.Times = []
+		for Edit in Edits:
+			self.Hook(Edit)
+
+	def Hook(self, Edit: QLineEdit):
+		def paintEvent(event):
+			Started = time.perf_counter()
+			QLineEdit.paintEvent(Edit, event)
+			self.Times.append(time.perf_counter() - Started)
+		Edit.paintEvent = paintEvent
+
+
+def Mean(Values) -> float:
+	return sum(Values) / len(Values) if Values else 0
+
+
+def Wait(app: QApplication, Seconds: float):
+	Loop = QEventLoop()
+	QTimer.singleShot(int(Seconds * 1000), Loop.quit)
+	Loop.exec_()
+
+
+def Timed(Function, Repeats: int = REPEATS) -> float:
+	Started = time.perf_counter()
+	for i in range(Repeats):
+		Function(i)
+		QApplication.processEvents()
+	return (time.perf_counter() - Started) / Repeats
+
+
+def DriveUpdates(app: QApplication, Display: GasStationDisplay, Meter: PaintMeter, Rate: int, Duration: float) -> dict:
+	Meter.Times = []
+	Random = random.Random(Rate)
+	Period = 1 / Rate
+	Lateness = []
+	Ticks = [time.perf_counter()]
+
+	def onTimeout():
+		Now = time.perf_counter()
+		Lateness.append(max(Now - Ticks[-1] - Period, 0))
+		Ticks.append(Now)
+		Display.EditPrice.setText(Display.FormatPrice.GetValue() % Random.uniform(40, 80))
+		Display.EditVolume.setText(Display.FormatVolume.GetValue() % Random.uniform(0, 100))
+		Display.EditAmount.setText(Display.FormatAmount.GetValue() % Random.uniform(0, 8000))
+
+	Timer = QTimer()
+	Timer.timeout.connect(onTimeout)
+	CPUStarted = time.process_time()
+	Ticks[0] = time.perf_counter()
+	Timer.start(int(Period * 1000))
+	Wait(app, Duration)
+	Timer.stop()
+	CPU = time.process_time() - CPUStarted
+	Updates = max(len(Ticks) - 1, 1)
+	return {
+		'Updates': Updates,
+		'Paint': Mean(Meter.Times),
+		'Paints': len(Meter.Times),
+		'Lateness': Mean(Lateness),
+		'CPU': CPU / Updates
+	}
+
+
+def main():
+	Duration = float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_DURATION
+	os.chdir(path)
+	app = QApplication(sys.argv)
+	Display = BenchDisplay()
+	Styles = [Style for Style in ['dark.qss', 'light.qss'] if Style in Display.Styles]
+	Images = Display.Images
+	print('%-10s %-10s %9s %6s %8s %8s %10s %11s %10s' % ('Style', 'Geometry', 'Style ms', 'Hz', 'Updates', 'Paints', 'Paint ms', 'Late ms', 'CPU ms'))
+	for Style in Styles:
+		for Width, Height in GEOMETRIES:
+			Widget = QWidget()
+			Widget.setGeometry(0, 0, Width, Height)
+			Display.InitDisplay(Widget)
+			# перехват paintEvent нужно установить до первой отрисовки виджета
+			Meter = PaintMeter([Display.EditPrice, Display.EditVolume, Display.EditAmount])
+			Widget.show()
+			QApplication.processEvents()
+			# переключение между темами, чтобы каждый раз выполнялся полный разбор и применение стилей
+			StyleTime = Timed(lambda i: Display.SetDisplayStyle(Widget, Styles[i % len(Styles)]))
+			Display.SetDisplayStyle(Widget, Style)
+			for Rate in RATES:
+				res = DriveUpdates(app, Display, Meter, Rate, Duration)
+				print('%-10s %-10s %9.2f %6d %8d %8d %10.3f %11.3f %10.3f' % (
+					Style, '%dx%d' % (Width, Height), StyleTime * 1000, Rate, res['Updates'], res['Paints'],
+					res['Paint'] * 1000, res['Lateness'] * 1000, res['CPU'] * 1000))
+			if Images:
+				LogoTime = Timed(lambda i: Display.SetLogoOnDisplay(Images[i % len(Images)]))
+				print('%-10s %-10s SetLogoOnDisplay: %.3f ms' % (Style, '%dx%d' % (Width, Height), LogoTime * 1000))
+			Widget.close()
+			Widget.deleteLater()
+	Grid = QGridLayout()
+	Display.Position.ShowOption(Grid)
+	Display.Position.SetInitDisplayFunction(Display.InitDisplay)
+	if Styles:
+		Display.Position.UpdateStyles(os.path.join(Display.DIR_STYLES, Styles[0]))
+	PreviewTime = Timed(lambda i: Display.Position.onShowDisplay(), REPEATS * 2)
+	print('WidgetPosition.onShowDisplay (show/hide): %.3f ms' % (PreviewTime * 1000))
+
+
+if __name__ == '__main__':
+	main()
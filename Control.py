@@ -0,0 +1,173 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+import os
+import stat
+import json
+import signal
+import socket
+import tempfile
+from typing import Any, Callable, Dict
+from PyQt5.QtCore import QObject, QSocketNotifier
+
+
+DEFAULT_CONTROL_ADDRESS = os.path.join(tempfile.gettempdir(), 'GasStationDisplay.control')
+CONTROL_STATUS = 'Status'
+CONTROL_CHANGED = 'Changed'
+CONTROL_ERRORS = 'Errors'
+CONTROL_IDLE = 'Idle'
+
+
+#запрос к каналу управления из другого процесса; None - табло не отвечает
+def ControlRequest(Address: str, Request: dict, Timeout: float = 2) -> Dict[str, Any]:
+	try:
+		with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as Socket:
+			Socket.settimeout(Timeout)
+			Socket.connect(Address)
+			Socket.sendall(json.dumps(Request, ensure_ascii=False).encode() + b'\n')
+			Response = bytearray()
+			while b'\n' not in Response:
+				Data = Socket.recv(4096)
+				if not Data:
+					break
+				Response += Data
+		return json.loads(Response.partition(b'\n')[0])
+	except (OSError, ValueError):
+		return None
+
+
+#обработчики сигналов python выполняются только когда работает код python; пока цикл событий Qt спит в C,
+#например в режиме ожидания табло без таймеров, SIGTERM и SIGUSR1 ждали бы следующего события.
+#сигнал пишет байт в сокет (signal.set_wakeup_fd), сокет будит цикл событий, и обработчик выполняется сразу
+class SignalNotifier(QObject):
+
+	RECV_SIZE = 64
+
+	def __init__(self, parent=None):
+		super().__init__(parent)
+		self.Read, self.Write = socket.socketpair()
+		self.Read.setblocking(False)
+		self.Write.setblocking(False)
+		signal.set_wakeup_fd(self.Write.fileno(), warn_on_full_buffer=False)
+		self.Notifier = QSocketNotifier(self.Read.fileno(), QSocketNotifier.Read, self)
+		self.Notifier.activated.connect(self.onSignal)
+
+	def onSignal(self):
+		try:
+			self.Read.recv(self.RECV_SIZE)
+		except OSError:
+			pass
+
+
+class ControlClient():
+
+	def __init__(self, Socket: socket.socket, Notifier: QSocketNotifier):
+		self.Socket = Socket
+		self.Notifier = Notifier
+		self.Input = bytearray()
+
+
+#локальный канал управления работающим табло: unix сокет, по строке JSON на запрос и на ответ.
+#запрос - объект с новыми значениями настроек, например {"CaptionPrice": "Цена"}; пустой объект - перечитать файл настроек;
+#{"Status": true} - состояние табло
+#работает в потоке Qt, поэтому обработчик может сразу менять виджеты
+class ControlServer(QObject):
+
+	BACKLOG = 4
+	RECV_SIZE = 4096
+	MAX_REQUEST = 65536
+
+	def __init__(self, Address: str, onRequest: Callable[[dict], Dict[str, Any]], parent=None):
+		super().__init__(parent)
+		self.Address = Address
+		self.onRequest = onRequest
+		self.Socket: socket.socket = None
+		self.Notifier: QSocketNotifier = None
+		self.Clients: Dict[int, ControlClient] = {}
+
+	#по адресу может остаться сокет упавшего табло; сокет, который отвечает, принадлежит другому работающему экземпляру
+	def Start(self):
+		if os.path.lexists(self.Address):
+			if not stat.S_ISSOCK(os.lstat(self.Address).st_mode):
+				raise OSError('Адрес канала управления занят файлом: %s' % self.Address)
+			with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as Socket:
+				try:
+					Socket.connect(self.Address)
+				except (ConnectionRefusedError, FileNotFoundError):
+					os.unlink(self.Address)
+				else:
+					raise OSError('Канал управления уже используется другим табло: %s' % self.Address)
+		self.Socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		self.Socket.bind(self.Address)
+		self.Socket.listen(self.BACKLOG)
+		self.Socket.setblocking(False)
+		self.Notifier = QSocketNotifier(self.Socket.fileno(), QSocketNotifier.Read, self)
+		self.Notifier.activated.connect(self.onAccept)
+
+	def Stop(self):
+		for Client in list(self.Clients.values()):
+			self.Disconnect(Client)
+		if self.Notifier:
+			self.Notifier.setEnabled(False)
+		if self.Socket:
+			self.Socket.close()
+			self.Socket = None
+			try:
+				os.unlink(self.Address)
+			except OSError:
+				pass
+
+	def onAccept(self):
+		try:
+			Socket, _ = self.Socket.accept()
+		except OSError:
+			return
+		Socket.setblocking(False)
+		Notifier = QSocketNotifier(Socket.fileno(), QSocketNotifier.Read, self)
+		Client = ControlClient(Socket, Notifier)
+		self.Clients[Socket.fileno()] = Client
+		Notifier.activated.connect(self.onReadable)
+
+	def Disconnect(self, Client: ControlClient):
+		Client.Notifier.setEnabled(False)
+		Client.Notifier.deleteLater()
+		self.Clients.pop(Client.Socket.fileno(), None)
+		Client.Socket.close()
+
+	def onReadable(self, FD: int):
+		Client = self.Clients.get(FD)
+		if not Client:
+			return
+		try:
+			Data = Client.Socket.recv(self.RECV_SIZE)
+		except BlockingIOError:
+			return
+		except OSError:
+			Data = b''
+		if not Data or len(Client.Input) + len(Data) > self.MAX_REQUEST:
+			self.Disconnect(Client)
+			return
+		Client.Input += Data
+		while b'\n' in Client.Input:
+			Line, _, Rest = bytes(Client.Input).partition(b'\n')
+			Client.Input = bytearray(Rest)
+			# клиент отключён при ответе: остальные его запросы отвечать некуда
+			if not self.Reply(Client, self.Dispatch(Line)):
+				break
+
+	def Dispatch(self, Line: bytes) -> Dict[str, Any]:
+		try:
+			Request = json.loads(Line) if Line.strip() else {}
+			if not isinstance(Request, dict):
+				raise ValueError('ожидается объект JSON')
+		except ValueError as err:
+			return {CONTROL_ERRORS: {'': str(err)}}
+		return self.onRequest(Request)
+
+	def Reply(self, Client: ControlClient, Response: Dict[str, Any]) -> bool:
+		try:
+			Client.Socket.sendall(json.dumps(Response, ensure_ascii=False).encode() + b'\n')
+			return True
+		except OSError as err:
+			print(err)
+			self.Disconnect(Client)
+			return False
@@ -2,24 +2,47 @@
 # -*- coding: utf-8 -*-
 import sys
 import os
-from typing import List, Callable, Any
+import time
+import signal
+from typing import List, Callable, Any, Dict, Tuple
+from dataclasses import dataclass
 from threading import Lock, Thread
 from PyQt5.QtWidgets import QApplication, QGridLayout, QWidget, QLabel, QPushButton, QHBoxLayout, QSizePolicy, QDialog, \
 	QVBoxLayout, QLineEdit, QGroupBox
 from PyQt5 import QtWidgets
-from PyQt5.QtGui import QResizeEvent, QMoveEvent, QPixmap
-from PyQt5.QtCore import Qt, QTimer
-from serial import Serial
+from PyQt5.QtGui import QResizeEvent, QMoveEvent
+from PyQt5.QtCore import Qt, QTimer, QFileSystemWatcher, QObject, pyqtSignal
 import serial.tools.list_ports
 from serial.serialutil import SerialBase, PARITY_EVEN, STOPBITS_ONE
 from Settings import WidgetPosition, ComboBoxValue, ComboBoxOption, StrOption, ErrorDescription, \
-	ErrorDescriptionSuccess, Option
+	ErrorDescriptionSuccess, Option, OptionsValidator
 from lib import LoadJSON, UpdateJSON
-from Parser import JSONParser, BenchParser, Parser, GasStationCommand
+from Parser import Parser, GasStationCommand, PARSER_CLASSES
+from Input import InputSource, InputFrame, SerialInput, INPUT_CLASSES, CheckHostPort
+from Publisher import StatePublisher, StateSubscriber
+from Trace import FrameTrace, TraceRecorder
+from Resources import LoadStyle, LoadPixmap
+from DisplayView import DisplayView
+from Control import ControlServer, SignalNotifier, DEFAULT_CONTROL_ADDRESS, CONTROL_STATUS, CONTROL_CHANGED, CONTROL_ERRORS, CONTROL_IDLE
 
 
 path, _ = os.path.split(os.path.abspath(__file__))
-os.chdir(path)
+
+
+#новый источник данных, подготовленный для подмены в рабочем потоке; Input = None - меняется только протокол
+@dataclass
+class InputSwap():
+	Input: InputSource
+	ParserObj: Parser
+	Key: Tuple
+	# тот же порт или адрес дважды не открыть: рабочий поток закрывает старый источник и открывает новый сам
+	Reopen: bool = False
+
+
+#будит табло из рабочего потока: сигнал доставляется в поток Qt через очередь событий
+class DisplayWaker(QObject):
+
+	Wake = pyqtSignal()
 
 
 class GasStationDisplay():
@@ -27,7 +50,9 @@ class GasStationDisplay():
 	SETTINGS_TITLE = 'Display'
 	ON_RUN = 'run'
 	ON_SETTINGS = 'settings'
+	ON_SUBSCRIBE = 'subscribe'
 	SETTINGS_FILE_NAME = os.path.join(path, 'GasStationDisplay.json')
+	TRACE_FILE_NAME = os.path.join(path, 'GasStationDisplay.trace')
 	DIR_IMAGES = os.path.join(path, 'Images')
 	DIR_STYLES = os.path.join(path, 'QSS')
 	ID_BAUDRATE = 'baudrate'
@@ -36,6 +61,15 @@ class GasStationDisplay():
 	ID_STOPBIT = 'stopbit'
 	ID_COM_PORT = 'COMPort'
 	ID_PARSER = 'Parser'
+	ID_INPUT = 'Input'
+	ID_INPUT_ADDRESS = 'InputAddress'
+	ID_PUBLISH_ADDRESS = 'PublishAddress'
+	ID_SUBSCRIBE_ADDRESS = 'SubscribeAddress'
+	ID_CONTROL_ADDRESS = 'ControlAddress'
+	ID_IDLE_TIMEOUT = 'IdleTimeout'
+	ID_IDLE_OPACITY = 'IdleOpacity'
+	ID_AUTO_FIT = 'AutoFit'
+	ID_FIT_MAX_VALUES = 'FitMaxValues'
 	ID_POSITION = 'DisplayPosition'
 	ID_CAPTION_PRICE = 'CaptionPrice'
 	ID_CAPTION_VOLUME = 'CaptionVolume'
@@ -51,6 +85,16 @@ class GasStationDisplay():
 	DEFAULT_BYTESIZE = 8
 	DEFAULT_PARITY = PARITY_EVEN
 	DEFAULT_STOPBIT = STOPBITS_ONE
+	DEFAULT_INPUT_ADDRESS = ''
+	DEFAULT_PUBLISH_ADDRESS = ''
+	DEFAULT_SUBSCRIBE_ADDRESS = '127.0.0.1:5700'
+	# секунды без изменения показаний до перехода в режим ожидания; 0 - не переходить
+	DEFAULT_IDLE_TIMEOUT = 60
+	# прозрачность окна в режиме ожидания; 1 - не затемнять
+	DEFAULT_IDLE_OPACITY = 1.0
+	DEFAULT_AUTO_FIT = True
+	# наибольшие ожидаемые цена, объём и сумма: по ним подбирается размер шрифта полей
+	DEFAULT_FIT_MAX_VALUES = [999.99, 9999.99, 999999.99]
 	GB_CAPTION_COMPORT = 'Настройки порта'
 	GB_CAPTION_POSITION = 'Положение дисплея'
 	GB_CAPTION_FORMAT = 'Формат значений'
@@ -71,27 +115,22 @@ class GasStationDisplay():
 	}
 	SETTINGS_WINDOW_CONSTRAINTS = {
 		WidgetPosition.POSITION_WIDTH: 720,
-		WidgetPosition.POSITION_HEIGHT: 300
+		WidgetPosition.POSITION_HEIGHT: 360
 	}
-	OBJECT_NAME_LABEL_PRICE = 'ONLabelPrice'
-	OBJECT_NAME_EDIT_PRICE = 'ONEditPrice'
-	OBJECT_NAME_LABEL_LOGO = 'ONLabelLogo'
-	OBJECT_NAME_LABEL_AMOUNT = 'ONLabelAmount'
-	OBJECT_NAME_EDIT_AMOUNT = 'ONEditAmount'
-	OBJECT_NAME_LABEL_VOLUME = 'ONLabelVolume'
-	OBJECT_NAME_EDIT_VOLUME = 'ONEditVolume'
-	OBJECT_NAME_DISPLAY = 'ONDisplay'
 	TIMEOUNT_COM_PORT = 0.1
 	UPDATE_PERIOD = 250
+	# файл настроек пишется по одной опции за раз: перечитываем, когда записи затихли
+	RELOAD_DELAY = 300
+	RECONNECT_PERIOD = 1
+	INPUT_IDS = [ID_INPUT, ID_INPUT_ADDRESS, ID_COM_PORT, ID_BAUDRATE, ID_BYTESIZE, ID_PARITY, ID_STOPBIT]
+	DATA_FIELDS = [Parser.DATA_PRICE, Parser.DATA_VOLUME, Parser.DATA_AMOUNT]
 
 	def GetDefault(self, ID: str, DefaultValue: Any) -> Any:
 		return self.Settings[ID] if ID in self.Settings else DefaultValue
 
 	def onOptionChanged(self, Value: Any):
-		for option in self.Options:
-			if option.Check() != ErrorDescriptionSuccess:
-				return
-		self.BSave.setEnabled(True)
+		if self.BSave and self.Validation.IsValid():
+			self.BSave.setEnabled(True)
 
 	def onChangeParser(self, ParserID: str):
 		self.onOptionChanged(ParserID)
@@ -105,6 +144,30 @@ class GasStationDisplay():
 
 		return Check
 
+	def GetInputClass(self) -> InputSource:
+		InputIDS = [cls.GetID() for cls in self.InputClasses]
+		if self.InputType.GetValue() not in InputIDS:
+			return None
+		return self.InputClasses[InputIDS.index(self.InputType.GetValue())]
+
+	def IsSerialInput(self) -> bool:
+		return self.GetInputClass() == SerialInput
+
+	def CheckCOMPort(self, Value: Any) -> ErrorDescription:
+		if not self.IsSerialInput():
+			return ErrorDescriptionSuccess
+		return self.CheckRequaredOption('COM порт')(Value)
+
+	def CheckInputAddress(self, Value: str) -> ErrorDescription:
+		if self.IsSerialInput() or self.GetInputClass() is None:
+			return ErrorDescriptionSuccess
+		if not self.GetInputClass().CheckAddress(Value):
+			return ErrorDescription(ErrorCode=1, ErrorMessage='Неверный адрес (%s) для "%s".' % (Value, self.GetInputClass().GetName()))
+		return ErrorDescriptionSuccess
+
+	def onChangeInput(self, InputID: str):
+		self.onOptionChanged(InputID)
+
 	def GetCOMPortNames(self) -> List[str]:
 		return [port.device for port in serial.tools.list_ports.comports()]
 
@@ -114,7 +177,9 @@ class GasStationDisplay():
 		if not os.path.isdir(self.DIR_IMAGES):
 			os.mkdir(self.DIR_IMAGES)
 		self.Settings = LoadJSON(self.SETTINGS_FILE_NAME)
-		self.Logo: QLabel = None
+		self.View: DisplayView = None
+		self.Preview: DisplayView = None
+		self.BSave: QPushButton = None
 		if self.ID_POSITION not in self.Settings:
 			self.Settings[self.ID_POSITION] = self.DEFAULT_DISPLAY_POSITION
 		if self.SETTINGS_POSITION not in self.Settings:
@@ -132,6 +197,9 @@ class GasStationDisplay():
 		ParserIDS = [cls.GetID() for cls in self.ParserClasses]
 		if self.ID_PARSER in self.Settings and self.Settings[self.ID_PARSER] in ParserIDS:
 			ParserIndex = ParserIDS.index(self.Settings[self.ID_PARSER])
+		InputIDS = [cls.GetID() for cls in self.InputClasses]
+		InputIndex = InputIDS.index(self.GetDefault(self.ID_INPUT, SerialInput.GetID())) \
+			if self.GetDefault(self.ID_INPUT, SerialInput.GetID()) in InputIDS else -1
 		self.Images = self.GetFiles(self.DIR_IMAGES, self.EXTENSIONS_IMAGES)
 		ImageIndex = -1
 		if self.ID_IMAGE in self.Settings and self.Settings[self.ID_IMAGE] in self.Images:
@@ -140,13 +208,28 @@ class GasStationDisplay():
 		StyleIndex = -1
 		if self.ID_STYLE in self.Settings and self.Settings[self.ID_STYLE] in self.Styles:
 			StyleIndex = self.Styles.index(self.Settings[self.ID_STYLE])
+		self.InputType = ComboBoxOption(
+			ID=self.ID_INPUT,
+			Caption='Источник',
+			Values=[ComboBoxValue(Value=cls.GetID(), Name=cls.GetName()) for cls in self.InputClasses],
+			onChanged=self.onChangeInput,
+			DefaultIndex=InputIndex,
+			Validators=[self.CheckRequaredOption('Источник')]
+		)
+		self.InputAddress = StrOption(
+			ID=self.ID_INPUT_ADDRESS,
+			Caption='Адрес',
+			Value=self.GetDefault(self.ID_INPUT_ADDRESS, self.DEFAULT_INPUT_ADDRESS),
+			onChanged=self.onOptionChanged,
+			Validators=[self.CheckInputAddress]
+		)
 		self.COMPort = ComboBoxOption(
 			ID=self.ID_COM_PORT,
 			Caption='COM порт',
 			Values=[ComboBoxValue(Value=port) for port in COMPorts],
 			onChanged=self.onOptionChanged,
 			DefaultIndex=COMPortIndex,
-			Validators=[self.CheckRequaredOption('COM порт')]
+			Validators=[self.CheckCOMPort]
 		)
 		self.BaudRate = ComboBoxOption(
 			ID=self.ID_BAUDRATE,
@@ -194,39 +277,39 @@ class GasStationDisplay():
 			ID=self.ID_CAPTION_PRICE,
 			Caption='Надпись, цена',
 			Value=self.GetDefault(self.ID_CAPTION_PRICE, self.DEFAULT_CAPTION_PRICE),
-			onChanged=self.onOptionChanged
+			onChanged=self.onChangeCaption
 		)
 		self.CaptionVolume = StrOption(
 			ID=self.ID_CAPTION_VOLUME,
 			Caption='Надпись, объём',
 			Value=self.GetDefault(self.ID_CAPTION_VOLUME, self.DEFAULT_CAPTION_VOLUME),
-			onChanged=self.onOptionChanged
+			onChanged=self.onChangeCaption
 		)
 		self.CaptionAmount = StrOption(
 			ID=self.ID_CAPTION_AMOUNT,
 			Caption='Надпись, сумма',
 			Value=self.GetDefault(self.ID_CAPTION_AMOUNT, self.DEFAULT_CAPTION_AMOUNT),
-			onChanged=self.onOptionChanged
+			onChanged=self.onChangeCaption
 		)
 		self.FormatPrice = StrOption(
 			ID=self.ID_FORMAT_PRICE,
 			Caption='Формат, цена',
 			Value=self.GetDefault(self.ID_FORMAT_PRICE, self.DEFAULT_FORMAT_PRICE),
-			onChanged=self.onOptionChanged,
+			onChanged=self.onChangeFormat,
 			Validators=[self.CheckFloatFormat]
 		)
 		self.FormatVolume = StrOption(
 			ID=self.ID_FORMAT_VOLUME,
 			Caption='Формат, объём',
 			Value=self.GetDefault(self.ID_FORMAT_VOLUME, self.DEFAULT_FORMAT_VOLUME),
-			onChanged=self.onOptionChanged,
+			onChanged=self.onChangeFormat,
 			Validators=[self.CheckFloatFormat]
 		)
 		self.FormatAmount = StrOption(
 			ID=self.ID_FORMAT_AMOUNT,
 			Caption='Формат, сумма',
 			Value=self.GetDefault(self.ID_FORMAT_AMOUNT, self.DEFAULT_FORMAT_AMOUNT),
-			onChanged=self.onOptionChanged,
+			onChanged=self.onChangeFormat,
 			Validators=[self.CheckFloatFormat]
 		)
 		self.Image = ComboBoxOption(
@@ -248,19 +331,24 @@ class GasStationDisplay():
 		self.LabelImage = QLabel()
 		self.LabelImage.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
 		self.Options = [
-			self.COMPort, self.BaudRate, self.ByteSize, self.Parity,
+			self.InputType, self.InputAddress, self.COMPort, self.BaudRate, self.ByteSize, self.Parity,
 			self.StopBit, self.Parser, self.Position, self.CaptionPrice,
 			self.CaptionVolume, self.CaptionAmount, self.FormatPrice, self.FormatVolume,
 			self.FormatAmount, self.Image, self.Style
 		]
+		# проверка адреса и COM порта зависит от выбранного источника
+		self.InputAddress.SetDependsOn([self.ID_INPUT])
+		self.COMPort.SetDependsOn([self.ID_INPUT])
+		self.Validation = OptionsValidator(self.Options)
 
 	def onChangeStyle(self, FileName: str):
 		self.Position.UpdateStyles(self.DIR_STYLES + os.sep + FileName)
+		if self.Preview:
+			self.Preview.FitFonts()
 		self.onOptionChanged(FileName)
 
 	def SetLogo(self, FileName: str, Label: QLabel):
-		self.Pixmap = QPixmap(self.DIR_IMAGES + os.sep + FileName)
-		self.Pixmap = self.Pixmap.scaled(
+		self.Pixmap = LoadPixmap(self.DIR_IMAGES + os.sep + FileName).scaled(
 			Label.geometry().width(),
 			Label.geometry().height(),
 			Qt.KeepAspectRatio
@@ -269,8 +357,9 @@ class GasStationDisplay():
 		Label.setStyleSheet('')
 
 	def SetLogoOnDisplay(self, FileName: str):
-		if self.Logo and FileName:
-			self.Logo.setStyleSheet('background-image: url(%s/%s);' % (self.DIR_IMAGES.split(os.sep)[-1], FileName))
+		for View in [self.View, self.Preview]:
+			if View:
+				View.SetLogo(FileName)
 
 	def onChangeImage(self, FileName: str):
 		self.SetLogo(FileName, self.LabelImage)
@@ -294,85 +383,440 @@ class GasStationDisplay():
 	def SetDisplayStyle(self, Widget: QWidget, FileName: str):
 		if not FileName:
 			return
-		FileName = os.path.join(self.DIR_STYLES, FileName)
-		if not os.path.isfile(FileName):
-			return
-		with open(FileName, 'r') as fp:
-			styles = fp.read()
-		Widget.setStyleSheet(styles)
+		styles = LoadStyle(os.path.join(self.DIR_STYLES, FileName))
+		if styles:
+			Widget.setStyleSheet(styles)
+
+	def SetViewStyle(self, View: DisplayView, FileName: str):
+		if FileName:
+			View.SetStyle(LoadStyle(os.path.join(self.DIR_STYLES, FileName)))
 
 	def CheckSettings(self) ->bool:
-		return self.COMPort.GetValue() in self.GetCOMPortNames() and self.Parser.GetValue()
+		if not self.Parser.GetValue() or self.GetInputClass() is None:
+			return False
+		if self.IsSerialInput():
+			return self.COMPort.GetValue() in self.GetCOMPortNames()
+		return self.CheckInputAddress(self.InputAddress.GetValue()) == ErrorDescriptionSuccess
+
+	def CreateInput(self) -> InputSource:
+		if self.IsSerialInput():
+			return SerialInput(
+				Port=self.COMPort.GetValue(),
+				baudrate=self.BaudRate.GetValue(),
+				bytesize=self.ByteSize.GetValue(),
+				parity=self.Parity.GetValue(),
+				stopbits=self.StopBit.GetValue()
+			)
+		return self.GetInputClass()(self.InputAddress.GetValue())
+
+	def GetInputKey(self) -> Tuple:
+		if self.IsSerialInput():
+			return (SerialInput.GetID(), self.COMPort.GetValue())
+		return (self.InputType.GetValue(), self.InputAddress.GetValue())
+
+	def CreateParser(self) -> Parser:
+		return self.ParserClasses[[cls.GetID() for cls in self.ParserClasses].index(self.Parser.GetValue())]()
 
 	def onRun(self):
 		if not self.CheckSettings():
 			self.onSettings()
 			return
-		self.Serial = Serial(
-			baudrate=self.BaudRate.GetValue(),
-			bytesize=self.ByteSize.GetValue(),
-			parity=self.Parity.GetValue(),
-			stopbits=self.StopBit.GetValue(),
-			timeout=self.TIMEOUNT_COM_PORT
+		self.Input = self.CreateInput()
+		self.InputKey = self.GetInputKey()
+		self.ParserObj: Parser = self.CreateParser()
+		self.Publisher = None
+		PublishAddress = self.GetDefault(self.ID_PUBLISH_ADDRESS, self.DEFAULT_PUBLISH_ADDRESS)
+		if PublishAddress and CheckHostPort(PublishAddress):
+			self.Publisher = StatePublisher(PublishAddress)
+			self.Publisher.Start()
+		self.ShowWorkDisplay()
+		self.RunThread = Thread(target=self.WorkThread, name='WorkThread')
+		self.RunThread.start()
+
+	# дисплей без COM порта: значения приходят от другого экземпляра, запущенного с PublishAddress
+	def onSubscribe(self):
+		self.Input = None
+		self.Publisher = None
+		self.ShowWorkDisplay()
+		self.Subscriber = StateSubscriber(
+			self.GetDefault(self.ID_SUBSCRIBE_ADDRESS, self.DEFAULT_SUBSCRIBE_ADDRESS),
+			self.SetValues
 		)
-		self.Serial.port = self.COMPort.GetValue()
+		self.Subscriber.Start()
+
+	def ShowWorkDisplay(self):
 		self.ThreadLock = Lock()
 		self.CurrentPrice = ''
 		self.CurrentVolume = ''
 		self.CurrentAmount = ''
+		self.RunThread = None
+		self.Subscriber = None
+		self.LastValues: dict = None
+		# время последнего изменения показаний: пока идёт налив, значения меняются
+		self.ChangeTime = time.monotonic()
+		self.SwapLock = Lock()
+		self.PendingSwap: InputSwap = None
+		self.SwapGeneration = 0
+		self.Tracer = TraceRecorder()
+		self.CurrentTrace: FrameTrace = None
+		self.PaintTrace: FrameTrace = None
+		if hasattr(signal, 'SIGUSR1'):
+			signal.signal(signal.SIGUSR1, self.onDumpTrace)
+		# в общем процессе SIGTERM и пробуждение цикла событий по сигналу берёт на себя Launcher.py
+		if self.HandleSignals:
+			signal.signal(signal.SIGTERM, self.onTerminate)
+			self.Signals = SignalNotifier()
+		self.Idle = False
+		self.IdleTimeout = self.GetDefault(self.ID_IDLE_TIMEOUT, self.DEFAULT_IDLE_TIMEOUT)
+		self.IdleOpacity = self.GetDefault(self.ID_IDLE_OPACITY, self.DEFAULT_IDLE_OPACITY)
+		self.Waker = DisplayWaker()
+		self.Waker.Wake.connect(self.onWake)
 		self.Timer = QTimer()
 		self.Timer.timeout.connect(self.UpdateData)
 		self.Timer.start(self.UPDATE_PERIOD)
-		self.ParserObj: Parser = self.ParserClasses[[cls.GetID() for cls in self.ParserClasses].index(self.Parser.GetValue())]()
 		self.Widget = QWidget()
 		self.Widget.setWindowFlags(Qt.FramelessWindowHint | Qt.Tool | Qt.CustomizeWindowHint | Qt.WindowStaysOnTopHint)
 		self.Position.SetGeometry(self.Widget)
 		self.InitDisplay(self.Widget)
-		self.SetDisplayStyle(self.Widget, self.Style.GetValue())
-		self.RunThread = Thread(target=self.WorkThread, name='WorkThread')
+		for Edit in [self.EditPrice, self.EditVolume, self.EditAmount]:
+			self.HookPaint(Edit)
+		self.SetViewStyle(self.View, self.Style.GetValue())
 		self.Terminate = False
 		self.Widget.closeEvent = self.onWorkEnd
 		self.Widget.show()
-		self.RunThread.start()
+		self.StartLiveSettings()
+
+	#изменения настроек применяются к работающему табло: из файла настроек и через канал управления
+	def StartLiveSettings(self):
+		self.SettingsMTime = self.GetSettingsMTime()
+		self.FileSettings = LoadJSON(self.SETTINGS_FILE_NAME)
+		self.ReloadTimer = QTimer()
+		self.ReloadTimer.setSingleShot(True)
+		self.ReloadTimer.timeout.connect(self.ReloadSettings)
+		# за каталогом следим на случай, если редактор заменяет файл целиком
+		self.SettingsWatcher = QFileSystemWatcher([path])
+		if os.path.isfile(self.SETTINGS_FILE_NAME):
+			self.SettingsWatcher.addPath(self.SETTINGS_FILE_NAME)
+		self.SettingsWatcher.fileChanged.connect(self.onSettingsFileChanged)
+		self.SettingsWatcher.directoryChanged.connect(self.onSettingsFileChanged)
+		self.Control = None
+		ControlAddress = self.GetDefault(self.ID_CONTROL_ADDRESS, DEFAULT_CONTROL_ADDRESS)
+		if ControlAddress:
+			self.Control = ControlServer(ControlAddress, self.onControl)
+			try:
+				self.Control.Start()
+			except OSError as err:
+				print(err)
+				self.Control = None
+
+	def GetSettingsMTime(self) -> int:
+		try:
+			return os.stat(self.SETTINGS_FILE_NAME).st_mtime_ns
+		except OSError:
+			return 0
+
+	def onSettingsFileChanged(self, FileName: str):
+		if os.path.isfile(self.SETTINGS_FILE_NAME) and self.SETTINGS_FILE_NAME not in self.SettingsWatcher.files():
+			self.SettingsWatcher.addPath(self.SETTINGS_FILE_NAME)
+		self.ReloadTimer.start(self.RELOAD_DELAY)
+
+	def ReloadSettings(self):
+		MTime = self.GetSettingsMTime()
+		if MTime == self.SettingsMTime:
+			return
+		self.SettingsMTime = MTime
+		Settings = LoadJSON(self.SETTINGS_FILE_NAME)
+		# пустой результат - файл недописан или испорчен, ждём следующей записи
+		if not Settings:
+			return
+		# применяем только то, что изменилось в файле: значения, заданные через канал управления, не откатываются
+		Changed = {ID: Value for ID, Value in Settings.items() if self.FileSettings.get(ID) != Value}
+		self.FileSettings = Settings
+		if Changed:
+			for ID, Error in self.ApplySettings(Changed)[CONTROL_ERRORS].items():
+				print('%s: %s' % (ID, Error))
+
+	def onControl(self, Request: Dict[str, Any]) -> Dict[str, Any]:
+		if Request.get(CONTROL_STATUS):
+			return {CONTROL_IDLE: time.monotonic() - self.ChangeTime}
+		return self.ApplySettings(Request)
+
+	def CheckLiveValue(self, option: Option, Value: Any) -> ErrorDescription:
+		if option in [self.Image, self.Style]:
+			Dir = self.DIR_IMAGES if option is self.Image else self.DIR_STYLES
+			if not Value or not os.path.isfile(os.path.join(Dir, Value)):
+				return ErrorDescription(ErrorCode=1, ErrorMessage='Файл не найден: %s' % Value)
+		elif isinstance(option, ComboBoxOption) and option is not self.COMPort:
+			if Value not in [value.Value for value in option.Values]:
+				return ErrorDescription(ErrorCode=1, ErrorMessage='Недопустимое значение: %s' % Value)
+		return ErrorDescriptionSuccess
+
+	#применяет к работающему табло новые значения опций; Values - словарь как в файле настроек.
+	#внешний вид меняется на месте, связь с ТРК не трогается; при смене порта или протокола рабочий поток
+	#переходит на новый источник только после того, как тот открылся
+	def ApplySettings(self, Values: Dict[str, Any]) -> Dict[str, Any]:
+		if not Values:
+			Values = LoadJSON(self.SETTINGS_FILE_NAME)
+		Changed = []
+		Errors = {}
+		for option in self.Options:
+			ID = option.GetID()
+			if ID not in Values or Values[ID] == option.GetValue():
+				continue
+			Error = self.CheckLiveValue(option, Values[ID])
+			if Error == ErrorDescriptionSuccess:
+				option.SetValue(Values[ID])
+				Error = option.CurrentError
+			if Error != ErrorDescriptionSuccess:
+				Errors[ID] = Error.ErrorMessage
+				continue
+			Changed.append(ID)
+		# в режиме ожидания окно не перерисовывается: новые настройки нужно показать
+		if Changed and self.Idle:
+			self.ExitIdle()
+		if {self.ID_CAPTION_PRICE, self.ID_CAPTION_VOLUME, self.ID_CAPTION_AMOUNT} & set(Changed):
+			self.View.SetCaptions(self.CaptionPrice.GetValue(), self.CaptionVolume.GetValue(), self.CaptionAmount.GetValue())
+		if {self.ID_FORMAT_PRICE, self.ID_FORMAT_VOLUME, self.ID_FORMAT_AMOUNT} & set(Changed):
+			self.FitView(self.View)
+			if self.LastValues:
+				self.SetValues(self.LastValues)
+			else:
+				self.View.SetFormats(self.FormatPrice.GetValue(), self.FormatVolume.GetValue(), self.FormatAmount.GetValue())
+		if self.ID_STYLE in Changed:
+			self.SetViewStyle(self.View, self.Style.GetValue())
+		if self.ID_POSITION in Changed:
+			self.Position.SetGeometry(self.Widget)
+		if self.ID_PARSER in Changed or set(self.INPUT_IDS) & set(Changed):
+			Error = self.SwapInput(bool(set(self.INPUT_IDS) & set(Changed)))
+			if Error:
+				Errors[self.ID_INPUT] = Error
+		return {CONTROL_CHANGED: Changed, CONTROL_ERRORS: Errors}
+
+	def SwapInput(self, InputChanged: bool) -> str:
+		if not self.RunThread:
+			return 'Табло получает данные по подписке, источник не используется'
+		if not self.CheckSettings():
+			return 'Настройки источника неполные, работает прежний источник'
+		with self.SwapLock:
+			self.SwapGeneration += 1
+			Generation = self.SwapGeneration
+		if not InputChanged:
+			self.SetPendingSwap(Generation, InputSwap(Input=None, ParserObj=self.CreateParser(), Key=self.InputKey))
+			return ''
+		Swap = InputSwap(Input=self.CreateInput(), ParserObj=self.CreateParser(), Key=self.GetInputKey())
+		Swap.Reopen = Swap.Key == self.InputKey
+		if Swap.Reopen:
+			self.SetPendingSwap(Generation, Swap)
+		else:
+			Thread(target=self.ConnectThread, args=(Generation, Swap), name='ConnectThread', daemon=True).start()
+		return ''
+
+	def SetPendingSwap(self, Generation: int, Swap: InputSwap) -> bool:
+		with self.SwapLock:
+			if Generation != self.SwapGeneration:
+				return False
+			if self.PendingSwap and self.PendingSwap.Input and not self.PendingSwap.Reopen:
+				self.PendingSwap.Input.Close()
+			self.PendingSwap = Swap
+		return True
+
+	#новый источник открывается в стороне, пока прежний продолжает работать
+	def ConnectThread(self, Generation: int, Swap: InputSwap):
+		while not self.Terminate and Generation == self.SwapGeneration:
+			try:
+				Swap.Input.Open()
+				if not self.SetPendingSwap(Generation, Swap):
+					Swap.Input.Close()
+				return
+			except Exception as err:
+				print(err)
+				Swap.Input.Close()
+				time.sleep(self.RECONNECT_PERIOD)
+
+	#вызывается только из рабочего потока
+	def SwapPending(self):
+		with self.SwapLock:
+			Swap = self.PendingSwap
+			self.PendingSwap = None
+		if not Swap:
+			return
+		if Swap.Input:
+			self.Input.Close()
+			if Swap.Reopen:
+				try:
+					Swap.Input.Open()
+				except Exception as err:
+					# прежний источник откроется заново в рабочем цикле
+					print(err)
+					Swap.Input.Close()
+					return
+			self.Input = Swap.Input
+			self.InputKey = Swap.Key
+		self.ParserObj = Swap.ParserObj
 
 	def UpdateData(self):
 		with self.ThreadLock:
-			self.EditPrice.setText(self.CurrentPrice)
-			self.EditVolume.setText(self.CurrentVolume)
-			self.EditAmount.setText(self.CurrentAmount)
+			Trace = self.CurrentTrace
+			self.CurrentTrace = None
+			if Trace:
+				Trace.Mark(FrameTrace.STAGE_DISPATCH)
+			Changed = self.View.SetValues(self.CurrentPrice, self.CurrentVolume, self.CurrentAmount)
+		if not Trace:
+			if self.IdleTimeout and time.monotonic() - self.ChangeTime >= self.IdleTimeout:
+				self.EnterIdle()
+			return
+		if not Changed:
+			self.Tracer.Commit(Trace)
+			return
+		if self.PaintTrace:
+			self.Tracer.Drop(self.PaintTrace)
+		self.PaintTrace = Trace
+
+	#режим ожидания между наливами: таймер опроса остановлен, окно не перерисовывается и, если задано, затемнено.
+	#на экране остаются последние показания; первый же принятый кадр будит табло через DisplayWaker
+	def EnterIdle(self):
+		if self.Idle:
+			return
+		self.Idle = True
+		# показания могли измениться, пока рабочий поток ещё не видел флаг
+		if time.monotonic() - self.ChangeTime < self.IdleTimeout:
+			self.ExitIdle()
+			return
+		self.Timer.stop()
+		if self.IdleOpacity < 1:
+			self.Widget.setWindowOpacity(self.IdleOpacity)
+		self.Widget.setUpdatesEnabled(False)
+
+	def ExitIdle(self):
+		if not self.Idle:
+			return
+		self.Idle = False
+		self.Widget.setUpdatesEnabled(True)
+		if self.IdleOpacity < 1:
+			self.Widget.setWindowOpacity(1)
+		self.Timer.start(self.UPDATE_PERIOD)
+
+	#вызывается из рабочего потока и потока подписки
+	def RequestWake(self):
+		if self.Idle:
+			self.Waker.Wake.emit()
+
+	def onWake(self):
+		self.ExitIdle()
+		self.UpdateData()
+
+	def HookPaint(self, Edit: QLineEdit):
+		def paintEvent(event):
+			QLineEdit.paintEvent(Edit, event)
+			self.onPaint()
+		Edit.paintEvent = paintEvent
+
+	def onPaint(self):
+		if self.PaintTrace:
+			self.PaintTrace.Mark(FrameTrace.STAGE_PAINT)
+			self.Tracer.Commit(self.PaintTrace)
+			self.PaintTrace = None
+
+	def onDumpTrace(self, signum, frame):
+		Dump = self.Tracer.Dump()
+		print(Dump)
+		try:
+			with open(self.TRACE_FILE_NAME, 'w') as fp:
+				fp.write(Dump + '\n')
+				fp.write(' '.join(FrameTrace.STAGE_NAMES) + '\n')
+				for Times in self.Tracer.GetTraces():
+					fp.write(' '.join(str(Time) for Time in Times) + '\n')
+		except Exception as err:
+			print(err)
+
+	#мягкая остановка по SIGTERM (например, от Supervisor.py): рабочий поток и публикация завершаются штатно
+	def onTerminate(self, signum, frame):
+		QTimer.singleShot(0, self.Quit)
+
+	def Quit(self):
+		self.Shutdown()
+		QApplication.quit()
+
+	#остановка без выхода из цикла событий
+	def Shutdown(self):
+		Widget = getattr(self, 'Widget', None)
+		if Widget:
+			Widget.close()
 
 	def onWorkEnd(self, event):
 		self.Terminate = True
-		self.RunThread.join()
-
-	def onCommand(self, Command: GasStationCommand):
-		if Command.CMDType == Parser.CMDTYPE_DATA:
-			with self.ThreadLock:
-				self.CurrentPrice = self.FormatPrice.GetValue() % Command.Params[Parser.DATA_PRICE]
-				self.CurrentVolume = self.FormatVolume.GetValue() % Command.Params[Parser.DATA_VOLUME]
-				self.CurrentAmount = self.FormatAmount.GetValue() % Command.Params[Parser.DATA_AMOUNT]
+		if self.RunThread:
+			self.RunThread.join()
+		with self.SwapLock:
+			if self.PendingSwap and self.PendingSwap.Input:
+				self.PendingSwap.Input.Close()
+			self.PendingSwap = None
+		if self.Control:
+			self.Control.Stop()
+		if self.Subscriber:
+			self.Subscriber.Stop()
+		if self.Publisher:
+			self.Publisher.Stop()
+
+	def SetValues(self, Values: dict, Trace: FrameTrace = None) -> bool:
+		if not all(Field in Values for Field in self.DATA_FIELDS):
+			return False
+		with self.ThreadLock:
+			Price = self.FormatPrice.GetValue() % Values[Parser.DATA_PRICE]
+			Volume = self.FormatVolume.GetValue() % Values[Parser.DATA_VOLUME]
+			Amount = self.FormatAmount.GetValue() % Values[Parser.DATA_AMOUNT]
+			if Trace:
+				Trace.Mark(FrameTrace.STAGE_STATE)
+				if self.CurrentTrace and self.CurrentTrace is not Trace:
+					self.Tracer.Drop(self.CurrentTrace)
+				self.CurrentTrace = Trace
+			self.CurrentPrice, self.CurrentVolume, self.CurrentAmount = Price, Volume, Amount
+			if Values != self.LastValues:
+				self.ChangeTime = time.monotonic()
+			# копия: подписчик передаёт один и тот же словарь, меняя его на месте
+			self.LastValues = dict(Values)
+		self.RequestWake()
+		return True
+
+	def onCommand(self, Command: GasStationCommand, Trace: FrameTrace = None):
+		if Command.CMDType == Parser.CMDTYPE_DATA and self.SetValues(Command.Params, Trace) and self.Publisher:
+			self.Publisher.Publish({Field: Command.Params[Field] for Field in self.DATA_FIELDS})
+
+	#ошибка разбора или форматирования теряет только свой кадр, вход остаётся открытым
+	def onFrame(self, Frame: InputFrame):
+		try:
+			Trace = FrameTrace(Frame.ReadTime, Frame.FrameTime)
+			Commands = self.ParserObj.ParseFrames(Frame.Data)
+			Trace.Mark(FrameTrace.STAGE_PARSED)
+			for Command in Commands:
+				try:
+					self.onCommand(Command, Trace)
+				except Exception as err:
+					print(err)
+		except Exception as err:
+			print(err)
 
 	def WorkThread(self):
 		while not self.Terminate:
 			try:
-				self.Serial.open()
+				self.SwapPending()
+				if not self.Input.IsOpen():
+					self.Input.Open()
 				while not self.Terminate:
-					self.Serial.timeout = 1
-					Command = bytearray(self.Serial.read(1))
-					self.Serial.timeout = self.TIMEOUNT_COM_PORT
-					try:
-						Command += bytearray(self.Serial.read(999))
-					except:
-						pass
-					Command = self.ParserObj.Parse(Command)
-					if Command:
-						self.onCommand(Command)
+					self.SwapPending()
+					Frames = self.Input.Read()
+					if Frames:
+						self.RequestWake()
+					for Frame in Frames:
+						self.onFrame(Frame)
+			except OSError as err:
+				print(err)
+				self.Input.Close()
+				time.sleep(self.TIMEOUNT_COM_PORT)
 			except Exception as err:
 				print(err)
-				if self.Serial.is_open:
-					self.Serial.close()
-		if self.Serial.is_open:
-			self.Serial.close()
+				time.sleep(self.TIMEOUNT_COM_PORT)
+		self.Input.Close()
 
 	def onSettings(self):
 		self.Window = QWidget()
@@ -403,7 +847,7 @@ class GasStationDisplay():
 		self.PositionGrid = QGridLayout()
 		self.StringsGrid = QGridLayout()
 		self.StyleGrid = QGridLayout()
-		for option in [self.COMPort, self.BaudRate, self.ByteSize, self.Parity, self.StopBit, self.Parser]:
+		for option in [self.InputType, self.InputAddress, self.COMPort, self.BaudRate, self.ByteSize, self.Parity, self.StopBit, self.Parser]:
 			option.ShowOption(self.COMPortGrid)
 		self.Position.ShowOption(self.PositionGrid)
 		for option in [self.CaptionPrice, self.CaptionVolume, self.CaptionAmount, self.FormatPrice, self.FormatVolume, self.FormatAmount]:
@@ -425,8 +869,10 @@ class GasStationDisplay():
 		self.BSave = QPushButton(self.BSAVE_CAPTION)
 		self.BSave.setEnabled(False)
 		self.BSave.clicked.connect(self.onSave)
-		self.Position.SetInitDisplayFunction(self.InitDisplay)
+		self.Position.SetInitDisplayFunction(self.InitPreview)
 		self.Position.SetLCaption(self.LCaption)
+		self.InputType.SetLCaption(self.LCaption)
+		self.InputAddress.SetLCaption(self.LCaption)
 		self.COMPort.SetLCaption(self.LCaption)
 		self.Parser.SetLCaption(self.LCaption)
 		self.Image.SetLCaption(self.LCaption)
@@ -442,45 +888,41 @@ class GasStationDisplay():
 		if self.Style.GetValue() and os.path.isfile(self.DIR_STYLES + os.sep + self.Style.GetValue()):
 			self.onChangeStyle(self.Style.GetValue())
 
+	def CreateView(self, Widget: QWidget) -> DisplayView:
+		View = DisplayView(Widget, self.DIR_IMAGES)
+		View.SetCaptions(self.CaptionPrice.GetValue(), self.CaptionVolume.GetValue(), self.CaptionAmount.GetValue())
+		View.SetFormats(self.FormatPrice.GetValue(), self.FormatVolume.GetValue(), self.FormatAmount.GetValue())
+		View.SetLogo(self.Image.GetValue())
+		self.FitView(View)
+		return View
+
+	def FitView(self, View: DisplayView):
+		if self.GetDefault(self.ID_AUTO_FIT, self.DEFAULT_AUTO_FIT):
+			View.SetAutoFit(
+				[self.FormatPrice.GetValue(), self.FormatVolume.GetValue(), self.FormatAmount.GetValue()],
+				self.GetDefault(self.ID_FIT_MAX_VALUES, self.DEFAULT_FIT_MAX_VALUES)
+			)
+
 	def InitDisplay(self, Widget: QWidget):
-		Widget.setObjectName(self.OBJECT_NAME_DISPLAY)
-		self.Grid = QGridLayout()
-		self.LeftVLayout = QVBoxLayout()
-		self.LabelPrice = QLabel(self.CaptionPrice.GetValue())
-		self.LabelPrice.setAlignment(Qt.AlignCenter)
-		self.LabelPrice.setObjectName(self.OBJECT_NAME_LABEL_PRICE)
-		self.EditPrice = QLineEdit(self.FormatPrice.GetValue() % 0)
-		self.EditPrice.setObjectName(self.OBJECT_NAME_EDIT_PRICE)
-		self.EditPrice.setAlignment(Qt.AlignRight)
-		self.Logo = QLabel()
-		self.Logo.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-		self.Logo.setObjectName(self.OBJECT_NAME_LABEL_LOGO)
-		self.LeftVLayout.addWidget(self.LabelPrice)
-		self.LeftVLayout.addWidget(self.EditPrice)
-		self.LeftVLayout.addWidget(self.Logo)
-		self.HLayoutTop = QHBoxLayout()
-		self.LabelAmount = QLabel(self.CaptionAmount.GetValue())
-		self.LabelPrice.setObjectName(self.OBJECT_NAME_LABEL_AMOUNT)
-		self.LabelAmount.setAlignment(Qt.AlignCenter)
-		self.EditAmount = QLineEdit(self.FormatAmount.GetValue() % 0)
-		self.EditAmount.setObjectName(self.OBJECT_NAME_EDIT_AMOUNT)
-		self.EditAmount.setAlignment(Qt.AlignRight)
-		self.HLayoutTop.addWidget(self.LabelAmount)
-		self.HLayoutTop.addWidget(self.EditAmount)
-		self.HLayoutBottom = QHBoxLayout()
-		self.LabelVolume = QLabel(self.CaptionVolume.GetValue())
-		self.LabelVolume.setObjectName(self.OBJECT_NAME_LABEL_VOLUME)
-		self.LabelVolume.setAlignment(Qt.AlignCenter)
-		self.EditVolume = QLineEdit(self.FormatVolume.GetValue() % 0)
-		self.EditVolume.setObjectName(self.OBJECT_NAME_EDIT_VOLUME)
-		self.EditVolume.setAlignment(Qt.AlignRight)
-		self.HLayoutBottom.addWidget(self.LabelVolume)
-		self.HLayoutBottom.addWidget(self.EditVolume)
-		self.Grid.addLayout(self.LeftVLayout, 0, 0, 2, 1)
-		self.Grid.addLayout(self.HLayoutTop, 0, 1)
-		self.Grid.addLayout(self.HLayoutBottom, 1, 1)
-		Widget.setLayout(self.Grid)
-		self.SetLogoOnDisplay(self.Image.GetValue())
+		self.View = self.CreateView(Widget)
+		self.EditPrice = self.View.EditPrice
+		self.EditVolume = self.View.EditVolume
+		self.EditAmount = self.View.EditAmount
+
+	#предпросмотр в настройках строится один раз и дальше только обновляется, поля рабочего табло не трогает
+	def InitPreview(self, Widget: QWidget):
+		self.Preview = self.CreateView(Widget)
+
+	def onChangeCaption(self, Caption: str):
+		if self.Preview:
+			self.Preview.SetCaptions(self.CaptionPrice.GetValue(), self.CaptionVolume.GetValue(), self.CaptionAmount.GetValue())
+		self.onOptionChanged(Caption)
+
+	def onChangeFormat(self, Format: str):
+		if self.Preview:
+			self.Preview.SetFormats(self.FormatPrice.GetValue(), self.FormatVolume.GetValue(), self.FormatAmount.GetValue())
+			self.FitView(self.Preview)
+		self.onOptionChanged(Format)
 
 	def onSettingsClose(self, event):
 		for window in QApplication.topLevelWidgets():
@@ -501,32 +943,41 @@ class GasStationDisplay():
 		self.Settings[self.SETTINGS_POSITION][WidgetPosition.POSITION_TOP] = e.pos().y()
 		UpdateJSON(self.SETTINGS_FILE_NAME, self.SETTINGS_POSITION, self.Settings[self.SETTINGS_POSITION])
 
-	def __init__(self):
+	#Args - слова режима (run, settings, subscribe); по умолчанию берутся из командной строки.
+	#HandleSignals=False, когда SIGTERM обрабатывает процесс, в котором табло запущено
+	def __init__(self, Args: List[str] = None, HandleSignals: bool = True):
 		super().__init__()
 		self.i = 0
+		self.Args = sys.argv if Args is None else Args
+		self.HandleSignals = HandleSignals
 		self.app = QtWidgets.QApplication.instance()
 		self.desktop = self.app.desktop()
 		self.ScreenWidth = self.desktop.screenGeometry().width()
 		self.ScreenHeight = self.desktop.screenGeometry().height()
-		self.ParserClasses: List[Parser] = [JSONParser, BenchParser]
+		self.ParserClasses: List[Parser] = PARSER_CLASSES
+		self.InputClasses: List[InputSource] = INPUT_CLASSES
 		self.Options: List[Option] = []
 		self.LoadSettings()
 		self.WorkMode = {
-			self.ON_RUN: self.ON_RUN in sys.argv,
-			self.ON_SETTINGS: self.ON_SETTINGS in sys.argv
+			self.ON_RUN: self.ON_RUN in self.Args,
+			self.ON_SETTINGS: self.ON_SETTINGS in self.Args,
+			self.ON_SUBSCRIBE: self.ON_SUBSCRIBE in self.Args
 		}
 		if self.WorkMode[self.ON_RUN] == self.WorkMode[self.ON_SETTINGS]:
 			self.WorkMode[self.ON_SETTINGS] = True
 			self.WorkMode[self.ON_RUN] = False
 		#self.onRun()
 		#return
-		if self.WorkMode[self.ON_RUN]:
+		if self.WorkMode[self.ON_SUBSCRIBE]:
+			self.onSubscribe()
+		elif self.WorkMode[self.ON_RUN]:
 			self.onRun()
 		else:
 			self.onSettings()
 
 
 if __name__ == '__main__':
+	os.chdir(path)
 	app = QApplication(sys.argv)
 	MediaPlayer = GasStationDisplay()
 	sys.exit(app.exec_())
@@ -0,0 +1,156 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+import os
+from typing import Dict, List
+from PyQt5.QtWidgets import QGridLayout, QWidget, QLabel, QHBoxLayout, QSizePolicy, QVBoxLayout, QLineEdit, QStyle
+from PyQt5.QtCore import Qt
+from Resources import FitFontSize
+
+
+#табло: надписи, поля цены, объёма и суммы и логотип. виджеты создаются один раз,
+#дальше меняются только свойства и только если новое значение отличается от текущего
+class DisplayView():
+
+	OBJECT_NAME_LABEL_PRICE = 'ONLabelPrice'
+	OBJECT_NAME_EDIT_PRICE = 'ONEditPrice'
+	OBJECT_NAME_LABEL_LOGO = 'ONLabelLogo'
+	OBJECT_NAME_LABEL_AMOUNT = 'ONLabelAmount'
+	OBJECT_NAME_EDIT_AMOUNT = 'ONEditAmount'
+	OBJECT_NAME_LABEL_VOLUME = 'ONLabelVolume'
+	OBJECT_NAME_EDIT_VOLUME = 'ONEditVolume'
+	OBJECT_NAME_DISPLAY = 'ONDisplay'
+	# внутренние отступы текста QLineEdit от рамки, в Qt не настраиваются
+	LINE_EDIT_MARGIN = 2
+	LINE_EDIT_VERTICAL_MARGIN = 1
+
+	def __init__(self, Widget: QWidget, DirImages: str):
+		self.Widget = Widget
+		self.DirImages = DirImages
+		self.LogoFileName = None
+		self.Styles = None
+		# самое широкое значение каждого поля и применённый к полю размер шрифта
+		self.FitTexts: Dict[QLineEdit, str] = {}
+		self.FitSizes: Dict[QLineEdit, int] = {}
+		Widget.setObjectName(self.OBJECT_NAME_DISPLAY)
+		self.Grid = QGridLayout()
+		self.LeftVLayout = QVBoxLayout()
+		self.LabelPrice = self.CreateLabel(self.OBJECT_NAME_LABEL_PRICE)
+		self.EditPrice = self.CreateEdit(self.OBJECT_NAME_EDIT_PRICE)
+		self.Logo = QLabel()
+		self.Logo.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+		self.Logo.setObjectName(self.OBJECT_NAME_LABEL_LOGO)
+		self.LeftVLayout.addWidget(self.LabelPrice)
+		self.LeftVLayout.addWidget(self.EditPrice)
+		self.LeftVLayout.addWidget(self.Logo)
+		self.HLayoutTop = QHBoxLayout()
+		self.LabelAmount = self.CreateLabel(self.OBJECT_NAME_LABEL_AMOUNT)
+		self.EditAmount = self.CreateEdit(self.OBJECT_NAME_EDIT_AMOUNT)
+		self.HLayoutTop.addWidget(self.LabelAmount)
+		self.HLayoutTop.addWidget(self.EditAmount)
+		self.HLayoutBottom = QHBoxLayout()
+		self.LabelVolume = self.CreateLabel(self.OBJECT_NAME_LABEL_VOLUME)
+		self.EditVolume = self.CreateEdit(self.OBJECT_NAME_EDIT_VOLUME)
+		self.HLayoutBottom.addWidget(self.LabelVolume)
+		self.HLayoutBottom.addWidget(self.EditVolume)
+		self.Grid.addLayout(self.LeftVLayout, 0, 0, 2, 1)
+		self.Grid.addLayout(self.HLayoutTop, 0, 1)
+		self.Grid.addLayout(self.HLayoutBottom, 1, 1)
+		Widget.setLayout(self.Grid)
+
+	def CreateLabel(self, ObjectName: str) -> QLabel:
+		Label = QLabel()
+		Label.setObjectName(ObjectName)
+		Label.setAlignment(Qt.AlignCenter)
+		return Label
+
+	def CreateEdit(self, ObjectName: str) -> QLineEdit:
+		Edit = QLineEdit()
+		Edit.setObjectName(ObjectName)
+		Edit.setAlignment(Qt.AlignRight)
+		return Edit
+
+	def SetText(self, Widget, Text: str):
+		if Widget.text() != Text:
+			Widget.setText(Text)
+
+	def SetCaptions(self, Price: str, Volume: str, Amount: str):
+		self.SetText(self.LabelPrice, Price)
+		self.SetText(self.LabelVolume, Volume)
+		self.SetText(self.LabelAmount, Amount)
+
+	def SetValues(self, Price: str, Volume: str, Amount: str) -> bool:
+		Changed = (self.EditPrice.text(), self.EditVolume.text(), self.EditAmount.text()) != (Price, Volume, Amount)
+		if Changed:
+			self.SetText(self.EditPrice, Price)
+			self.SetText(self.EditVolume, Volume)
+			self.SetText(self.EditAmount, Amount)
+		return Changed
+
+	# образец формата на нулевых значениях, как на табло до первой заправки
+	def SetFormats(self, Price: str, Volume: str, Amount: str):
+		try:
+			self.SetValues(Price % 0, Volume % 0, Amount % 0)
+		except (TypeError, ValueError) as err:
+			print(err)
+
+	def SetLogo(self, FileName: str):
+		if not FileName or FileName == self.LogoFileName:
+			return
+		self.LogoFileName = FileName
+		# абсолютный путь: текущая папка процесса зависит от того, какой скрипт запущен
+		self.Logo.setStyleSheet('background-image: url("%s");' % os.path.join(os.path.abspath(self.DirImages), FileName).replace(os.sep, '/'))
+
+	#повторный setStyleSheet с тем же текстом всё равно заново разбирает стили и полирует все дочерние виджеты
+	def SetStyle(self, Styles: str):
+		if not Styles or Styles == self.Styles:
+			return
+		self.Styles = Styles
+		self.Widget.setStyleSheet(Styles)
+		self.FitFonts()
+
+	def GetEdits(self) -> List[QLineEdit]:
+		return [self.EditPrice, self.EditVolume, self.EditAmount]
+
+	#размер шрифта полей подбирается под ячейку по самому широкому значению формата (Format % MaxValue).
+	#поле занимает всю высоту ячейки, поэтому его высота не зависит от шрифта; при изменении значений ничего не измеряется,
+	#а при изменении размера берётся готовый размер из кэша
+	def SetAutoFit(self, Formats: List[str], MaxValues: List[float]):
+		# цена делит левую колонку с логотипом поровну
+		self.LeftVLayout.setStretchFactor(self.EditPrice, 1)
+		self.LeftVLayout.setStretchFactor(self.Logo, 1)
+		for Edit, Format, MaxValue in zip(self.GetEdits(), Formats, MaxValues):
+			try:
+				Text = Format % MaxValue
+			except (TypeError, ValueError) as err:
+				print(err)
+				continue
+			if Edit not in self.FitTexts:
+				Edit.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Ignored)
+				# иначе минимальная ширина следует за шрифтом и после уменьшения окна поле остаётся широким
+				Edit.setMinimumWidth(1)
+				self.HookResize(Edit)
+			self.FitTexts[Edit] = Text
+			self.FitFont(Edit)
+
+	# семейство шрифта и рамки могли смениться вместе со стилями
+	def FitFonts(self):
+		for Edit in self.FitTexts:
+			self.FitFont(Edit)
+
+	def HookResize(self, Edit: QLineEdit):
+		def resizeEvent(event):
+			QLineEdit.resizeEvent(Edit, event)
+			self.FitFont(Edit)
+		Edit.resizeEvent = resizeEvent
+
+	def FitFont(self, Edit: QLineEdit):
+		Rect = Edit.contentsRect()
+		Frame = Edit.style().pixelMetric(QStyle.PM_DefaultFrameWidth, None, Edit)
+		Width = Rect.width() - 2 * (Frame + self.LINE_EDIT_MARGIN)
+		Height = Rect.height() - 2 * (Frame + self.LINE_EDIT_VERTICAL_MARGIN)
+		if Width <= 0 or Height <= 0:
+			return
+		Size = FitFontSize(Edit.font(), self.FitTexts[Edit], Width, Height, Edit.devicePixelRatioF())
+		if Size != self.FitSizes.get(Edit):
+			self.FitSizes[Edit] = Size
+			Edit.setStyleSheet('font-size: %dpx;' % Size)
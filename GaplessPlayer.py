@@ -0,0 +1,214 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+import os
+import time
+from typing import List
+from PyQt5.QtWidgets import QWidget, QStackedLayout
+from PyQt5.QtCore import QObject, QUrl, pyqtSignal
+from PyQt5.QtMultimedia import QMediaContent, QMediaPlayer, QVideoProbe
+from PyQt5.QtMultimediaWidgets import QVideoWidget
+from Trace import LatencyHistogram
+
+
+PREFETCH_SIZE = 64 * 1024 * 1024
+
+
+#подсказка ядру заранее прочитать начало следующего ролика в page cache
+def Prefetch(FileName: str):
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        fd = os.open(FileName, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, PREFETCH_SIZE, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+class PlayerDeck():
+
+    NOTIFY_INTERVAL = 40
+
+    def __init__(self):
+        self.Player = QMediaPlayer(None, QMediaPlayer.VideoSurface)
+        self.Video = QVideoWidget()
+        self.Player.setVideoOutput(self.Video)
+        self.Player.setNotifyInterval(self.NOTIFY_INTERVAL)
+        self.FileName: str = None
+        # счётчик кадров, дошедших до поверхности; не все бэкенды поддерживают QVideoProbe
+        self.Frames = 0
+        self.Probe = QVideoProbe()
+        self.Probe.videoFrameProbed.connect(self.onFrame)
+        self.HasProbe = self.Probe.setSource(self.Player)
+
+    def onFrame(self, Frame):
+        self.Frames += 1
+
+    #ролик открывается и ставится на паузу, чтобы декодер заранее подготовил первый кадр
+    def Load(self, FileName: str):
+        if FileName != self.FileName:
+            self.FileName = FileName
+            self.Player.setMedia(QMediaContent(QUrl.fromLocalFile(FileName)))
+        else:
+            self.Player.setPosition(0)
+        self.Player.pause()
+
+    def Stop(self):
+        self.Player.stop()
+
+    def Delete(self):
+        self.Player.stop()
+        self.Video.deleteLater()
+        self.Probe.deleteLater()
+        self.Player.deleteLater()
+
+
+#два плеера по очереди: пока один играет, второй уже открыл и буферизовал следующий ролик.
+#в режиме одного плеера следующий ролик открывается только по окончании текущего
+class GaplessPlayer(QObject):
+
+    # индекс текущего ролика; -1 - воспроизведение остановлено переходом на пустой плейлист
+    CurrentChanged = pyqtSignal(int)
+    Error = pyqtSignal(str)
+
+    ERROR_NO_PLAYABLE = 'Ни один ролик плейлиста не открывается'
+
+    def __init__(self, Gapless: bool = True, parent=None):
+        super().__init__(parent)
+        self.Widget = QWidget()
+        self.Layout = QStackedLayout(self.Widget)
+        self.Layout.setContentsMargins(0, 0, 0, 0)
+        self.DeckCount = 2 if Gapless else 1
+        self.CreateDecks()
+        self.Files: List[str] = []
+        # плейлист, на который плеер перейдёт в конце текущего ролика
+        self.NextFiles: List[str] = None
+        self.Index = -1
+        self.Playing = False
+        self.SwitchTime = 0
+        # подряд не открывшиеся ролики; после полного круга таких воспроизведение останавливается
+        self.Failures = 0
+        self.Gaps = LatencyHistogram()
+
+    def CreateDecks(self):
+        self.Decks = [PlayerDeck() for i in range(self.DeckCount)]
+        for Deck in self.Decks:
+            self.Layout.addWidget(Deck.Video)
+            Deck.Player.mediaStatusChanged.connect(lambda Status, Deck=Deck: self.onMediaStatus(Deck, Status))
+            Deck.Player.positionChanged.connect(lambda Position, Deck=Deck: self.onPosition(Deck, Position))
+            Deck.Player.error.connect(lambda err, Deck=Deck: self.Error.emit(Deck.Player.errorString()))
+        self.Active = 0
+
+    #пересоздание плееров и поверхностей вывода с продолжением с текущего ролика
+    def Recreate(self):
+        Playing = self.Playing
+        self.Stop()
+        for Deck in self.Decks:
+            self.Layout.removeWidget(Deck.Video)
+            Deck.Delete()
+        self.CreateDecks()
+        if Playing:
+            self.Play(max(self.Index, 0))
+
+    def GetActive(self) -> PlayerDeck:
+        return self.Decks[self.Active]
+
+    def IsPlaying(self) -> bool:
+        return self.Playing and self.GetActive().Player.state() == QMediaPlayer.PlayingState
+
+    def SetFiles(self, Files: List[str]):
+        self.Stop()
+        self.Files = list(Files)
+        self.NextFiles = None
+        self.Index = -1
+
+    #смена плейлиста без обрыва: текущий ролик доигрывает, вместо следующего готовится первый ролик нового
+    def SetNext(self, Files: List[str]):
+        self.NextFiles = list(Files)
+        if self.Playing:
+            self.PrepareNext()
+
+    def GetCurrentFile(self) -> str:
+        Files, Index = self.Files, self.Index
+        return Files[Index] if self.Playing and 0 <= Index < len(Files) else None
+
+    def NextIndex(self) -> int:
+        return 0 if self.NextFiles is not None else (self.Index + 1) % len(self.Files)
+
+    def Play(self, Index: int = 0):
+        if not self.Files:
+            return
+        self.Playing = True
+        self.Failures = 0
+        self.Index = Index % len(self.Files)
+        Deck = self.GetActive()
+        Deck.Load(self.Files[self.Index])
+        Deck.Player.play()
+        self.Layout.setCurrentWidget(Deck.Video)
+        self.PrepareNext()
+        self.CurrentChanged.emit(self.Index)
+
+    def Stop(self):
+        self.Playing = False
+        self.SwitchTime = 0
+        for Deck in self.Decks:
+            Deck.Stop()
+
+    def PrepareNext(self):
+        Files = self.Files if self.NextFiles is None else self.NextFiles
+        if not Files:
+            return
+        FileName = Files[self.NextIndex()]
+        Prefetch(FileName)
+        if len(self.Decks) > 1:
+            self.Decks[1 - self.Active].Load(FileName)
+
+    def Advance(self):
+        self.SwitchTime = time.monotonic_ns()
+        self.Index = self.NextIndex()
+        if self.NextFiles is not None:
+            self.Files, self.NextFiles = self.NextFiles, None
+            self.Failures = 0
+            if not self.Files:
+                self.Stop()
+                self.CurrentChanged.emit(-1)
+                return
+        if len(self.Decks) > 1:
+            self.Active = 1 - self.Active
+        else:
+            self.GetActive().Load(self.Files[self.Index])
+        Deck = self.GetActive()
+        Deck.Player.play()
+        self.Layout.setCurrentWidget(Deck.Video)
+        self.PrepareNext()
+        self.CurrentChanged.emit(self.Index)
+
+    def onMediaStatus(self, Deck: PlayerDeck, Status: int):
+        if not self.Playing or Deck is not self.GetActive():
+            return
+        if Status == QMediaPlayer.InvalidMedia:
+            self.Failures += 1
+            if self.Failures >= len(self.Files):
+                self.Stop()
+                self.Error.emit(self.ERROR_NO_PLAYABLE)
+                return
+            self.Advance()
+        elif Status == QMediaPlayer.EndOfMedia:
+            self.Failures = 0
+            self.Advance()
+
+    #разрыв перехода - от конца ролика до первого продвижения позиции следующего
+    def onPosition(self, Deck: PlayerDeck, Position: int):
+        if Position <= 0 or Deck is not self.GetActive():
+            return
+        self.Failures = 0
+        if self.SwitchTime:
+            self.Gaps.Add(time.monotonic_ns() - self.SwitchTime)
+            self.SwitchTime = 0
+
+    def Report(self) -> str:
+        return 'Переходов: %d, разрыв: средний %.1f мс, p99 %.1f мс, максимальный %.1f мс' % (
+            self.Gaps.Count, self.Gaps.Mean() / 1000, self.Gaps.Percentile(99) / 1000, self.Gaps.Max / 1000
+        )
@@ -0,0 +1,373 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+import os
+import stat
+import socket
+import selectors
+import time
+from abc import abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, List, Dict, Tuple
+from serial import Serial
+
+
+@dataclass
+class InputFrame():
+	Data: bytearray
+	Source: Any = None
+	ReadTime: int = 0
+	FrameTime: int = field(default_factory=time.monotonic_ns)
+
+
+class GapFramer():
+
+	def __init__(self, Gap: float, MaxSize: int, Source: Any = None):
+		self.Gap = Gap
+		self.MaxSize = MaxSize
+		self.Source = Source
+		self.Buffer = bytearray()
+		self.LastTime = 0.0
+		self.ReadTime = 0
+
+	def Feed(self, Data: bytes, Now: float) -> List[InputFrame]:
+		if not self.Buffer:
+			self.ReadTime = time.monotonic_ns()
+		self.Buffer += Data
+		self.LastTime = Now
+		Frames = []
+		while len(self.Buffer) >= self.MaxSize:
+			Frames.append(InputFrame(Data=self.Buffer[:self.MaxSize], Source=self.Source, ReadTime=self.ReadTime))
+			del self.Buffer[:self.MaxSize]
+		return Frames
+
+	def Deadline(self) -> float:
+		return self.LastTime + self.Gap
+
+	def Flush(self, Now: float, Force: bool = False) -> InputFrame:
+		if not self.Buffer or (not Force and Now < self.Deadline()):
+			return None
+		Frame = InputFrame(Data=self.Buffer, Source=self.Source, ReadTime=self.ReadTime)
+		self.Buffer = bytearray()
+		return Frame
+
+
+class InputSource():
+
+	FRAME_SIZE = 1000
+	FRAME_GAP = 0.1
+	READ_TIMEOUT = 1
+
+	@staticmethod
+	@abstractmethod
+	def GetName() -> str:
+		pass
+
+	@staticmethod
+	@abstractmethod
+	def GetID() -> str:
+		pass
+
+	@staticmethod
+	def CheckAddress(Address: str) -> bool:
+		return True
+
+	@abstractmethod
+	def Open(self):
+		pass
+
+	@abstractmethod
+	def Close(self):
+		pass
+
+	@abstractmethod
+	def IsOpen(self) -> bool:
+		pass
+
+	@abstractmethod
+	def Read(self) -> List[InputFrame]:
+		pass
+
+
+class SerialInput(InputSource):
+
+	INPUT_NAME = 'COM порт'
+
+	@staticmethod
+	def GetID() -> str:
+		return 'Serial'
+
+	@staticmethod
+	def GetName() -> str:
+		return SerialInput.INPUT_NAME
+
+	def __init__(self, Port: str, baudrate: int, bytesize: int, parity: str, stopbits: float):
+		self.Serial = Serial(
+			baudrate=baudrate,
+			bytesize=bytesize,
+			parity=parity,
+			stopbits=stopbits,
+			timeout=self.FRAME_GAP
+		)
+		self.Serial.port = Port
+
+	def Open(self):
+		self.Serial.open()
+
+	def Close(self):
+		if self.Serial.is_open:
+			self.Serial.close()
+
+	def IsOpen(self) -> bool:
+		return self.Serial.is_open
+
+	#смена таймаута в pyserial каждый раз перенастраивает порт, поэтому меняем только при отличии:
+	#пока данных нет, порт не перенастраивается вовсе
+	def SetTimeout(self, Timeout: float):
+		if self.Serial.timeout != Timeout:
+			self.Serial.timeout = Timeout
+
+	def Read(self) -> List[InputFrame]:
+		self.SetTimeout(self.READ_TIMEOUT)
+		Data = bytearray(self.Serial.read(1))
+		if not Data:
+			return []
+		ReadTime = time.monotonic_ns()
+		self.SetTimeout(self.FRAME_GAP)
+		try:
+			Data += bytearray(self.Serial.read(self.FRAME_SIZE - 1))
+		except:
+			pass
+		return [InputFrame(Data=Data, Source=self.Serial.port, ReadTime=ReadTime)]
+
+
+class SocketInput(InputSource):
+
+	RECV_SIZE = 65536
+
+	def __init__(self, Address: str):
+		self.Address = Address
+		self.Selector: selectors.BaseSelector = None
+		self.Socket: socket.socket = None
+
+	@abstractmethod
+	def CreateSocket(self) -> socket.socket:
+		pass
+
+	@abstractmethod
+	def onReadable(self, Key: selectors.SelectorKey, Now: float) -> List[InputFrame]:
+		pass
+
+	def GetTimeout(self, Now: float) -> float:
+		return self.READ_TIMEOUT
+
+	def Flush(self, Now: float) -> List[InputFrame]:
+		return []
+
+	def Open(self):
+		self.Close()
+		self.Selector = selectors.DefaultSelector()
+		self.Socket = self.CreateSocket()
+		self.Socket.setblocking(False)
+		self.Selector.register(self.Socket, selectors.EVENT_READ, None)
+
+	def Close(self):
+		if self.Selector:
+			for Key in list(self.Selector.get_map().values()):
+				Key.fileobj.close()
+			self.Selector.close()
+		self.Selector = None
+		self.Socket = None
+
+	def IsOpen(self) -> bool:
+		return self.Socket is not None
+
+	def Read(self) -> List[InputFrame]:
+		Now = time.monotonic()
+		Frames = []
+		for Key, Mask in self.Selector.select(self.GetTimeout(Now)):
+			Frames += self.onReadable(Key, time.monotonic())
+		return Frames + self.Flush(time.monotonic())
+
+
+class StreamServerInput(SocketInput):
+
+	def __init__(self, Address: str):
+		super().__init__(Address)
+		self.Framers: Dict[socket.socket, GapFramer] = {}
+
+	def Close(self):
+		super().Close()
+		self.Framers = {}
+
+	def GetTimeout(self, Now: float) -> float:
+		Timeout = self.READ_TIMEOUT
+		for Framer in self.Framers.values():
+			if Framer.Buffer:
+				Timeout = min(Timeout, max(Framer.Deadline() - Now, 0))
+		return Timeout
+
+	def Accept(self):
+		try:
+			Client, _ = self.Socket.accept()
+		except (BlockingIOError, InterruptedError):
+			return
+		# клиент мог отключиться сразу после подключения, остальные соединения это не затрагивает
+		try:
+			Client.setblocking(False)
+			Source = self.GetPeerName(Client)
+		except OSError as err:
+			print(err)
+			Client.close()
+			return
+		self.Framers[Client] = GapFramer(self.FRAME_GAP, self.FRAME_SIZE, Source)
+		self.Selector.register(Client, selectors.EVENT_READ, Source)
+
+	def GetPeerName(self, Client: socket.socket) -> Any:
+		return Client.getpeername()
+
+	def Disconnect(self, Client: socket.socket, Now: float) -> List[InputFrame]:
+		Frame = self.Framers.pop(Client).Flush(Now, Force=True)
+		self.Selector.unregister(Client)
+		Client.close()
+		return [Frame] if Frame else []
+
+	def onReadable(self, Key: selectors.SelectorKey, Now: float) -> List[InputFrame]:
+		if Key.data is None:
+			self.Accept()
+			return []
+		Client = Key.fileobj
+		try:
+			Data = Client.recv(self.RECV_SIZE)
+		except (BlockingIOError, InterruptedError):
+			return []
+		except OSError:
+			return self.Disconnect(Client, Now)
+		if not Data:
+			return self.Disconnect(Client, Now)
+		return self.Framers[Client].Feed(Data, Now)
+
+	def Flush(self, Now: float) -> List[InputFrame]:
+		Frames = []
+		for Framer in self.Framers.values():
+			Frame = Framer.Flush(Now)
+			if Frame:
+				Frames.append(Frame)
+		return Frames
+
+
+def SplitHostPort(Address: str) -> Tuple[str, int]:
+	Host, _, Port = Address.rpartition(':')
+	return Host.strip('[]') or '0.0.0.0', int(Port)
+
+
+def GetFamily(Host: str) -> int:
+	return socket.AF_INET6 if ':' in Host else socket.AF_INET
+
+
+def CheckHostPort(Address: str) -> bool:
+	try:
+		_, Port = SplitHostPort(Address)
+		return 0 < Port < 65536
+	except:
+		return False
+
+
+class TCPInput(StreamServerInput):
+
+	INPUT_NAME = 'TCP сервер'
+	BACKLOG = 64
+
+	@staticmethod
+	def GetID() -> str:
+		return 'TCP'
+
+	@staticmethod
+	def GetName() -> str:
+		return TCPInput.INPUT_NAME
+
+	@staticmethod
+	def CheckAddress(Address: str) -> bool:
+		return CheckHostPort(Address)
+
+	def CreateSocket(self) -> socket.socket:
+		Host, Port = SplitHostPort(self.Address)
+		return socket.create_server((Host, Port), family=GetFamily(Host), backlog=self.BACKLOG)
+
+
+#удаляется только оставшийся сокет, обычный файл по тому же пути не трогаем
+def RemoveSocketFile(Address: str):
+	try:
+		if stat.S_ISSOCK(os.lstat(Address).st_mode):
+			os.remove(Address)
+	except FileNotFoundError:
+		pass
+
+
+class UnixInput(StreamServerInput):
+
+	INPUT_NAME = 'Unix сокет'
+	BACKLOG = 64
+
+	@staticmethod
+	def GetID() -> str:
+		return 'Unix'
+
+	@staticmethod
+	def GetName() -> str:
+		return UnixInput.INPUT_NAME
+
+	@staticmethod
+	def CheckAddress(Address: str) -> bool:
+		return hasattr(socket, 'AF_UNIX') and bool(Address) and os.path.isdir(os.path.dirname(os.path.abspath(Address)))
+
+	def CreateSocket(self) -> socket.socket:
+		RemoveSocketFile(self.Address)
+		Socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		Socket.bind(self.Address)
+		Socket.listen(self.BACKLOG)
+		return Socket
+
+	def GetPeerName(self, Client: socket.socket) -> Any:
+		return '%s#%d' % (self.Address, Client.fileno())
+
+	def Close(self):
+		Opened = self.IsOpen()
+		super().Close()
+		if Opened:
+			RemoveSocketFile(self.Address)
+
+
+class UDPInput(SocketInput):
+
+	INPUT_NAME = 'UDP'
+
+	@staticmethod
+	def GetID() -> str:
+		return 'UDP'
+
+	@staticmethod
+	def GetName() -> str:
+		return UDPInput.INPUT_NAME
+
+	@staticmethod
+	def CheckAddress(Address: str) -> bool:
+		return CheckHostPort(Address)
+
+	def CreateSocket(self) -> socket.socket:
+		Host, Port = SplitHostPort(self.Address)
+		Socket = socket.socket(GetFamily(Host), socket.SOCK_DGRAM)
+		Socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+		Socket.bind((Host, Port))
+		return Socket
+
+	def onReadable(self, Key: selectors.SelectorKey, Now: float) -> List[InputFrame]:
+		Frames = []
+		while True:
+			try:
+				Data, Source = self.Socket.recvfrom(self.RECV_SIZE)
+			except (BlockingIOError, InterruptedError):
+				return Frames
+			Frames.append(InputFrame(Data=bytearray(Data[:self.FRAME_SIZE]), Source=Source, ReadTime=time.monotonic_ns()))
+
+
+INPUT_CLASSES = [SerialInput, TCPInput, UDPInput, UnixInput]
@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+import sys
+import os
+import signal
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QTimer
+from Display import GasStationDisplay, path
+from MediaPlayer import MediaPlayer
+from Control import SignalNotifier
+
+
+#табло и медиаплеер в одном процессе и одном цикле событий: Qt, плагины мультимедиа, кэши стилей и картинок
+#загружаются один раз. окна видео не держатся поверх всех, поэтому табло с ценами всегда остаётся над роликами.
+#каждый компонент по-прежнему запускается и отдельно: Display.py run, MediaPlayer.py run.
+#SIGTERM в общем процессе обрабатывает только Launcher: он останавливает оба компонента и выходит
+class Launcher():
+
+	def __init__(self, Args):
+		self.app = QApplication.instance()
+		self.Args = Args
+		self.CreateMediaPlayer()
+		self.Display = GasStationDisplay(Args, HandleSignals=False)
+		self.RaiseDisplay()
+		signal.signal(signal.SIGTERM, self.onTerminate)
+		self.Signals = SignalNotifier()
+
+	def CreateMediaPlayer(self):
+		self.MediaPlayer = MediaPlayer(self.Args, StayOnTop=False, onRestart=self.onRestartMediaPlayer, HandleSignals=False)
+
+	def RaiseDisplay(self):
+		Widget = getattr(self.Display, 'Widget', None)
+		if Widget:
+			Widget.raise_()
+
+	#сторож медиаплеера перезапускает только медиаплеер: перезапуск процесса убрал бы и табло с ценами.
+	#новый медиаплеер создаётся после выхода из обработчика сторожа старого
+	def onRestartMediaPlayer(self):
+		QTimer.singleShot(0, self.RestartMediaPlayer)
+
+	def RestartMediaPlayer(self):
+		self.MediaPlayer.Release()
+		self.CreateMediaPlayer()
+		self.RaiseDisplay()
+
+	#мягкая остановка по SIGTERM (например, от Supervisor.py)
+	def onTerminate(self, signum, frame):
+		QTimer.singleShot(0, self.Quit)
+
+	def Quit(self):
+		self.MediaPlayer.Shutdown()
+		self.Display.Shutdown()
+		QApplication.quit()
+
+
+if __name__ == '__main__':
+	os.chdir(path)
+	app = QApplication(sys.argv)
+	Kiosk = Launcher(sys.argv)
+	sys.exit(app.exec_())
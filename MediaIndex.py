@@ -0,0 +1,122 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+import os
+import sqlite3
+import time
+from dataclasses import dataclass, astuple, fields
+from typing import Dict, List
+from MediaVerify import ProbeError, ProbeMedia
+
+
+@dataclass
+class MediaEntry():
+    Name: str
+    Size: int
+    MTime: int
+    Format: str = ''
+    Duration: float = 0
+    Width: int = 0
+    Height: int = 0
+    Codec: str = ''
+    Error: str = ''
+    # время последнего показа, для вытеснения давно не показанных роликов
+    LastPlayed: float = 0
+
+
+#индекс медиатеки: файлы проверяются один раз и пересматриваются, только если изменились размер или время изменения.
+#индекс ведётся по имени файла, поэтому переживает подмену поколения медиатеки (жёсткие ссылки сохраняют mtime)
+class MediaIndex():
+
+    COLUMNS = [Field.name for Field in fields(MediaEntry)]
+    # время показа пишется на SD карту не чаще раза в FLUSH_PERIOD секунд и при закрытии
+    FLUSH_PERIOD = 15 * 60
+
+    def __init__(self, FileName: str):
+        self.FileName = FileName
+        self.Connection = sqlite3.connect(FileName)
+        # индекс - это кэш, при смене набора колонок он строится заново
+        Columns = [Row[1] for Row in self.Connection.execute('PRAGMA table_info(Media)')]
+        if Columns and Columns != self.COLUMNS:
+            self.Connection.execute('DROP TABLE Media')
+        self.Connection.execute('CREATE TABLE IF NOT EXISTS Media (%s, PRIMARY KEY (Name))' % ', '.join(self.COLUMNS))
+        self.Entries: Dict[str, MediaEntry] = {
+            Row[0]: MediaEntry(*Row) for Row in self.Connection.execute('SELECT %s FROM Media' % ', '.join(self.COLUMNS))
+        }
+        self.Played = set()
+        self.FlushTime = time.monotonic()
+
+    def Close(self):
+        self.Flush()
+        self.Connection.close()
+
+    #новый ролик считается показанным в момент проверки, иначе он первым уйдёт при вытеснении
+    def Probe(self, Name: str, FileName: str, st: os.stat_result, LastPlayed: float) -> MediaEntry:
+        Entry = MediaEntry(Name=Name, Size=st.st_size, MTime=st.st_mtime_ns, LastPlayed=LastPlayed)
+        try:
+            Info = ProbeMedia(FileName)
+            Entry.Format, Entry.Duration, Entry.Width, Entry.Height, Entry.Codec = \
+                Info.Format, Info.Duration, Info.Width, Info.Height, Info.Codec
+        except (ProbeError, OSError) as err:
+            Entry.Error = str(err)
+        return Entry
+
+    #сверка индекса с папкой: новые и изменённые файлы проверяются, исчезнувшие удаляются.
+    #возвращает True, если состав или содержимое медиатеки изменились; если папку прочитать не удалось, индекс не меняется
+    def Scan(self, MediaDir: str, MediaExtensions: List[str]) -> bool:
+        Extensions = tuple(MediaExtensions)
+        Found = {}
+        Changed = []
+        try:
+            with os.scandir(MediaDir) as it:
+                for item in it:
+                    if not item.name.lower().endswith(Extensions) or not item.is_file():
+                        continue
+                    st = item.stat()
+                    Found[item.name] = st
+                    Entry = self.Entries.get(item.name)
+                    if not Entry or Entry.Size != st.st_size or Entry.MTime != st.st_mtime_ns:
+                        Changed.append(self.Probe(item.name, item.path, st, Entry.LastPlayed if Entry else time.time()))
+        except OSError as err:
+            # недоступная папка - не повод считать медиатеку пустой
+            print(err)
+            return False
+        Removed = [Name for Name in self.Entries if Name not in Found]
+        if not Changed and not Removed:
+            return False
+        with self.Connection:
+            self.Connection.executemany('DELETE FROM Media WHERE Name = ?', [(Name,) for Name in Removed])
+            self.Connection.executemany('INSERT OR REPLACE INTO Media VALUES (%s)' % ', '.join('?' * len(self.COLUMNS)),
+                                        [astuple(Entry) for Entry in Changed])
+        for Name in Removed:
+            del self.Entries[Name]
+        for Entry in Changed:
+            self.Entries[Entry.Name] = Entry
+        return True
+
+    def Touch(self, Name: str):
+        Entry = self.Entries.get(Name)
+        if not Entry:
+            return
+        Entry.LastPlayed = time.time()
+        self.Played.add(Name)
+        if time.monotonic() - self.FlushTime >= self.FLUSH_PERIOD:
+            self.Flush()
+
+    def Flush(self):
+        self.FlushTime = time.monotonic()
+        Played = [(self.Entries[Name].LastPlayed, Name) for Name in self.Played if Name in self.Entries]
+        self.Played = set()
+        if not Played:
+            return
+        with self.Connection:
+            self.Connection.executemany('UPDATE Media SET LastPlayed = ? WHERE Name = ?', Played)
+
+    def GetLastPlayed(self) -> Dict[str, float]:
+        return {Name: Entry.LastPlayed for Name, Entry in self.Entries.items()}
+
+    def GetEntries(self) -> List[MediaEntry]:
+        return [self.Entries[Name] for Name in sorted(self.Entries)]
+
+    # файлы, которые не прошли проверку, в плейлист не попадают, пока не изменятся
+    def GetFiles(self, MediaDir: str) -> List[str]:
+        return [os.path.join(MediaDir, Name) for Name in sorted(self.Entries) if not self.Entries[Name].Error]
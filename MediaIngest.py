@@ -0,0 +1,273 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+import os
+import errno
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock
+from typing import Any, Callable, Dict, List, Tuple
+from PyQt5.QtCore import QThread, pyqtSignal
+from MediaSync import Manifest, PlanSync, SyncCancelled, SyncPlan
+from MediaLibrary import MediaLibrary
+from MediaStorage import MediaStorage
+from MediaVerify import VerifyFiles
+
+
+class IngestCancelled(Exception):
+    pass
+
+
+CHUNK_SIZE = 8 * 1024 * 1024
+PART_SUFFIX = '.part'
+
+
+def CopyRange(fsrc: int, fdst: int, Offset: int, Count: int) -> int:
+    return os.copy_file_range(fsrc, fdst, Count, Offset, Offset)
+
+
+def SendFile(fsrc: int, fdst: int, Offset: int, Count: int) -> int:
+    os.lseek(fdst, Offset, os.SEEK_SET)
+    return os.sendfile(fdst, fsrc, Offset, Count)
+
+
+def ReadWrite(fsrc: int, fdst: int, Offset: int, Count: int) -> int:
+    return os.pwrite(fdst, os.pread(fsrc, Count, Offset), Offset)
+
+
+COPY_METHODS = [Method for Name, Method in [('copy_file_range', CopyRange), ('sendfile', SendFile)] if hasattr(os, Name)] + [ReadWrite]
+#ошибки, при которых метод копирования не поддерживается для этой пары файлов
+UNSUPPORTED_ERRORS = [errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP]
+
+
+#копирование файла средствами ядра (copy_file_range / sendfile) большими блоками, без буферов python
+def CopyFile(Src: str, Dst: str, Cancel: Event = None, onProgress: Callable[[int], Any] = None) -> int:
+    Part = Dst + PART_SUFFIX
+    Copied = 0
+    Methods = list(COPY_METHODS)
+    try:
+        with open(Src, 'rb') as fsrc, open(Part, 'wb') as fdst:
+            Size = os.fstat(fsrc.fileno()).st_size
+            while Copied < Size:
+                if Cancel and Cancel.is_set():
+                    raise IngestCancelled(Src)
+                try:
+                    n = Methods[0](fsrc.fileno(), fdst.fileno(), Copied, min(CHUNK_SIZE, Size - Copied))
+                except OSError as err:
+                    if err.errno not in UNSUPPORTED_ERRORS or len(Methods) == 1:
+                        raise
+                    Methods.pop(0)
+                    continue
+                if not n:
+                    break
+                Copied += n
+                if onProgress:
+                    onProgress(n)
+            # данные должны быть на диске раньше, чем файл получит своё имя
+            os.fsync(fdst.fileno())
+        os.replace(Part, Dst)
+        st = os.stat(Src)
+        os.utime(Dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+    except BaseException:
+        if os.path.exists(Part):
+            os.remove(Part)
+        raise
+    return Copied
+
+
+class IngestWorker(QThread):
+
+    PROGRESS_PERIOD = 0.25
+
+    # файлов скопировано, всего файлов, байт скопировано, всего байт, байт/с
+    Progress = pyqtSignal(int, int, float, float, float)
+    # количество проверяемых файлов
+    Verifying = pyqtSignal(int)
+    # файл, причина
+    Quarantined = pyqtSignal(str, str)
+    # файл медиатеки, не перенесённый в новое поколение
+    Evicted = pyqtSignal(str)
+    # новый файл, не поместившийся в медиатеку
+    Skipped = pyqtSignal(str)
+    # успешно ли завершено, подменена ли медиатека
+    Done = pyqtSignal(bool, bool)
+
+    def __init__(self, Sources: List[str], Library: MediaLibrary, GetMediaFiles: Callable[[str], List[str]],
+                 Storage: MediaStorage = None, LastPlayed: Dict[str, float] = None, GetCurrentFile: Callable[[], str] = None,
+                 MediaExtensions: List[str] = None, Names: List[str] = None, parent=None):
+        super().__init__(parent)
+        self.Sources = Sources
+        self.Library = Library
+        self.Storage = Storage
+        self.LastPlayed = LastPlayed or {}
+        self.GetCurrentFile = GetCurrentFile or (lambda: None)
+        # вытесняются только ролики: расписание и прочие служебные файлы не показываются и всегда выглядели бы давно забытыми
+        self.MediaExtensions = tuple(MediaExtensions or [])
+        # повторный проход копирует только отложенные файлы: вытесненные не должны вернуться и вытеснить другие
+        self.Names = Names
+        self.Target: str = None
+        # новые файлы, которые поместятся только после удаления старого поколения
+        self.Deferred: List[str] = []
+        self.GetMediaFiles = GetMediaFiles
+        self.Cancels: Dict[str, Event] = {Source: Event() for Source in Sources}
+        self.PlanCancel = Event()
+        self.Lock = Lock()
+        self.FilesDone = 0
+        self.FilesTotal = 0
+        self.BytesDone = 0
+        self.BytesTotal = 0
+        self.LastProgress = 0
+
+    def Cancel(self, Sources: List[str] = None):
+        for Source, Cancel in self.Cancels.items():
+            if Sources is None or Source in Sources:
+                Cancel.set()
+                self.PlanCancel.set()
+
+    def onBytes(self, Count: int):
+        with self.Lock:
+            self.BytesDone += Count
+            Now = time.monotonic()
+            if Now - self.LastProgress < self.PROGRESS_PERIOD:
+                return
+            self.LastProgress = Now
+        self.EmitProgress()
+
+    def EmitProgress(self):
+        Elapsed = time.monotonic() - self.Started
+        self.Progress.emit(self.FilesDone, self.FilesTotal, float(self.BytesDone), float(self.BytesTotal),
+                           self.BytesDone / Elapsed if Elapsed > 0 else 0.0)
+
+    def LinkFiles(self, Current: str, Names: List[str]):
+        for Name in Names:
+            try:
+                os.link(os.path.join(Current, Name), os.path.join(self.Target, Name))
+            except OSError:
+                CopyFile(os.path.join(Current, Name), os.path.join(self.Target, Name))
+
+    #сверка копий с источником и проверка контейнера; повреждённые файлы уходят в карантин
+    def VerifyCopies(self, Files: List[Tuple[str, str]]) -> List[str]:
+        self.Verifying.emit(len(Files))
+        Good = []
+        for res in VerifyFiles([(File, os.path.join(self.Target, Name)) for File, Name in Files], self.PlanCancel):
+            if res.Error:
+                self.Quarantined.emit(self.Library.Quarantine(res.Target), res.Error)
+            else:
+                Good.append(os.path.basename(res.Target))
+        return Good
+
+    #место считается для собираемого поколения: неизменённые файлы переходят в него жёсткими ссылками и занимают
+    #только квоту, копии - и квоту, и диск. если новые файлы не помещаются в квоту или на диск, давно не показанные
+    #файлы не переносятся в новое поколение; текущий ролик переносится всегда. текущая медиатека при этом не меняется,
+    #место на диске освобождается вместе со старым поколением после подмены. копии, которым хватит места только
+    #после этого, откладываются в Deferred до следующего прохода; то, что не поместится и тогда, не копируется
+    def FitStorage(self, Current: str, Plan: SyncPlan):
+        if not self.Storage:
+            return
+        Sizes = {Name: os.path.getsize(os.path.join(Current, Name)) for Name in Plan.Keep}
+        Used = sum(Sizes.values())
+        Need = sum(os.path.getsize(File) for File, Name in Plan.Copy)
+        Free = self.Storage.GetFree(Current)
+        Freed = 0
+        CurrentFile = self.GetCurrentFile()
+        Candidates = [Name for Name in Plan.Keep if Name.lower().endswith(self.MediaExtensions)]
+        for Name in sorted(Candidates, key=lambda Name: self.LastPlayed.get(Name, 0)):
+            if self.Storage.GetQuotaLeft(Used) >= Need and Free + Freed >= Need:
+                break
+            if CurrentFile and os.path.basename(CurrentFile) == Name:
+                continue
+            Plan.Keep.remove(Name)
+            Used -= Sizes[Name]
+            Freed += Sizes[Name]
+            self.Evicted.emit(Name)
+        QuotaLeft = self.Storage.GetQuotaLeft(Used)
+        FreeLater = Free + Freed
+        Copy = []
+        for File, Name in Plan.Copy:
+            Size = os.path.getsize(File)
+            if Size > QuotaLeft or Size > FreeLater:
+                self.Skipped.emit(Name)
+                continue
+            if Size <= Free:
+                Copy.append((File, Name))
+                Free -= Size
+            else:
+                self.Deferred.append(Name)
+            QuotaLeft -= Size
+            FreeLater -= Size
+        Plan.Copy = Copy
+
+    def CheckStaging(self, Library: Manifest, Names: List[str]) -> bool:
+        for Name in Names:
+            Entry = Library.Entries.get(Name)
+            FileName = os.path.join(self.Target, Name)
+            if not Entry or not os.path.isfile(FileName) or os.path.getsize(FileName) != Entry.Size:
+                print('staging check failed: %s' % FileName)
+                return False
+        return True
+
+    def CopySource(self, Source: str, Files: List[Tuple[str, str]]):
+        for File, Name in Files:
+            CopyFile(File, os.path.join(self.Target, Name), self.Cancels[Source], self.onBytes)
+            with self.Lock:
+                self.FilesDone += 1
+            self.EmitProgress()
+
+    #новая медиатека собирается в отдельном поколении: неизменённые файлы - жёсткие ссылки на текущие,
+    #новые и изменённые копируются; текущая медиатека не трогается, пока новая не проверена
+    def run(self):
+        self.Started = time.monotonic()
+        try:
+            Current = self.Library.GetCurrentDir()
+            CurrentLibrary = Manifest(Current)
+            SourceFiles = {File: Source for Source in self.Sources for File in self.GetMediaFiles(Source)}
+            Plan = PlanSync(list(SourceFiles), self.GetMediaFiles(Current), CurrentLibrary, self.PlanCancel)
+            if self.Names is not None:
+                Plan.Copy = [(File, Name) for File, Name in Plan.Copy if Name in self.Names]
+            if not Plan.Copy and not Plan.Remove:
+                CurrentLibrary.Save()
+                self.Done.emit(True, False)
+                return
+            self.FitStorage(Current, Plan)
+            Jobs: Dict[str, List[Tuple[str, str]]] = {}
+            for File, Name in Plan.Copy:
+                Jobs.setdefault(SourceFiles[File], []).append((File, Name))
+            self.FilesTotal = len(Plan.Copy)
+            self.BytesTotal = sum(os.path.getsize(File) for File, Name in Plan.Copy)
+            self.Target = self.Library.CreateStaging()
+            self.LinkFiles(Current, Plan.Keep)
+            self.Started = time.monotonic()
+            with ThreadPoolExecutor(max_workers=max(len(Jobs), 1)) as Executor:
+                Futures = [Executor.submit(self.CopySource, Source, Files) for Source, Files in Jobs.items()]
+                Errors = [Future.exception() for Future in Futures]
+            for err in Errors:
+                if err and not isinstance(err, IngestCancelled):
+                    print(err)
+            if any(Errors):
+                self.AbortStaging()
+                self.Done.emit(False, False)
+                return
+            Copied = self.VerifyCopies(Plan.Copy)
+            StagingLibrary = Manifest(self.Target)
+            for Name in Plan.Keep:
+                Entry = CurrentLibrary.Entries.get(Name)
+                StagingLibrary.Update(Name, Entry.Hash if Entry else None)
+            for Name in Copied:
+                StagingLibrary.Update(Name)
+            if not self.CheckStaging(StagingLibrary, Plan.Keep + Copied):
+                self.AbortStaging()
+                self.Done.emit(False, False)
+                return
+            StagingLibrary.Save()
+            self.Library.Switch(self.Target)
+            self.Done.emit(True, True)
+        except SyncCancelled:
+            self.AbortStaging()
+            self.Done.emit(False, False)
+        except Exception as err:
+            print(err)
+            self.AbortStaging()
+            self.Done.emit(False, False)
+
+    def AbortStaging(self):
+        if self.Target:
+            self.Library.Abort(self.Target)
@@ -0,0 +1,94 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+import os
+import shutil
+from typing import List
+
+
+#сброс записей каталога на диск: иначе после сбоя питания ссылка может указывать на незаписанное поколение
+def SyncDir(Path: str):
+    fd = os.open(Path, os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0))
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+#медиатека хранится поколениями в <MediaPath>.library/<N>, а MediaPath - символическая ссылка на текущее.
+#новое поколение собирается рядом, пока играет текущее, и подменяется одной атомарной заменой ссылки
+class MediaLibrary():
+
+    GENERATIONS_SUFFIX = '.library'
+    LINK_SUFFIX = '.new'
+    QUARANTINE_SUFFIX = '.quarantine'
+    INDEX_SUFFIX = '.index.sqlite'
+
+    def __init__(self, Path: str):
+        self.Path = os.path.abspath(os.path.expanduser(Path)).rstrip(os.sep)
+        self.Generations = self.Path + self.GENERATIONS_SUFFIX
+        self.QuarantineDir = self.Path + self.QUARANTINE_SUFFIX
+        self.IndexFile = self.Path + self.INDEX_SUFFIX
+        self.Staging = set()
+
+    def GetCurrentDir(self) -> str:
+        return os.path.realpath(self.Path)
+
+    def GetGenerations(self) -> List[str]:
+        if not os.path.isdir(self.Generations):
+            return []
+        return [os.path.join(self.Generations, Name) for Name in os.listdir(self.Generations) if Name.isdigit()]
+
+    def NewGeneration(self) -> str:
+        Numbers = [int(os.path.basename(Generation)) for Generation in self.GetGenerations()]
+        Generation = os.path.join(self.Generations, str(max(Numbers, default=0) + 1))
+        os.makedirs(Generation)
+        return Generation
+
+    def Prepare(self):
+        os.makedirs(self.Generations, exist_ok=True)
+        if os.path.islink(self.Path) and os.path.isdir(self.Path):
+            self.Cleanup()
+            return
+        if os.path.islink(self.Path):
+            os.remove(self.Path)
+        if os.path.isdir(self.Path):
+            # перенос медиатеки, созданной до появления поколений
+            Generation = os.path.join(self.Generations, str(max(
+                [int(os.path.basename(Generation)) for Generation in self.GetGenerations()], default=0) + 1))
+            os.rename(self.Path, Generation)
+        else:
+            Generation = self.NewGeneration()
+        self.Switch(Generation)
+
+    def CreateStaging(self) -> str:
+        Generation = self.NewGeneration()
+        self.Staging.add(Generation)
+        return Generation
+
+    def Switch(self, Generation: str):
+        Link = self.Path + self.LINK_SUFFIX
+        if os.path.lexists(Link):
+            os.remove(Link)
+        SyncDir(Generation)
+        os.symlink(Generation, Link)
+        os.replace(Link, self.Path)
+        SyncDir(os.path.dirname(self.Path))
+        self.Staging.discard(Generation)
+
+    def Abort(self, Generation: str):
+        shutil.rmtree(Generation, ignore_errors=True)
+        self.Staging.discard(Generation)
+
+    #повреждённые файлы убираются из поколения до того, как оно попадёт в плейлист
+    def Quarantine(self, FileName: str) -> str:
+        os.makedirs(self.QuarantineDir, exist_ok=True)
+        Target = os.path.join(self.QuarantineDir, os.path.basename(FileName))
+        os.replace(FileName, Target)
+        return Target
+
+    #удаление всех поколений, кроме текущего и собираемых; вызывается, когда плейлист уже перестроен на текущее
+    def Cleanup(self):
+        Current = self.GetCurrentDir()
+        for Generation in self.GetGenerations():
+            if os.path.realpath(Generation) != Current and Generation not in self.Staging:
+                shutil.rmtree(Generation, ignore_errors=True)
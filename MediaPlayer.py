@@ -2,26 +2,34 @@
 # -*- coding: utf-8 -*-
 import sys
 import os
-import shutil
-from typing import List
+import time
+import signal
+import datetime
+from typing import Any, Callable, List, Tuple
 from PyQt5.QtWidgets import QApplication, QGridLayout, QWidget, QLabel, QPushButton, QHBoxLayout, QSizePolicy
 from PyQt5 import QtWidgets
 from PyQt5.QtGui import QResizeEvent, QMoveEvent
-from PyQt5.QtCore import Qt, QUrl, QTimer
-from PyQt5.QtMultimedia import QMediaContent, QMediaPlayer, QMediaPlaylist
-from PyQt5.QtMultimediaWidgets import QVideoWidget
-import psutil
+from PyQt5.QtCore import Qt, QFileSystemWatcher, QTimer
 from Settings import WidgetPosition, BoolOption, StrOption
 from lib import LoadJSON, UpdateJSON
+from MountWatcher import MountWatcher
+from MediaIngest import IngestWorker
+from MediaLibrary import MediaLibrary
+from MediaIndex import MediaIndex
+from MediaStorage import MediaStorage
+from MediaSchedule import MediaSchedule, SCHEDULE_FILE_NAME
+from GaplessPlayer import GaplessPlayer
+from PlaybackWatchdog import PlaybackWatchdog
+from PlaybackSync import PlaybackSync
 
 path, _ = os.path.split(os.path.abspath(__file__))
-os.chdir(path)
 
 class MediaPlayer():
 
     ON_RUN = 'run'
     ON_SETTINGS = 'settings'
     SETTINGS_FILE_NAME = os.path.join(path, 'MediaPlayer.json')
+    METRICS_FILE_NAME = os.path.join(path, 'MediaPlayerMetrics.json')
     MEDIA_PATH = 'MediaPlayer'
     USER_HOME = '~'
     SETTINGS_SCREEN = 'Screen'
@@ -31,6 +39,14 @@ class MediaPlayer():
     SETTINGS_USB_PATH = 'USBPath'
     SETTINGS_MEDIA_PATH = 'MediaPath'
     SETTINGS_DISPLAY_POSITION = 'DisplayPosition'
+    SETTINGS_GAPLESS = 'Gapless'
+    SETTINGS_SYNC_ROLE = 'SyncRole'
+    SETTINGS_SYNC_ADDRESS = 'SyncAddress'
+    DEFAULT_SYNC_ADDRESS = '239.255.77.77:5710'
+    SETTINGS_QUOTA = 'QuotaMB'
+    SETTINGS_FREE_SPACE = 'FreeSpaceMB'
+    DEFAULT_QUOTA = 0
+    DEFAULT_FREE_SPACE = 512
     MEDIA_EXTENSIONS = ['.avi', '.mp4', '.wmv']
     DEFAULT_USB_PATH = os.sep + 'MediaPlayer'
     DEFAULT_DISPLAY_POSITION = {
@@ -47,8 +63,8 @@ class MediaPlayer():
     SETTINGS_TITLE = 'MediaPlayer'
     BSAVE_CAPTION = 'Сохранить'
     CAPTION_NO_MEDIA_FILES = 'Нет медиа - файлов.'
-    CAPTION_COPY_FILE = 'Копирование файлов из:\n%s\nСкопировано файлов %d из %d.'
-    CAPDION_DELETE_FILE = 'Удаление файлов с диска %d / %d.'
+    CAPTION_VERIFY_FILES = 'Проверка скопированных файлов: %d.'
+    CAPTION_COPY_FILE = 'Копирование файлов из:\n%s\nСкопировано файлов %d из %d.\n%.1f МБ/с, осталось %d с.'
     DISPLAY_CAPTION_STYLE = 'font-size: 24pt; color: green; background-color: black;'
 
     def LoadSettings(self):
@@ -63,6 +79,20 @@ class MediaPlayer():
             self.Settings[self.SETTINGS_USE_USB] = True
         if self.SETTINGS_USB_PATH not in self.Settings:
             self.Settings[self.SETTINGS_USB_PATH] = self.DEFAULT_USB_PATH
+        if self.SETTINGS_GAPLESS not in self.Settings:
+            self.Settings[self.SETTINGS_GAPLESS] = True
+        if self.SETTINGS_SYNC_ROLE not in self.Settings:
+            self.Settings[self.SETTINGS_SYNC_ROLE] = ''
+        if self.SETTINGS_SYNC_ADDRESS not in self.Settings:
+            self.Settings[self.SETTINGS_SYNC_ADDRESS] = self.DEFAULT_SYNC_ADDRESS
+        # роль в синхронном показе можно задать в командной строке: несколько экранов с одной папкой настроек
+        for Role in PlaybackSync.ROLES:
+            if Role in self.Args:
+                self.Settings[self.SETTINGS_SYNC_ROLE] = Role
+        if self.SETTINGS_QUOTA not in self.Settings:
+            self.Settings[self.SETTINGS_QUOTA] = self.DEFAULT_QUOTA
+        if self.SETTINGS_FREE_SPACE not in self.Settings:
+            self.Settings[self.SETTINGS_FREE_SPACE] = self.DEFAULT_FREE_SPACE
         if self.SETTINGS_DISPLAY_POSITION not in self.Settings:
             self.Settings[self.SETTINGS_DISPLAY_POSITION] = self.DEFAULT_DISPLAY_POSITION
         if self.SETTINGS_POSITION not in self.Settings:
@@ -79,47 +109,129 @@ class MediaPlayer():
         Left = int(self.ScreenWidth * self.Settings[self.SETTINGS_DISPLAY_POSITION][WidgetPosition.POSITION_LEFT] / 100)
         Top = int(self.ScreenHeight * self.Settings[self.SETTINGS_DISPLAY_POSITION][WidgetPosition.POSITION_TOP] / 100)
         Widget.setGeometry(Left, Top, Width, Height)
-        Widget.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint)
+        Widget.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint if self.StayOnTop else Qt.FramelessWindowHint)
 
     def StopPlay(self):
-        self.MediaPlayer.stop()
+        self.Player.Stop()
         self.LCaptionMessage.setText('')
         self.MessageDisplay.show()
         self.VideoWidget.hide()
 
-    def onMediaPlayerError(self, error):
-        print("Error: " + self.MediaPlayer.errorString())
+    def onMediaPlayerError(self, error: str):
+        print("Error: " + error)
 
+    #плейлист строится по реальному пути поколения, чтобы подмена медиатеки не ломала текущий плейлист
     def StartPlay(self):
-        self.MediaPlayList.clear()
-        self.MediaFiles = self.GetMediaFiles(self.Settings[self.SETTINGS_MEDIA_PATH], self.MEDIA_EXTENSIONS)
-        for MediaFile in self.GetMediaFiles(self.Settings[self.SETTINGS_MEDIA_PATH], self.MEDIA_EXTENSIONS):
-            self.MediaPlayList.addMedia(QMediaContent(QUrl.fromLocalFile(MediaFile)))
-        self.MediaPlayer.setPlaylist(self.MediaPlayList)
-        self.MediaPlayer.playlist().setCurrentIndex(0)
-        self.MediaPlayList.setPlaybackMode(QMediaPlaylist.PlaybackMode.Loop)
+        Current = self.Library.GetCurrentDir()
+        self.WatchLibrary(Current)
+        self.Index.Scan(Current, self.MEDIA_EXTENSIONS)
+        self.LibraryFiles = self.Index.GetFiles(Current)
+        self.Schedule = MediaSchedule(os.path.join(Current, SCHEDULE_FILE_NAME))
+        self.Timeline = self.Schedule.BuildTimeline(datetime.date.today(), self.LibraryFiles)
+        self.MediaFiles = None
+        self.ApplySchedule()
+        # старое поколение удаляется, когда из него доиграл последний ролик
+        if self.IsPlaying():
+            self.PendingCleanup = True
+        else:
+            self.CleanupLibrary()
+
+    def CleanupLibrary(self):
+        self.PendingCleanup = False
+        self.Library.Cleanup()
+        # старое поколение удалено, теперь отложенным копиям хватит места
+        if self.FollowUp:
+            Disks, Names = self.FollowUp
+            self.FollowUp = None
+            Disks = [Disk for Disk in Disks if os.path.isdir(Disk)]
+            if Disks:
+                self.StartIngest(Disks, Names)
+
+    #плейлист текущего отрезка расписания ищется двоичным поиском по заранее построенным отрезкам суток,
+    #а таймер взводится ровно до следующей границы. идущий ролик не обрывается: новый плейлист начинается
+    #с обычного перехода к следующему ролику
+    def ApplySchedule(self):
+        Now = time.time()
+        if Now >= self.Timeline.End:
+            self.Timeline = self.Schedule.BuildTimeline(datetime.date.today(), self.LibraryFiles)
+        self.ScheduleTimer.start(int((self.Timeline.GetNextSwitch(Now) - Now) * 1000) + 1)
+        Playlist = self.Timeline.Playlists[self.Timeline.GetIndex(Now)] if self.Timeline.Playlists else []
+        if Playlist == self.MediaFiles:
+            return
+        self.MediaFiles = Playlist
+        if self.IsPlaying():
+            self.Player.SetNext(self.MediaFiles)
+            return
+        self.Player.SetFiles(self.MediaFiles)
         if len(self.MediaFiles):
             self.MessageDisplay.hide()
-            self.MediaPlayer.play()
+            self.Player.Play()
             self.VideoWidget.show()
-            print(self.MediaPlayer.errorString())
         else:
-            self.LCaptionMessage.setText(self.CAPTION_NO_MEDIA_FILES)
-            self.VideoWidget.hide()
-            self.MessageDisplay.show()
+            self.ShowNoMedia()
+
+    def ShowNoMedia(self):
+        self.LCaptionMessage.setText(self.CAPTION_NO_MEDIA_FILES)
+        self.VideoWidget.hide()
+        self.MessageDisplay.show()
+
+    def WatchLibrary(self, Current: str):
+        Dirs = self.LibraryWatcher.directories()
+        if Dirs == [Current]:
+            return
+        if Dirs:
+            self.LibraryWatcher.removePaths(Dirs)
+        self.LibraryWatcher.addPath(Current)
+
+    #файлы, положенные в медиатеку вручную, попадают в индекс по событию изменения папки
+    def onLibraryChanged(self, MediaDir: str):
+        if MediaDir != self.Library.GetCurrentDir() or not self.Index.Scan(MediaDir, self.MEDIA_EXTENSIONS):
+            return
+        self.StartPlay()
+
+    def IsPlaying(self) -> bool:
+        return self.Player.IsPlaying()
+
+    #индекс - в плейлисте, который играет сейчас: новый плейлист мог быть задан до перехода на него
+    def onCurrentMediaChanged(self, Index: int):
+        if Index < 0:
+            self.ShowNoMedia()
+        else:
+            self.Index.Touch(os.path.basename(self.Player.Files[Index]))
+        if self.PendingCleanup and self.Player.NextFiles is None:
+            self.CleanupLibrary()
 
     #запуск воспроизведения
     def onRun(self):
         self.Terminated = False
-        self.MediaPlayer = QMediaPlayer(None, QMediaPlayer.VideoSurface)
-        self.VideoWidget = QVideoWidget()
-        self.MediaPlayList = QMediaPlaylist(self.MediaPlayer)
-        self.MediaPlayer.setVideoOutput(self.VideoWidget)
+        self.Ingest: IngestWorker = None
+        # источники и файлы повторного прохода копирования после удаления старого поколения
+        self.FollowUp: Tuple[List[str], List[str]] = None
+        self.PendingCleanup = False
+        self.ScheduleTimer = QTimer()
+        self.ScheduleTimer.setSingleShot(True)
+        self.ScheduleTimer.timeout.connect(self.ApplySchedule)
+        self.Library = MediaLibrary(self.Settings[self.SETTINGS_MEDIA_PATH])
+        self.Library.Prepare()
+        self.Index = MediaIndex(self.Library.IndexFile)
+        self.Storage = MediaStorage(self.Settings[self.SETTINGS_QUOTA], self.Settings[self.SETTINGS_FREE_SPACE])
+        self.LibraryWatcher = QFileSystemWatcher()
+        self.LibraryWatcher.directoryChanged.connect(self.onLibraryChanged)
+        self.Player = GaplessPlayer(self.Settings[self.SETTINGS_GAPLESS])
+        self.Player.CurrentChanged.connect(self.onCurrentMediaChanged)
+        self.Player.Error.connect(self.onMediaPlayerError)
+        self.VideoWidget = self.Player.Widget
+        self.Watchdog = PlaybackWatchdog(self.Player, self.METRICS_FILE_NAME, self.RestartProcess)
+        self.Watchdog.Start()
+        self.Sync: PlaybackSync = None
+        if self.Settings[self.SETTINGS_SYNC_ROLE] in PlaybackSync.ROLES:
+            self.Sync = PlaybackSync(self.Player, self.Settings[self.SETTINGS_SYNC_ROLE], self.Settings[self.SETTINGS_SYNC_ADDRESS])
+            self.Sync.Start()
         self.SetWidgetPosition(self.VideoWidget)
-        self.InstallMediaThread = QTimer()
-        self.oldDisks = self.GetMediaPaths()
-        self.InstallMediaThread.timeout.connect(self.InstallMediaThreadRun)
-        self.InstallMediaThread.start(5000)
+        self.InstallMediaThread = MountWatcher()
+        self.InstallMediaThread.MountsChanged.connect(self.InstallMediaThreadRun)
+        if self.Settings[self.SETTINGS_USE_USB]:
+            self.InstallMediaThread.start()
         self.MessageDisplay = QWidget()                     # окно для показа сообщений, если нет медиа - файлов или происходит их загрузка
         hbox = QHBoxLayout()
         self.LCaptionMessage = QLabel(parent=self.MessageDisplay)
@@ -131,32 +243,106 @@ class MediaPlayer():
         self.SetWidgetPosition(self.MessageDisplay)
         self.MessageDisplay.setLayout(hbox)
         self.VideoWidget.closeEvent = self.onMediaPlayerClose
+        if self.HandleSignals:
+            signal.signal(signal.SIGTERM, self.onTerminate)
         self.StartPlay()
 
-    def onMediaPlayerClose(self):
+    #мягкая остановка по SIGTERM (например, от Supervisor.py): копирование прерывается, метрики сохраняются
+    def onTerminate(self, signum, frame):
+        QTimer.singleShot(0, self.Quit)
+
+    def Quit(self):
+        self.Shutdown()
+        QApplication.quit()
+
+    #остановка без выхода из цикла событий
+    def Shutdown(self):
+        if not self.Terminated:
+            self.onMediaPlayerClose(None)
+
+    def onMediaPlayerClose(self, event):
         self.Terminated = True
-        self.InstallMediaThread.stop()
-
-    def LoadMediaFromDisk(self, Path: str):
-        MediaFiles = self.GetMediaFiles(Path, self.MEDIA_EXTENSIONS)
-        for i in range(len(MediaFiles)):
-            self.LCaptionMessage.setText(self.CAPTION_COPY_FILE % (Path, i + 1, len(MediaFiles)))
-            self.app.processEvents()
-            shutil.copy(MediaFiles[i], self.Settings[self.SETTINGS_MEDIA_PATH])
-
-    def DeleteCurrentMediaFiles(self):
-        MediaFiles = self.GetMediaFiles(self.Settings[self.SETTINGS_MEDIA_PATH], self.MEDIA_EXTENSIONS)
-        self.MediaPlayList.clear()
-        self.MediaPlayer.stop()
-        self.MessageDisplay.show()
-        for i in range(len(MediaFiles)):
-            self.LCaptionMessage.setText(self.CAPDION_DELETE_FILE % (i + 1, len(MediaFiles)))
-            self.app.processEvents()
-            os.remove(MediaFiles[i])
-
-    def GetMediaPaths(self) -> set[str]:
-        disks = psutil.disk_partitions()
-        points = [disk.mountpoint for disk in disks]
+        self.Watchdog.Stop()
+        self.ScheduleTimer.stop()
+        if self.Sync:
+            self.Sync.Stop()
+            print(self.Sync.Report())
+        self.InstallMediaThread.Stop()
+        if self.Ingest:
+            self.Ingest.Cancel()
+            self.Ingest.wait()
+        self.Index.Close()
+        self.Player.Stop()
+        print(self.Player.Report())
+
+    #последняя ступень восстановления: процесс заменяет себя новым с теми же аргументами.
+    #в общем процессе с табло (Launcher.py) пересоздаётся только медиаплеер, табло продолжает работать
+    def RestartProcess(self):
+        self.onMediaPlayerClose(None)
+        if self.onRestart:
+            self.onRestart()
+            return
+        sys.stdout.flush()
+        os.execv(sys.executable, [sys.executable, os.path.abspath(__file__)] + sys.argv[1:])
+
+    #освобождение окон и плееров остановленного медиаплеера перед созданием нового в том же процессе
+    def Release(self):
+        for Deck in self.Player.Decks:
+            Deck.Delete()
+        self.VideoWidget.deleteLater()
+        self.MessageDisplay.deleteLater()
+
+    def onIngestProgress(self, FilesDone: int, FilesTotal: int, BytesDone: float, BytesTotal: float, Speed: float):
+        self.LCaptionMessage.setText(self.CAPTION_COPY_FILE % (
+            '\n'.join(self.Ingest.Sources), FilesDone, FilesTotal,
+            Speed / 1024 / 1024, (BytesTotal - BytesDone) / Speed if Speed else 0
+        ))
+
+    def onIngestVerifying(self, Count: int):
+        self.LCaptionMessage.setText(self.CAPTION_VERIFY_FILES % Count)
+
+    def onIngestQuarantined(self, FileName: str, Error: str):
+        print('Quarantined: %s (%s)' % (FileName, Error))
+
+    def onIngestEvicted(self, Name: str):
+        print('Evicted: %s' % Name)
+
+    def onIngestSkipped(self, Name: str):
+        print('Skipped: %s' % Name)
+
+    def onIngestDone(self, Worker: IngestWorker, Success: bool, Changed: bool):
+        if Worker is not self.Ingest or not Changed:
+            if not self.IsPlaying():
+                self.StartPlay()
+            return
+        if Worker.Deferred:
+            self.FollowUp = (Worker.Sources, Worker.Deferred)
+        self.StartPlay()
+
+    #копирование идёт в отдельном потоке, окно продолжает обрабатывать события
+    def StartIngest(self, Disks: List[str], Names: List[str] = None):
+        if self.Ingest:
+            self.Ingest.Cancel()
+            self.Ingest.wait()
+        self.Ingest = IngestWorker(
+            Disks,
+            self.Library,
+            self.GetLibraryFiles,
+            self.Storage,
+            self.Index.GetLastPlayed(),
+            self.Player.GetCurrentFile,
+            self.MEDIA_EXTENSIONS,
+            Names
+        )
+        self.Ingest.Progress.connect(self.onIngestProgress)
+        self.Ingest.Verifying.connect(self.onIngestVerifying)
+        self.Ingest.Quarantined.connect(self.onIngestQuarantined)
+        self.Ingest.Evicted.connect(self.onIngestEvicted)
+        self.Ingest.Skipped.connect(self.onIngestSkipped)
+        self.Ingest.Done.connect(lambda Success, Changed, Worker=self.Ingest: self.onIngestDone(Worker, Success, Changed))
+        self.Ingest.start()
+
+    def GetMediaPaths(self, points: set[str]) -> set[str]:
         res = []
         for point in points:
             if not point.endswith(os.sep):
@@ -164,22 +350,17 @@ class MediaPlayer():
             res.append(point + self.Settings[self.SETTINGS_USB_PATH].strip(os.sep) + os.sep)
         return set(res)
 
-    def InstallMediaThreadRun(self):
-        newDisks = self.GetMediaPaths()
-        print(self.i, newDisks)
-        Disks = newDisks - self.oldDisks
+    #вызывается из MountWatcher только при появлении или исчезновении точки монтирования
+    def InstallMediaThreadRun(self, Added: set, Removed: set):
+        if self.Ingest and Removed:
+            self.Ingest.Cancel(list(self.GetMediaPaths(Removed)))
+        Disks = self.GetMediaPaths(Added)
         if Disks:
             print('new disks1', Disks)
             Disks = [Disk for Disk in Disks if os.path.isdir(Disk)]
             if Disks:
                 print('new disks2', Disks)
-                self.StopPlay()
-                self.app.processEvents()
-                self.DeleteCurrentMediaFiles()
-                for Disk in Disks:
-                    self.LoadMediaFromDisk(Disk)
-                self.StartPlay()
-        self.oldDisks = newDisks
+                self.StartIngest(Disks)
 
     def onUseUSBChanged(self, p: bool):
         self.USBPath.onSetEnable(self.UseUSB.GetValue())
@@ -270,11 +451,29 @@ class MediaPlayer():
         if not os.path.isdir(MediaDir):
             return []
         Files = os.listdir(MediaDir)
-        MediaFiles = [MediaDir + os.sep + FileName for FileName in Files if True in [FileName.lower().endswith(Extension) for Extension in MediaExtensions]]
+        MediaFiles = [MediaDir + os.sep + FileName for FileName in Files if FileName.lower().endswith(tuple(MediaExtensions))]
         return MediaFiles
 
-    def __init__(self):
+    #с флешки в медиатеку переносятся ролики и файл расписания
+    def GetLibraryFiles(self, MediaDir: str) -> List[str]:
+        Files = self.GetMediaFiles(MediaDir, self.MEDIA_EXTENSIONS)
+        Schedule = os.path.join(MediaDir, SCHEDULE_FILE_NAME)
+        if os.path.isfile(Schedule):
+            Files.append(Schedule)
+        return Files
+
+    #Args - слова режима (run, settings, роль синхронизации); StayOnTop=False, когда окна над видео показывает другой компонент;
+    #onRestart - перезапуск медиаплеера внутри общего процесса вместо перезапуска процесса;
+    #HandleSignals=False, когда SIGTERM обрабатывает процесс, в котором медиаплеер запущен
+    def __init__(self, Args: List[str] = None, StayOnTop: bool = True, onRestart: Callable[[], Any] = None,
+                 HandleSignals: bool = True):
         super().__init__()
+        self.Args = sys.argv if Args is None else Args
+        self.StayOnTop = StayOnTop
+        self.onRestart = onRestart
+        self.HandleSignals = HandleSignals
+        # до запуска воспроизведения останавливать нечего
+        self.Terminated = True
         self.i = 0
         self.app = QtWidgets.QApplication.instance()
         self.desktop = self.app.desktop()
@@ -282,8 +481,8 @@ class MediaPlayer():
         self.ScreenHeight = self.desktop.screenGeometry().height()
         self.LoadSettings()
         self.WorkMode = {
-            self.ON_RUN: self.ON_RUN in sys.argv,
-            self.ON_SETTINGS: self.ON_SETTINGS in sys.argv
+            self.ON_RUN: self.ON_RUN in self.Args,
+            self.ON_SETTINGS: self.ON_SETTINGS in self.Args
         }
         if not os.path.isdir(self.Settings[self.SETTINGS_MEDIA_PATH]):
             os.makedirs(self.Settings[self.SETTINGS_MEDIA_PATH])
@@ -296,6 +495,7 @@ class MediaPlayer():
             self.onSettings()
 
 if __name__ == '__main__':
+    os.chdir(path)
     app = QApplication(sys.argv)
     MediaPlayer = MediaPlayer()
     sys.exit(app.exec_())
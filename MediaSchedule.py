@@ -0,0 +1,121 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+import os
+import datetime
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Dict, List
+from lib import LoadJSON
+
+
+SCHEDULE_FILE_NAME = 'schedule.json'
+DAY_SECONDS = 24 * 60 * 60
+
+SCHEDULE_SLOTS = 'Slots'
+SCHEDULE_DEFAULT = 'Default'
+SLOT_START = 'Start'
+SLOT_END = 'End'
+SLOT_DAYS = 'Days'
+SLOT_CLIPS = 'Clips'
+
+
+#"ЧЧ:ММ" -> секунды от начала суток
+def ParseTime(Text: str) -> int:
+    Hours, Minutes = Text.split(':')
+    return min(int(Hours) * 3600 + int(Minutes) * 60, DAY_SECONDS)
+
+
+#время unix для секунды местных суток; в дни перевода часов в сутках не 24 часа, поэтому не DayStart + Second
+def LocalTime(Day: datetime.date, Second: int) -> float:
+    if Second >= DAY_SECONDS:
+        return LocalTime(Day + datetime.timedelta(days=1), Second - DAY_SECONDS)
+    return datetime.datetime.combine(Day, datetime.time(Second // 3600, Second // 60 % 60, Second % 60)).timestamp()
+
+
+#плавный взвешенный круговой порядок: ролик с весом 3 встречается трижды, но не подряд
+def WeightedOrder(Clips: Dict[str, int]) -> List[str]:
+    Weights = {Name: int(Weight) for Name, Weight in Clips.items() if int(Weight) > 0}
+    Total = sum(Weights.values())
+    Current = dict.fromkeys(Weights, 0)
+    Order = []
+    for i in range(Total):
+        for Name, Weight in Weights.items():
+            Current[Name] += Weight
+        Name = max(Current, key=Current.get)
+        Current[Name] -= Total
+        Order.append(Name)
+    return Order
+
+
+@dataclass
+class ScheduleSlot():
+    Start: int
+    End: int
+    Clips: Dict[str, int]
+    # дни недели, 0 - понедельник; пусто - каждый день
+    Days: List[int] = field(default_factory=list)
+
+    def IsActive(self, Day: datetime.date, Second: int) -> bool:
+        return (not self.Days or Day.weekday() in self.Days) and self.Start <= Second < self.End
+
+
+@dataclass
+class Timeline():
+    # начало каждого отрезка (время unix) и плейлист отрезка
+    Times: List[float]
+    Playlists: List[List[str]]
+    End: float
+
+    def GetIndex(self, Now: float) -> int:
+        return max(bisect_right(self.Times, Now) - 1, 0)
+
+    def GetNextSwitch(self, Now: float) -> float:
+        Index = bisect_right(self.Times, Now)
+        return self.Times[Index] if Index < len(self.Times) else self.End
+
+
+#расписание показа с флешки: отрезки суток со своими роликами и весами.
+#{"Slots": [{"Start": "06:00", "End": "11:00", "Days": [0, 1, 2, 3, 4], "Clips": {"coffee.mp4": 3, "hotdog.mp4": 1}}],
+# "Default": {"promo.mp4": 1}}
+#вне отрезков играет Default, а без него - все ролики медиатеки
+class MediaSchedule():
+
+    def __init__(self, FileName: str):
+        self.Slots: List[ScheduleSlot] = []
+        self.Default: Dict[str, int] = {}
+        Schedule = LoadJSON(FileName)
+        try:
+            for Slot in Schedule.get(SCHEDULE_SLOTS, []):
+                self.Slots.append(ScheduleSlot(
+                    Start=ParseTime(Slot[SLOT_START]),
+                    End=ParseTime(Slot[SLOT_END]),
+                    Clips=Slot[SLOT_CLIPS],
+                    Days=Slot.get(SLOT_DAYS, [])
+                ))
+            self.Default = Schedule.get(SCHEDULE_DEFAULT, {})
+        except (KeyError, ValueError, TypeError, AttributeError) as err:
+            print('schedule error: %s' % err)
+            self.Slots = []
+            self.Default = {}
+
+    def GetPlaylist(self, Clips: Dict[str, int], Files: List[str]) -> List[str]:
+        ByName = {os.path.basename(File): File for File in Files}
+        return [ByName[Name] for Name in WeightedOrder({Name: Weight for Name, Weight in Clips.items() if Name in ByName})]
+
+    #расписание раскладывается на отрезки один раз на сутки; первый подходящий отрезок главнее следующих
+    def BuildTimeline(self, Day: datetime.date, Files: List[str]) -> Timeline:
+        Default = self.GetPlaylist(self.Default, Files) or list(Files)
+        Bounds = sorted(({0} | {Slot.Start for Slot in self.Slots} | {Slot.End for Slot in self.Slots}) - {DAY_SECONDS})
+        Times = []
+        Playlists = []
+        for Bound in Bounds:
+            Playlist = Default
+            for Slot in self.Slots:
+                if Slot.IsActive(Day, Bound):
+                    Playlist = self.GetPlaylist(Slot.Clips, Files) or Default
+                    break
+            if Playlists and Playlists[-1] == Playlist:
+                continue
+            Times.append(LocalTime(Day, Bound))
+            Playlists.append(Playlist)
+        return Timeline(Times=Times, Playlists=Playlists, End=LocalTime(Day, DAY_SECONDS))
@@ -0,0 +1,30 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+import sys
+import shutil
+
+
+#ограничение места под медиатеку: квота на её размер и неприкосновенный запас свободного места на диске
+class MediaStorage():
+
+    MB = 1024 * 1024
+
+    def __init__(self, QuotaMB: int = 0, FreeSpaceMB: int = 0):
+        self.Quota = QuotaMB * self.MB
+        self.FreeFloor = FreeSpaceMB * self.MB
+
+    #свободное место на диске сверх запаса. поколения медиатеки лежат на одном диске: жёсткие ссылки места не занимают,
+    #а файлы старого поколения освобождают его только при удалении поколения после подмены
+    def GetFree(self, Dir: str) -> int:
+        try:
+            return shutil.disk_usage(Dir).free - self.FreeFloor
+        except OSError:
+            return 0
+
+    #сколько ещё можно добавить в медиатеку размером Used байт по квоте
+    def GetQuotaLeft(self, Used: int) -> int:
+        return self.Quota - Used if self.Quota else sys.maxsize
+
+    #сколько ещё можно записать в медиатеку, если в ней уже лежит Used байт
+    def GetAvailable(self, Dir: str, Used: int) -> int:
+        return min(self.GetFree(Dir), self.GetQuotaLeft(Used))
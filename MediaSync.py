@@ -0,0 +1,103 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+import os
+import hashlib
+from dataclasses import dataclass, field, asdict
+from threading import Event
+from typing import Dict, List, Tuple
+from lib import LoadJSON, SaveJSON
+
+
+MANIFEST_FILE_NAME = '.manifest.json'
+HASH_BUFFER_SIZE = 4 * 1024 * 1024
+
+
+class SyncCancelled(Exception):
+    pass
+
+
+def HashFile(FileName: str, Cancel: Event = None) -> str:
+    Hash = hashlib.sha256()
+    Buffer = bytearray(HASH_BUFFER_SIZE)
+    View = memoryview(Buffer)
+    with open(FileName, 'rb', buffering=0) as fp:
+        while True:
+            if Cancel and Cancel.is_set():
+                raise SyncCancelled(FileName)
+            n = fp.readinto(Buffer)
+            if not n:
+                break
+            Hash.update(View[:n])
+    return Hash.hexdigest()
+
+
+@dataclass
+class ManifestEntry():
+    Size: int
+    MTime: int
+    Hash: str = None
+
+
+#описание локальной медиатеки: размер, время изменения и хэш каждого файла
+class Manifest():
+
+    def __init__(self, Dir: str):
+        self.Dir = Dir
+        self.FileName = os.path.join(Dir, MANIFEST_FILE_NAME)
+        self.Entries: Dict[str, ManifestEntry] = {}
+        for Name, Entry in LoadJSON(self.FileName).items():
+            try:
+                self.Entries[Name] = ManifestEntry(**Entry)
+            except TypeError:
+                pass
+
+    def Save(self) -> bool:
+        return SaveJSON(self.FileName, {Name: asdict(Entry) for Name, Entry in self.Entries.items()})
+
+    def Update(self, Name: str, Hash: str = None) -> ManifestEntry:
+        st = os.stat(os.path.join(self.Dir, Name))
+        self.Entries[Name] = ManifestEntry(Size=st.st_size, MTime=st.st_mtime_ns, Hash=Hash)
+        return self.Entries[Name]
+
+    def Remove(self, Name: str):
+        self.Entries.pop(Name, None)
+
+    def GetHash(self, Name: str, Cancel: Event = None) -> str:
+        st = os.stat(os.path.join(self.Dir, Name))
+        Entry = self.Entries.get(Name)
+        if not Entry or Entry.Size != st.st_size or Entry.MTime != st.st_mtime_ns or not Entry.Hash:
+            Entry = self.Update(Name, HashFile(os.path.join(self.Dir, Name), Cancel))
+        return Entry.Hash
+
+
+@dataclass
+class SyncPlan():
+    # (источник, имя файла в медиатеке)
+    Copy: List[Tuple[str, str]] = field(default_factory=list)
+    Remove: List[str] = field(default_factory=list)
+    Keep: List[str] = field(default_factory=list)
+
+
+#сравнение флешки с медиатекой: сначала по размеру и времени изменения, хэш - только если они расходятся
+def PlanSync(Sources: List[str], LocalFiles: List[str], Library: Manifest, Cancel: Event = None) -> SyncPlan:
+    Plan = SyncPlan()
+    Wanted: Dict[str, str] = {}
+    for Source in Sources:
+        Name = os.path.basename(Source)
+        if Name not in Wanted:
+            Wanted[Name] = Source
+    Local = {os.path.basename(File) for File in LocalFiles}
+    for Name, Source in Wanted.items():
+        if Name not in Local:
+            Plan.Copy.append((Source, Name))
+            continue
+        src = os.stat(Source)
+        dst = os.stat(os.path.join(Library.Dir, Name))
+        if src.st_size != dst.st_size:
+            Plan.Copy.append((Source, Name))
+        elif src.st_mtime_ns == dst.st_mtime_ns or HashFile(Source, Cancel) == Library.GetHash(Name, Cancel):
+            Plan.Keep.append(Name)
+        else:
+            Plan.Copy.append((Source, Name))
+    Plan.Remove = sorted(Local - set(Wanted))
+    return Plan
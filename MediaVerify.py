@@ -0,0 +1,195 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from threading import Event
+from typing import BinaryIO, List, Tuple
+from MediaSync import HashFile
+
+
+ASF_HEADER = bytes.fromhex('3026b2758e66cf11a6d900aa0062ce6c')
+ASF_FILE_PROPERTIES = bytes.fromhex('8cabdca1a947cf118ee400c00c205365')
+ASF_STREAM_PROPERTIES = bytes.fromhex('9107dcb7b7a9cf118ee600c00c205365')
+ASF_VIDEO_MEDIA = bytes.fromhex('c0ef19bc4d5bcf11a8fd00805f5c442b')
+ASF_FLAG_BROADCAST = 1
+
+
+class ProbeError(Exception):
+    pass
+
+
+@dataclass
+class MediaInfo():
+    Format: str = ''
+    Duration: float = 0
+    Width: int = 0
+    Height: int = 0
+    Codec: str = ''
+
+
+@dataclass
+class VerifyResult():
+    Source: str
+    Target: str
+    Error: str = ''
+    Info: MediaInfo = None
+
+
+def FourCC(Data: bytes) -> str:
+    return Data.decode('latin-1').strip(' \x00')
+
+
+def ReadAt(fp: BinaryIO, Offset: int, Size: int) -> bytes:
+    fp.seek(Offset)
+    Data = fp.read(Size)
+    if len(Data) != Size:
+        raise ProbeError('файл обрезан на смещении %d' % Offset)
+    return Data
+
+
+#обход боксов mp4: каждый бокс должен целиком помещаться в файл
+def IterBoxes(fp: BinaryIO, Offset: int, End: int):
+    while Offset + 8 <= End:
+        Size, Type = struct.unpack('>I4s', ReadAt(fp, Offset, 8))
+        Header = 8
+        if Size == 1:
+            Size = struct.unpack('>Q', ReadAt(fp, Offset + 8, 8))[0]
+            Header = 16
+        elif Size == 0:
+            Size = End - Offset
+        if Size < Header or Offset + Size > End:
+            raise ProbeError('бокс %s выходит за конец файла' % Type.decode(errors='replace'))
+        yield Type, Offset + Header, Offset + Size
+        Offset += Size
+
+
+#поиск вложенного бокса по пути, например [b'mdia', b'minf', b'stbl', b'stsd']
+def FindBox(fp: BinaryIO, Start: int, End: int, Path: List[bytes]) -> Tuple[int, int]:
+    for Type, BoxStart, BoxEnd in IterBoxes(fp, Start, End):
+        if Type == Path[0]:
+            return (BoxStart, BoxEnd) if len(Path) == 1 else FindBox(fp, BoxStart, BoxEnd, Path[1:])
+    return None
+
+
+#размер кадра берётся из tkhd, кодек - из первой записи stsd видеодорожки
+def ProbeMP4Video(fp: BinaryIO, Info: MediaInfo, Start: int, End: int):
+    hdlr = FindBox(fp, Start, End, [b'mdia', b'hdlr'])
+    if not hdlr or ReadAt(fp, hdlr[0] + 8, 4) != b'vide':
+        return
+    tkhd = FindBox(fp, Start, End, [b'tkhd'])
+    if tkhd:
+        Width, Height = struct.unpack('>II', ReadAt(fp, tkhd[1] - 8, 8))
+        Info.Width, Info.Height = Width >> 16, Height >> 16
+    stsd = FindBox(fp, Start, End, [b'mdia', b'minf', b'stbl', b'stsd'])
+    if stsd and stsd[1] - stsd[0] >= 16:
+        Info.Codec = FourCC(ReadAt(fp, stsd[0] + 12, 4))
+
+
+def ProbeMP4(fp: BinaryIO, FileSize: int) -> MediaInfo:
+    Boxes = {Type: (Start, End) for Type, Start, End in IterBoxes(fp, 0, FileSize)}
+    for Type in [b'ftyp', b'moov', b'mdat']:
+        if Type not in Boxes:
+            raise ProbeError('нет бокса %s' % Type.decode())
+    Info = MediaInfo(Format='mp4')
+    for Type, Start, End in IterBoxes(fp, *Boxes[b'moov']):
+        if Type == b'mvhd':
+            Version = ReadAt(fp, Start, 1)[0]
+            if Version == 1:
+                TimeScale, Length = struct.unpack('>IQ', ReadAt(fp, Start + 20, 12))
+            else:
+                TimeScale, Length = struct.unpack('>II', ReadAt(fp, Start + 12, 8))
+            Info.Duration = Length / TimeScale if TimeScale else 0
+        elif Type == b'trak' and not Info.Codec:
+            ProbeMP4Video(fp, Info, Start, End)
+    return Info
+
+
+def ProbeAVI(fp: BinaryIO, FileSize: int) -> MediaInfo:
+    Riff, Size, Form = struct.unpack('<4sI4s', ReadAt(fp, 0, 12))
+    if Riff != b'RIFF' or Form != b'AVI ':
+        raise ProbeError('нет заголовка RIFF AVI')
+    if Size + 8 > FileSize:
+        raise ProbeError('файл обрезан: RIFF %d, файл %d' % (Size + 8, FileSize))
+    List, ListSize, ListType = struct.unpack('<4sI4s', ReadAt(fp, 12, 12))
+    if List != b'LIST' or ListType != b'hdrl':
+        raise ProbeError('нет списка hdrl')
+    Chunk, ChunkSize = struct.unpack('<4sI', ReadAt(fp, 24, 8))
+    if Chunk != b'avih':
+        raise ProbeError('нет заголовка avih')
+    Header = struct.unpack('<10I', ReadAt(fp, 32, 40))
+    Info = MediaInfo(Format='avi', Duration=Header[0] * Header[4] / 1000000, Width=Header[8], Height=Header[9])
+    #первый поток (strl/strh) - обычно видео, его fccHandler - кодек
+    Offset = 32 + ChunkSize + (ChunkSize & 1)
+    if Offset + 32 <= FileSize:
+        List, _, ListType, Chunk, _, Type, Handler = struct.unpack('<4sI4s4sI4s4s', ReadAt(fp, Offset, 28))
+        if List == b'LIST' and ListType == b'strl' and Chunk == b'strh' and Type == b'vids':
+            Info.Codec = FourCC(Handler)
+    return Info
+
+
+def ProbeASF(fp: BinaryIO, FileSize: int) -> MediaInfo:
+    if ReadAt(fp, 0, 16) != ASF_HEADER:
+        raise ProbeError('нет заголовка ASF')
+    HeaderSize, Count = struct.unpack('<QI', ReadAt(fp, 16, 12))
+    if HeaderSize > FileSize:
+        raise ProbeError('заголовок ASF выходит за конец файла')
+    Info = None
+    Video = None
+    Offset = 30
+    for i in range(Count):
+        Guid, Size = struct.unpack('<16sQ', ReadAt(fp, Offset, 24))
+        if Guid == ASF_FILE_PROPERTIES:
+            _, DeclaredSize, _, _, PlayDuration, _, Preroll, Flags = struct.unpack('<16sQQQQQQI', ReadAt(fp, Offset + 24, 68))
+            if not Flags & ASF_FLAG_BROADCAST and DeclaredSize > FileSize:
+                raise ProbeError('файл обрезан: ASF %d, файл %d' % (DeclaredSize, FileSize))
+            Info = MediaInfo(Format='asf', Duration=max(PlayDuration / 10000000 - Preroll / 1000, 0))
+        elif Guid == ASF_STREAM_PROPERTIES and not Video and ReadAt(fp, Offset + 24, 16) == ASF_VIDEO_MEDIA:
+            #Video Media Type: ширина, высота, ..., BITMAPINFOHEADER.biCompression
+            Width, Height = struct.unpack('<II', ReadAt(fp, Offset + 78, 8))
+            Video = (Width, Height, FourCC(ReadAt(fp, Offset + 78 + 27, 4)))
+        if Size < 24:
+            break
+        Offset += Size
+    if not Info:
+        raise ProbeError('нет File Properties Object')
+    if Video:
+        Info.Width, Info.Height, Info.Codec = Video
+    return Info
+
+
+PROBES = {'.mp4': ProbeMP4, '.avi': ProbeAVI, '.wmv': ProbeASF}
+
+
+def ProbeMedia(FileName: str) -> MediaInfo:
+    Probe = PROBES.get(os.path.splitext(FileName)[1].lower())
+    if not Probe:
+        raise ProbeError('неизвестный формат')
+    with open(FileName, 'rb') as fp:
+        Info = Probe(fp, os.fstat(fp.fileno()).st_size)
+    if Info.Duration <= 0:
+        raise ProbeError('нулевая длительность')
+    return Info
+
+
+def VerifyFile(Source: str, Target: str, Cancel: Event = None) -> VerifyResult:
+    res = VerifyResult(Source=Source, Target=Target)
+    try:
+        if os.path.getsize(Source) != os.path.getsize(Target):
+            res.Error = 'размер не совпадает с источником'
+        elif HashFile(Source, Cancel) != HashFile(Target, Cancel):
+            res.Error = 'содержимое не совпадает с источником'
+        elif os.path.splitext(Target)[1].lower() in PROBES:
+            res.Info = ProbeMedia(Target)
+    except (ProbeError, OSError) as err:
+        res.Error = str(err)
+    return res
+
+
+#хэширование и чтение файлов отпускают GIL, поэтому пул потоков загружает все ядра
+def VerifyFiles(Pairs: List[Tuple[str, str]], Cancel: Event = None, Workers: int = None) -> List[VerifyResult]:
+    if not Pairs:
+        return []
+    with ThreadPoolExecutor(max_workers=Workers or os.cpu_count() or 1) as Executor:
+        return list(Executor.map(lambda Pair: VerifyFile(Pair[0], Pair[1], Cancel), Pairs))
@@ -0,0 +1,55 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+import os
+import select
+import psutil
+from threading import Event
+from PyQt5.QtCore import QThread, pyqtSignal
+
+
+class MountWatcher(QThread):
+
+    MOUNTS_FILE = '/proc/self/mounts'
+    POLL_TIMEOUT = 1000
+    FALLBACK_PERIOD = 5
+
+    # точки монтирования: добавленные, удалённые
+    MountsChanged = pyqtSignal(set, set)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.Terminated = Event()
+        self.Mounts = self.GetMounts()
+
+    def GetMounts(self) -> set:
+        return set(disk.mountpoint for disk in psutil.disk_partitions())
+
+    def Stop(self):
+        self.Terminated.set()
+        self.wait()
+
+    def Check(self):
+        Mounts = self.GetMounts()
+        if Mounts != self.Mounts:
+            Added = Mounts - self.Mounts
+            Removed = self.Mounts - Mounts
+            self.Mounts = Mounts
+            self.MountsChanged.emit(Added, Removed)
+
+    # ядро сообщает об изменении таблицы монтирования через POLLPRI на /proc/self/mounts
+    def run(self):
+        if not hasattr(select, 'poll') or not os.path.exists(self.MOUNTS_FILE):
+            # ожидание события, а не sleep: Stop не ждёт конца периода
+            while not self.Terminated.wait(self.FALLBACK_PERIOD):
+                self.Check()
+            return
+        with open(self.MOUNTS_FILE, 'r') as fp:
+            fp.read()
+            Poller = select.poll()
+            Poller.register(fp, select.POLLPRI | select.POLLERR)
+            while not self.Terminated.is_set():
+                if not Poller.poll(self.POLL_TIMEOUT):
+                    continue
+                fp.seek(0)
+                fp.read()
+                self.Check()
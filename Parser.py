@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 from abc import abstractmethod
 from dataclasses import dataclass
-from typing import Any
+from typing import Any, List
 import json
 
 @dataclass
@@ -35,6 +35,11 @@ class Parser():
 	def Parse(self, Command: bytearray) -> GasStationCommand:
 		pass
 
+	# разбор блока, в котором может быть несколько команд и мусор между ними
+	def ParseFrames(self, Data: bytearray) -> List[GasStationCommand]:
+		Command = self.Parse(Data)
+		return [Command] if Command else []
+
 	@abstractmethod
 	def GeAnswer(self, Command: GasStationCommand) -> bytearray:
 		pass
@@ -46,6 +51,8 @@ class JSONParser(Parser):
 	FIELD_CMDTYPE = 'CMDType'
 	FIELD_SIDE = 'Side'
 	FIELD_NOZZLE = 'Nozzle'
+	FRAME_START = '{'
+	Decoder = json.JSONDecoder()
 
 	@staticmethod
 	def GetID() -> str:
@@ -55,19 +62,36 @@ class JSONParser(Parser):
 	def GetName() -> str:
 		return JSONParser.PARSER_NAME
 
+	def CreateCommand(self, obj: dict, Command: bytearray) -> GasStationCommand:
+		return GasStationCommand(
+			CMDType=obj[self.FIELD_CMDTYPE] if self.FIELD_CMDTYPE in obj else None,
+			Side=obj[self.FIELD_SIDE] if self.FIELD_SIDE in obj else -1,
+			Nozzle=obj[self.FIELD_NOZZLE] if self.FIELD_NOZZLE in obj else -1,
+			Params=obj,
+			Bytes=Command
+		)
+
 	def Parse(self, Command: bytearray) -> GasStationCommand:
 		try:
-			obj = json.loads(Command.decode())
-			return GasStationCommand(
-				CMDType=obj[self.FIELD_CMDTYPE] if self.FIELD_CMDTYPE in obj else None,
-				Side=obj[self.FIELD_SIDE] if self.FIELD_SIDE in obj else -1,
-				Nozzle=obj[self.FIELD_NOZZLE] if self.FIELD_NOZZLE in obj else -1,
-				Params=obj,
-				Bytes=Command
-		)
+			return self.CreateCommand(json.loads(Command.decode()), Command)
 		except:
 			pass
 
+	def ParseFrames(self, Data: bytearray) -> List[GasStationCommand]:
+		Text = bytes(Data).decode(errors='replace')
+		Commands = []
+		Position = Text.find(self.FRAME_START)
+		while Position != -1:
+			try:
+				obj, End = self.Decoder.raw_decode(Text, Position)
+			except ValueError:
+				# испорченный кадр - ищем начало следующего
+				Position = Text.find(self.FRAME_START, Position + 1)
+				continue
+			Commands.append(self.CreateCommand(obj, bytearray(Text[Position:End].encode())))
+			Position = Text.find(self.FRAME_START, End)
+		return Commands
+
 	def GeAnswer(self, Command: GasStationCommand) -> bytearray:
 		obj = {'Success': True}
 		if self.FIELD_SIDE in Command.Params:
@@ -95,3 +119,5 @@ class BenchParser(Parser):
 	def GeAnswer(self, Command: GasStationCommand) -> bytearray:
 		pass
 
+
+PARSER_CLASSES = [JSONParser, BenchParser]
@@ -0,0 +1,152 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+import os
+import json
+import socket
+import struct
+import ipaddress
+import time
+import zlib
+from PyQt5.QtCore import QObject, QTimer, QSocketNotifier
+from Input import SplitHostPort
+from Trace import LatencyHistogram
+
+
+SYNC_PLAYLIST = 'Playlist'
+SYNC_INDEX = 'Index'
+SYNC_POSITION = 'Position'
+
+
+#синхронный показ на нескольких экранах: ведущий рассылает номер ролика и позицию по UDP (обычно multicast),
+#ведомые подстраиваются скоростью воспроизведения, а при большом расхождении - перемоткой
+class PlaybackSync(QObject):
+
+    ROLE_MASTER = 'master'
+    ROLE_FOLLOWER = 'follower'
+    ROLES = [ROLE_MASTER, ROLE_FOLLOWER]
+
+    SEND_PERIOD = 200
+    # расхождение в мс: до RATE_THRESHOLD не трогаем, до SEEK_THRESHOLD меняем скорость, дальше - перемотка
+    RATE_THRESHOLD = 40
+    SEEK_THRESHOLD = 250
+    RATE_GAIN = 1 / 4000
+    MAX_RATE_ADJUST = 0.05
+    # другой ролик у ведущего терпим столько секунд: ведомый мог перейти к следующему чуть раньше
+    MISMATCH_TIMEOUT = 1
+    BUFFER_SIZE = 4096
+
+    def __init__(self, Player, Role: str, Address: str, parent=None):
+        super().__init__(parent)
+        self.Player = Player
+        self.Role = Role
+        self.Host, self.Port = SplitHostPort(Address)
+        self.Socket: socket.socket = None
+        self.Notifier: QSocketNotifier = None
+        self.Timer = QTimer(self)
+        self.Timer.timeout.connect(self.onSend)
+        self.Skew = LatencyHistogram()
+        self.Seeks = 0
+        self.Jumps = 0
+        self.MismatchTime = 0
+
+    def IsMulticast(self) -> bool:
+        try:
+            return ipaddress.ip_address(self.Host).is_multicast
+        except ValueError:
+            return False
+
+    def Start(self):
+        self.Socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.Socket.setblocking(False)
+        if self.Role == self.ROLE_MASTER:
+            if self.IsMulticast():
+                self.Socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+                self.Socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+            else:
+                self.Socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            self.Timer.start(self.SEND_PERIOD)
+            return
+        # несколько ведомых на одной машине слушают один порт
+        self.Socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, 'SO_REUSEPORT'):
+            self.Socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self.Socket.bind(('', self.Port))
+        if self.IsMulticast():
+            self.Socket.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP,
+                                   struct.pack('4s4s', socket.inet_aton(self.Host), socket.inet_aton('0.0.0.0')))
+        self.Notifier = QSocketNotifier(self.Socket.fileno(), QSocketNotifier.Read, self)
+        self.Notifier.activated.connect(self.onReadable)
+
+    def Stop(self):
+        self.Timer.stop()
+        if self.Notifier:
+            self.Notifier.setEnabled(False)
+        if self.Socket:
+            self.Socket.close()
+            self.Socket = None
+
+    def GetPlaylistID(self) -> int:
+        return zlib.crc32('\n'.join(os.path.basename(File) for File in self.Player.Files).encode())
+
+    def onSend(self):
+        if not self.Player.Playing:
+            return
+        Message = {
+            SYNC_PLAYLIST: self.GetPlaylistID(),
+            SYNC_INDEX: self.Player.Index,
+            SYNC_POSITION: self.Player.GetActive().Player.position()
+        }
+        try:
+            self.Socket.sendto(json.dumps(Message).encode(), (self.Host, self.Port))
+        except OSError as err:
+            print(err)
+
+    #из накопившихся сообщений важно только последнее
+    def onReadable(self):
+        Message = None
+        while True:
+            try:
+                Data = self.Socket.recv(self.BUFFER_SIZE)
+            except (BlockingIOError, OSError):
+                break
+            try:
+                Message = json.loads(Data)
+            except ValueError:
+                pass
+        if Message:
+            try:
+                self.Follow(Message[SYNC_PLAYLIST], Message[SYNC_INDEX], Message[SYNC_POSITION])
+            except (KeyError, TypeError) as err:
+                print(err)
+
+    def Follow(self, Playlist: int, Index: int, Position: int):
+        if not self.Player.Playing or Playlist != self.GetPlaylistID():
+            return
+        Player = self.Player.GetActive().Player
+        if Index != self.Player.Index:
+            Now = time.monotonic()
+            if not self.MismatchTime:
+                self.MismatchTime = Now
+            if Now - self.MismatchTime < self.MISMATCH_TIMEOUT:
+                return
+            self.MismatchTime = 0
+            self.Jumps += 1
+            self.Player.Play(Index)
+            self.Player.GetActive().Player.setPosition(Position)
+            return
+        self.MismatchTime = 0
+        Skew = Player.position() - Position
+        self.Skew.Add(abs(Skew) * 1000000)
+        if abs(Skew) > self.SEEK_THRESHOLD:
+            self.Seeks += 1
+            Player.setPosition(Position)
+            Player.setPlaybackRate(1.0)
+        elif abs(Skew) > self.RATE_THRESHOLD:
+            Player.setPlaybackRate(1.0 - max(-self.MAX_RATE_ADJUST, min(self.MAX_RATE_ADJUST, Skew * self.RATE_GAIN)))
+        elif Player.playbackRate() != 1.0:
+            Player.setPlaybackRate(1.0)
+
+    def Report(self) -> str:
+        return 'Синхронизация: замеров %d, расхождение: среднее %.1f мс, p99 %.1f мс, максимальное %.1f мс; перемоток %d, переходов %d' % (
+            self.Skew.Count, self.Skew.Mean() / 1000, self.Skew.Percentile(99) / 1000, self.Skew.Max / 1000, self.Seeks, self.Jumps
+        )
@@ -0,0 +1,118 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+import time
+from typing import Any, Callable
+from PyQt5.QtCore import QObject, QTimer
+from PyQt5.QtMultimedia import QMediaPlayer
+from GaplessPlayer import GaplessPlayer, PlayerDeck
+from lib import LoadJSON, SaveJSON
+
+
+#сторож воспроизведения: следит за продвижением позиции, буферизацией и доставкой кадров
+#и при зависании восстанавливает воспроизведение по нарастающей: перемотка, пропуск ролика,
+#пересоздание плееров, перезапуск процесса
+class PlaybackWatchdog(QObject):
+
+    CHECK_PERIOD = 1000
+    STALL_TIMEOUT = 5
+    SEEK_STEP = 1000
+
+    ACTION_SEEK = 'Seek'
+    ACTION_SKIP = 'Skip'
+    ACTION_RECREATE = 'Recreate'
+    ACTION_RESTART = 'Restart'
+    ACTIONS = [ACTION_SEEK, ACTION_SKIP, ACTION_RECREATE, ACTION_RESTART]
+    RECOVERED = 'Recovered'
+    METRICS_COUNT = 'Count'
+    METRICS_LAST = 'Last'
+    METRICS_LAST_DURATION = 'LastDuration'
+    METRICS_MAX_DURATION = 'MaxDuration'
+
+    def __init__(self, Player: GaplessPlayer, MetricsFileName: str, onRestart: Callable[[], Any], parent=None):
+        super().__init__(parent)
+        self.Player = Player
+        self.onRestart = onRestart
+        self.MetricsFileName = MetricsFileName
+        # счётчики переживают перезапуск процесса
+        self.Metrics = LoadJSON(MetricsFileName)
+        self.Level = 0
+        self.StallTime = 0
+        self.ActionTime = 0
+        self.Reset(None, time.monotonic())
+        self.Timer = QTimer(self)
+        self.Timer.timeout.connect(self.onCheck)
+
+    def Start(self):
+        self.Timer.start(self.CHECK_PERIOD)
+
+    def Stop(self):
+        self.Timer.stop()
+
+    def Reset(self, Deck: PlayerDeck, Now: float):
+        self.Deck = Deck
+        self.Position = Deck.Player.position() if Deck else 0
+        self.Frames = Deck.Frames if Deck else 0
+        self.PositionTime = Now
+        self.FrameTime = Now
+        self.BufferTime = Now
+
+    def Count(self, Name: str, Duration: float = None):
+        Item = self.Metrics.setdefault(Name, {self.METRICS_COUNT: 0})
+        Item[self.METRICS_COUNT] += 1
+        Item[self.METRICS_LAST] = time.time()
+        if Duration is not None:
+            Item[self.METRICS_LAST_DURATION] = Duration
+            Item[self.METRICS_MAX_DURATION] = max(Item.get(self.METRICS_MAX_DURATION, 0), Duration)
+        SaveJSON(self.MetricsFileName, self.Metrics)
+
+    def IsStalled(self, Now: float) -> bool:
+        Deck = self.Deck
+        if Now - self.PositionTime > self.STALL_TIMEOUT or Now - self.BufferTime > self.STALL_TIMEOUT:
+            return True
+        return Deck.HasProbe and Now - self.FrameTime > self.STALL_TIMEOUT
+
+    def onCheck(self):
+        Now = time.monotonic()
+        if not self.Player.Playing:
+            self.Level = 0
+            self.Reset(None, Now)
+            return
+        Deck = self.Player.GetActive()
+        if Deck is not self.Deck:
+            self.Reset(Deck, Now)
+        Position = Deck.Player.position()
+        if Position != self.Position:
+            self.Position = Position
+            self.PositionTime = Now
+            if self.Level and Now > self.ActionTime:
+                self.Count(self.RECOVERED, Now - self.StallTime)
+                print('Playback recovered in %.1f s at level %d' % (Now - self.StallTime, self.Level))
+                self.Level = 0
+        if Deck.Frames != self.Frames:
+            self.Frames = Deck.Frames
+            self.FrameTime = Now
+        if Deck.Player.mediaStatus() != QMediaPlayer.StalledMedia:
+            self.BufferTime = Now
+        if not self.IsStalled(Now):
+            return
+        if not self.Level:
+            self.StallTime = Now
+        self.Level = min(self.Level + 1, len(self.ACTIONS))
+        self.ActionTime = Now
+        self.Recover(self.ACTIONS[self.Level - 1])
+        self.Reset(self.Player.GetActive(), time.monotonic())
+
+    def Recover(self, Action: str):
+        Player = self.Deck.Player
+        print('Playback stalled: position %d, buffer %d%%, frames %d, status %d; %s' % (
+            Player.position(), Player.bufferStatus(), self.Deck.Frames, Player.mediaStatus(), Action))
+        self.Count(Action)
+        if Action == self.ACTION_SEEK:
+            Player.setPosition(Player.position() + self.SEEK_STEP)
+            Player.play()
+        elif Action == self.ACTION_SKIP:
+            self.Player.Advance()
+        elif Action == self.ACTION_RECREATE:
+            self.Player.Recreate()
+        else:
+            self.onRestart()
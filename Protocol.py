@@ -0,0 +1,192 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+import re
+import binascii
+from functools import reduce, lru_cache
+from operator import xor
+from dataclasses import dataclass, field
+from typing import List, Tuple, Union
+
+# общие примитивы протоколов ТРК: контрольные суммы, выделение кадров и BCD.
+# всё принимает bytes, bytearray или memoryview и не копирует данные: кадры возвращаются срезами memoryview
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+STX = 0x02
+ETX = 0x03
+DLE = 0x10
+MAX_FRAME_SIZE = 1024
+
+
+def MakeTable(Width: int, Poly: int, Reflected: bool) -> List[int]:
+	Table = []
+	if Reflected:
+		Poly = int('{:0{}b}'.format(Poly, Width)[::-1], 2)
+		for Byte in range(256):
+			CRC = Byte
+			for i in range(8):
+				CRC = (CRC >> 1) ^ Poly if CRC & 1 else CRC >> 1
+			Table.append(CRC)
+		return Table
+	Top = 1 << (Width - 1)
+	Mask = (1 << Width) - 1
+	for Byte in range(256):
+		CRC = Byte << (Width - 8)
+		for i in range(8):
+			CRC = ((CRC << 1) ^ Poly if CRC & Top else CRC << 1) & Mask
+		Table.append(CRC)
+	return Table
+
+
+#параметры CRC по каталогу Rocksoft; у всех вариантов ниже отражение входа и выхода совпадает.
+#Check - CRC строки "123456789"
+@dataclass
+class CRCModel():
+	Name: str
+	Width: int
+	Poly: int
+	Init: int
+	Reflected: bool
+	XorOut: int
+	Check: int
+	Table: List[int] = field(default_factory=list, repr=False)
+
+	def __post_init__(self):
+		self.Table = MakeTable(self.Width, self.Poly, self.Reflected)
+
+
+CRC16_MODBUS = CRCModel('CRC-16/MODBUS', 16, 0x8005, 0xFFFF, True, 0x0000, 0x4B37)
+CRC16_ARC = CRCModel('CRC-16/ARC', 16, 0x8005, 0x0000, True, 0x0000, 0xBB3D)
+CRC16_KERMIT = CRCModel('CRC-16/KERMIT', 16, 0x1021, 0x0000, True, 0x0000, 0x2189)
+CRC16_X25 = CRCModel('CRC-16/X-25', 16, 0x1021, 0xFFFF, True, 0xFFFF, 0x906E)
+CRC16_CCITT_FALSE = CRCModel('CRC-16/CCITT-FALSE', 16, 0x1021, 0xFFFF, False, 0x0000, 0x29B1)
+CRC16_XMODEM = CRCModel('CRC-16/XMODEM', 16, 0x1021, 0x0000, False, 0x0000, 0x31C3)
+CRC8 = CRCModel('CRC-8', 8, 0x07, 0x00, False, 0x00, 0xF4)
+CRC8_MAXIM = CRCModel('CRC-8/MAXIM', 8, 0x31, 0x00, True, 0x00, 0xA1)
+CRC_MODELS = [CRC16_MODBUS, CRC16_ARC, CRC16_KERMIT, CRC16_X25, CRC16_CCITT_FALSE, CRC16_XMODEM, CRC8, CRC8_MAXIM]
+
+
+def CRC(Model: CRCModel, Data: Buffer) -> int:
+	# прямой CRC-16 с полиномом 0x1021 уже реализован на C в binascii
+	if Model.Width == 16 and Model.Poly == 0x1021 and not Model.Reflected:
+		return binascii.crc_hqx(Data, Model.Init) ^ Model.XorOut
+	Table = Model.Table
+	Value = Model.Init
+	if Model.Reflected:
+		for Byte in memoryview(Data).cast('B'):
+			Value = (Value >> 8) ^ Table[(Value ^ Byte) & 0xFF]
+	elif Model.Width == 8:
+		for Byte in memoryview(Data).cast('B'):
+			Value = Table[Value ^ Byte]
+	else:
+		Shift = Model.Width - 8
+		Mask = (1 << Model.Width) - 1
+		for Byte in memoryview(Data).cast('B'):
+			Value = ((Value << 8) & Mask) ^ Table[((Value >> Shift) ^ Byte) & 0xFF]
+	return Value ^ Model.XorOut
+
+
+#продольная сумма: дополнение суммы байт до нуля по модулю 256
+def LRC(Data: Buffer) -> int:
+	return -sum(memoryview(Data).cast('B')) & 0xFF
+
+
+def XorSum(Data: Buffer) -> int:
+	return reduce(xor, memoryview(Data).cast('B'), 0)
+
+
+def Escape(Byte: int) -> bytes:
+	return re.escape(bytes([Byte]))
+
+
+#начало кадра внутри данных означает, что конец предыдущего потерян: кадр начинается заново с него
+@lru_cache(maxsize=None)
+def FramePattern(TrailerSize: int, Start: int, End: int) -> re.Pattern:
+	return re.compile(b'%s[^%s%s]*%s.{%d}' % (Escape(Start), Escape(Start), Escape(End), Escape(End), TrailerSize), re.DOTALL)
+
+
+@lru_cache(maxsize=None)
+def DLEFramePattern(TrailerSize: int) -> re.Pattern:
+	return re.compile(b'%s%s(?:[^%s]|%s%s)*%s%s.{%d}' % (
+		Escape(DLE), Escape(STX), Escape(DLE), Escape(DLE), Escape(DLE), Escape(DLE), Escape(ETX), TrailerSize
+	), re.DOTALL)
+
+
+@lru_cache(maxsize=None)
+def StartPattern(Start: bytes) -> re.Pattern:
+	return re.compile(re.escape(Start))
+
+
+#поиск целых кадров в принятом блоке. возвращает срезы кадров целиком (с контрольной суммой из TrailerSize байт)
+#и число разобранных байт: начатый, но не законченный кадр остаётся вызывающему до следующего блока
+def MatchFrames(Pattern: re.Pattern, Data: Buffer, Start: re.Pattern, MaxSize: int) -> Tuple[List[memoryview], int]:
+	View = memoryview(Data).cast('B')
+	Frames = []
+	Consumed = 0
+	for Match in Pattern.finditer(View):
+		Frames.append(View[Match.start():Match.end()])
+		Consumed = Match.end()
+	Next = Start.search(View, Consumed)
+	Consumed = Next.start() if Next else len(View)
+	# кадр без конца дольше MaxSize - мусор, ищем следующее начало
+	while len(View) - Consumed > MaxSize:
+		Next = Start.search(View, Consumed + 1)
+		Consumed = Next.start() if Next else len(View)
+	return Frames, Consumed
+
+
+#кадры STX <данные> ETX [контрольная сумма]; данные не должны содержать STX и ETX
+def FindFrames(Data: Buffer, TrailerSize: int = 0, Start: int = STX, End: int = ETX, MaxSize: int = MAX_FRAME_SIZE) -> Tuple[List[memoryview], int]:
+	return MatchFrames(FramePattern(TrailerSize, Start, End), Data, StartPattern(bytes([Start])), MaxSize)
+
+
+#кадры DLE STX <данные> DLE ETX [контрольная сумма]; DLE в данных удвоен. данные кадра - DLEPayload и Destuff
+def FindDLEFrames(Data: Buffer, TrailerSize: int = 0, MaxSize: int = MAX_FRAME_SIZE) -> Tuple[List[memoryview], int]:
+	return MatchFrames(DLEFramePattern(TrailerSize), Data, StartPattern(bytes([DLE, STX])), MaxSize)
+
+
+def DLEPayload(Frame: memoryview, TrailerSize: int = 0) -> memoryview:
+	return Frame[2:len(Frame) - 2 - TrailerSize]
+
+
+DLE_ESCAPE = re.compile(Escape(DLE) + b'(.)', re.DOTALL)
+
+
+#снятие байт-стаффинга: без экранирования возвращается тот же memoryview, иначе данные собираются за один проход
+def Destuff(Data: Buffer) -> Buffer:
+	View = memoryview(Data).cast('B')
+	Out = None
+	Last = 0
+	for Match in DLE_ESCAPE.finditer(View):
+		if Out is None:
+			Out = bytearray()
+		Out += View[Last:Match.start()]
+		Out.append(View[Match.start() + 1])
+		Last = Match.end()
+	if Out is None:
+		return View
+	Out += View[Last:]
+	return Out
+
+
+# значение упакованного BCD байта или -1, если в нём не десятичные тетрады
+BCD_VALUES = [(Byte >> 4) * 10 + (Byte & 0x0F) if Byte >> 4 <= 9 and Byte & 0x0F <= 9 else -1 for Byte in range(256)]
+
+
+#упакованный BCD, старшие разряды первыми: 12 34 56 -> 123456
+def BCDToInt(Data: Buffer) -> int:
+	Value = 0
+	for Byte in memoryview(Data).cast('B'):
+		Digits = BCD_VALUES[Byte]
+		if Digits < 0:
+			raise ValueError('Неверный BCD байт: %02X' % Byte)
+		Value = Value * 100 + Digits
+	return Value
+
+
+def BCDToFloat(Data: Buffer, Decimals: int) -> float:
+	return BCDToInt(Data) / 10 ** Decimals
+
+
+def IntToBCD(Value: int, Size: int) -> bytes:
+	return bytes.fromhex('%0*d' % (Size * 2, Value))
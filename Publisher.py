@@ -0,0 +1,248 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+import json
+import socket
+import selectors
+import time
+from threading import Lock, Thread
+from typing import Any, Callable, Dict, List
+from Input import SplitHostPort, GetFamily
+
+
+class PublisherClient():
+
+	def __init__(self, Socket: socket.socket):
+		self.Socket = Socket
+		self.Output = bytearray()
+		self.Input = bytearray()
+		self.Resync = True
+
+
+class StatePublisher():
+
+	FIELD_SEQ = 'Seq'
+	FIELD_SNAPSHOT = 'Snapshot'
+	FIELD_DELTA = 'Delta'
+	FIELD_RESYNC = 'Resync'
+	BACKLOG = 64
+	RECV_SIZE = 4096
+	MAX_PENDING = 65536
+
+	@staticmethod
+	def Encode(Message: dict) -> bytes:
+		return json.dumps(Message, separators=(',', ':')).encode() + b'\n'
+
+	def __init__(self, Address: str):
+		self.Address = Address
+		self.State: Dict[str, Any] = {}
+		self.Seq = 0
+		self.Outbox: List[bytes] = []
+		self.Lock = Lock()
+		self.Clients: Dict[socket.socket, PublisherClient] = {}
+		self.Terminate = False
+		self.Thread: Thread = None
+
+	def Start(self):
+		Host, Port = SplitHostPort(self.Address)
+		self.Socket = socket.create_server((Host, Port), family=GetFamily(Host), backlog=self.BACKLOG)
+		self.Socket.setblocking(False)
+		self.WakeRead, self.WakeWrite = socket.socketpair()
+		self.WakeRead.setblocking(False)
+		self.Selector = selectors.DefaultSelector()
+		self.Selector.register(self.Socket, selectors.EVENT_READ, None)
+		self.Selector.register(self.WakeRead, selectors.EVENT_READ, None)
+		self.Terminate = False
+		self.Thread = Thread(target=self.PublisherThread, name='PublisherThread', daemon=True)
+		self.Thread.start()
+
+	def Stop(self):
+		self.Terminate = True
+		if not self.Thread:
+			return
+		self.Wake()
+		self.Thread.join()
+		for Client in list(self.Clients):
+			self.Disconnect(Client)
+		self.Selector.close()
+		self.Socket.close()
+		self.WakeRead.close()
+		self.WakeWrite.close()
+		self.Thread = None
+
+	def Wake(self):
+		try:
+			self.WakeWrite.send(b'\0')
+		except OSError:
+			pass
+
+	def Publish(self, Values: Dict[str, Any]):
+		with self.Lock:
+			Delta = {Key: Value for Key, Value in Values.items() if Key not in self.State or self.State[Key] != Value}
+			if not Delta:
+				return
+			self.State.update(Delta)
+			self.Seq += 1
+			self.Outbox.append(self.Encode({self.FIELD_SEQ: self.Seq, self.FIELD_DELTA: Delta}))
+		self.Wake()
+
+	def GetSnapshot(self) -> bytes:
+		with self.Lock:
+			return self.Encode({self.FIELD_SEQ: self.Seq, self.FIELD_SNAPSHOT: self.State})
+
+	def Accept(self):
+		try:
+			Socket, _ = self.Socket.accept()
+		except (BlockingIOError, InterruptedError):
+			return
+		Socket.setblocking(False)
+		Socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+		self.Clients[Socket] = PublisherClient(Socket)
+		self.Selector.register(Socket, selectors.EVENT_READ, None)
+		self.Send(self.Clients[Socket])
+
+	def Disconnect(self, Socket: socket.socket):
+		self.Clients.pop(Socket, None)
+		self.Selector.unregister(Socket)
+		Socket.close()
+
+	def Receive(self, Client: PublisherClient):
+		try:
+			Data = Client.Socket.recv(self.RECV_SIZE)
+		except (BlockingIOError, InterruptedError):
+			return
+		except OSError:
+			Data = b''
+		if not Data:
+			self.Disconnect(Client.Socket)
+			return
+		Client.Input += Data
+		while b'\n' in Client.Input:
+			Line, _, Client.Input = Client.Input.partition(b'\n')
+			try:
+				if json.loads(Line).get(self.FIELD_RESYNC):
+					Client.Resync = True
+			except:
+				pass
+		self.Send(Client)
+
+	def Send(self, Client: PublisherClient):
+		if Client.Resync and not Client.Output:
+			Client.Output += self.GetSnapshot()
+			Client.Resync = False
+		if Client.Output:
+			try:
+				Sent = Client.Socket.send(Client.Output)
+				del Client.Output[:Sent]
+			except (BlockingIOError, InterruptedError):
+				pass
+			except OSError:
+				self.Disconnect(Client.Socket)
+				return
+		Events = selectors.EVENT_READ | (selectors.EVENT_WRITE if Client.Output or Client.Resync else 0)
+		if self.Selector.get_key(Client.Socket).events != Events:
+			self.Selector.modify(Client.Socket, Events, None)
+
+	def Dispatch(self):
+		with self.Lock:
+			Messages = b''.join(self.Outbox)
+			self.Outbox = []
+		if not Messages:
+			return
+		for Client in list(self.Clients.values()):
+			if Client.Resync:
+				continue
+			# медленный подписчик: пропускаем дельты и отправляем снимок, когда его буфер опустеет
+			if len(Client.Output) + len(Messages) > self.MAX_PENDING:
+				Client.Resync = True
+			else:
+				Client.Output += Messages
+			self.Send(Client)
+
+	def PublisherThread(self):
+		while not self.Terminate:
+			for Key, Mask in self.Selector.select():
+				if Key.fileobj is self.Socket:
+					self.Accept()
+				elif Key.fileobj is self.WakeRead:
+					try:
+						self.WakeRead.recv(self.RECV_SIZE)
+					except (BlockingIOError, InterruptedError):
+						pass
+				elif Key.fileobj in self.Clients:
+					if Mask & selectors.EVENT_READ:
+						self.Receive(self.Clients[Key.fileobj])
+					if Mask & selectors.EVENT_WRITE and Key.fileobj in self.Clients:
+						self.Send(self.Clients[Key.fileobj])
+			self.Dispatch()
+
+
+class StateSubscriber():
+
+	RECV_SIZE = 4096
+	READ_TIMEOUT = 1
+	RECONNECT_PERIOD = 1
+
+	def __init__(self, Address: str, onState: Callable[[Dict[str, Any]], Any]):
+		self.Address = Address
+		self.onState = onState
+		self.State: Dict[str, Any] = {}
+		self.Seq = None
+		self.ResyncPending = True
+		self.Resyncs = 0
+		self.Terminate = False
+		self.Thread: Thread = None
+
+	def Start(self):
+		self.Terminate = False
+		self.Thread = Thread(target=self.SubscriberThread, name='SubscriberThread', daemon=True)
+		self.Thread.start()
+
+	def Stop(self):
+		self.Terminate = True
+		if self.Thread:
+			self.Thread.join()
+			self.Thread = None
+
+	def onMessage(self, Socket: socket.socket, Message: dict):
+		Seq = Message.get(StatePublisher.FIELD_SEQ)
+		# снимок мог уже включать дельты, которые ещё стояли в очереди публикатора
+		if StatePublisher.FIELD_DELTA in Message and self.Seq is not None and Seq is not None and Seq <= self.Seq:
+			return
+		if StatePublisher.FIELD_SNAPSHOT in Message:
+			self.State = dict(Message[StatePublisher.FIELD_SNAPSHOT])
+			self.ResyncPending = False
+		elif StatePublisher.FIELD_DELTA in Message and self.Seq is not None and Seq == self.Seq + 1:
+			self.State.update(Message[StatePublisher.FIELD_DELTA])
+		else:
+			# пропущено сообщение - запрашиваем полный снимок состояния
+			if not self.ResyncPending:
+				self.Resyncs += 1
+				self.ResyncPending = True
+				Socket.sendall(StatePublisher.Encode({StatePublisher.FIELD_RESYNC: True}))
+			self.Seq = None
+			return
+		self.Seq = Seq
+		self.onState(self.State)
+
+	def SubscriberThread(self):
+		while not self.Terminate:
+			try:
+				with socket.create_connection(SplitHostPort(self.Address), timeout=self.READ_TIMEOUT) as Socket:
+					self.Seq = None
+					self.ResyncPending = True
+					Buffer = bytearray()
+					while not self.Terminate:
+						try:
+							Data = Socket.recv(self.RECV_SIZE)
+						except socket.timeout:
+							continue
+						if not Data:
+							break
+						Buffer += Data
+						while b'\n' in Buffer:
+							Line, _, Buffer = Buffer.partition(b'\n')
+							self.onMessage(Socket, json.loads(Line))
+			except Exception as err:
+				print(err)
+			if not self.Terminate:
+				time.sleep(self.RECONNECT_PERIOD)
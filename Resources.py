@@ -0,0 +1,72 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+import os
+from collections import OrderedDict
+from typing import Dict, Tuple
+from PyQt5.QtGui import QPixmap, QPixmapCache, QFont, QFontMetricsF
+
+
+# общие для всех компонентов процесса кэши: текст стилей по времени изменения файла и картинки в QPixmapCache
+STYLES: Dict[str, Tuple[int, str]] = {}
+# подобранный размер шрифта по (семейство, самое широкое значение формата, ширина, высота, DPR);
+# при изменении размеров окна ключи всё время новые, поэтому хранятся только FONT_SIZES_LIMIT последних
+FONT_SIZES: Dict[Tuple[str, str, int, int, float], int] = OrderedDict()
+FONT_SIZES_LIMIT = 256
+MIN_FONT_SIZE = 6
+DIGITS = '0123456789'
+
+
+def LoadStyle(FileName: str) -> str:
+	try:
+		MTime = os.stat(FileName).st_mtime_ns
+	except OSError:
+		return ''
+	Cached = STYLES.get(FileName)
+	if not Cached or Cached[0] != MTime:
+		with open(FileName, 'r') as fp:
+			Cached = (MTime, fp.read())
+		STYLES[FileName] = Cached
+	return Cached[1]
+
+
+def LoadPixmap(FileName: str) -> QPixmap:
+	Pixmap = QPixmapCache.find(FileName)
+	if Pixmap is None or Pixmap.isNull():
+		Pixmap = QPixmap(FileName)
+		QPixmapCache.insert(FileName, Pixmap)
+	return Pixmap
+
+
+#цифры в пропорциональных шрифтах бывают разной ширины: для оценки берём самую широкую
+def GetWidestText(Font: QFont, Text: str) -> str:
+	Metrics = QFontMetricsF(Font)
+	Digit = max(DIGITS, key=Metrics.horizontalAdvance)
+	return ''.join(Digit if Char in DIGITS else Char for Char in Text)
+
+
+#двоичный поиск наибольшего размера шрифта в пикселях, при котором Text помещается в Width x Height
+def MeasureFontSize(Font: QFont, Text: str, Width: int, Height: int) -> int:
+	Font = QFont(Font)
+	Low, High = MIN_FONT_SIZE, max(Height, MIN_FONT_SIZE)
+	while Low < High:
+		Size = (Low + High + 1) // 2
+		Font.setPixelSize(Size)
+		Metrics = QFontMetricsF(Font)
+		if Metrics.height() <= Height and Metrics.horizontalAdvance(GetWidestText(Font, Text)) <= Width:
+			Low = Size
+		else:
+			High = Size - 1
+	return Low
+
+
+def FitFontSize(Font: QFont, Text: str, Width: int, Height: int, DPR: float) -> int:
+	Key = (Font.family(), Text, Width, Height, DPR)
+	Size = FONT_SIZES.get(Key)
+	if Size is not None:
+		FONT_SIZES.move_to_end(Key)
+		return Size
+	Size = MeasureFontSize(Font, Text, Width, Height)
+	FONT_SIZES[Key] = Size
+	if len(FONT_SIZES) > FONT_SIZES_LIMIT:
+		FONT_SIZES.popitem(last=False)
+	return Size
@@ -2,12 +2,13 @@
 # -*- coding: utf-8 -*-
 import os.path
 from abc import abstractmethod
-from typing import Any, Callable, List
+from typing import Any, Callable, Dict, List
 from dataclasses import dataclass
 from PyQt5.QtWidgets import QWidget, QGridLayout, QLabel, QCheckBox, QLineEdit, QPushButton, QDialog, QComboBox
 from PyQt5 import QtWidgets
 from lib import IsFloat
-from PyQt5.QtCore import Qt
+from Resources import LoadStyle
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QResizeEvent, QMoveEvent, QCloseEvent, QMouseEvent
 
 @dataclass()
@@ -33,13 +34,43 @@ class Option():
 		self.onChanged = onChanged
 		self.LCaption = None
 		self.Validators = []
+		self.UpdateLevel = 0
+		self.UpdatePending = False
+		self.DependsOn: List[str] = []
+		self.Validator: OptionsValidator = None
 
 	def GetValue(self) -> Any:
 		return self.Value
 
+	#пакетное изменение: пока не вызван парный EndUpdate, изменения виджетов не проверяются и не рассылаются,
+	#а по окончании значение проверяется и onChanged вызывается один раз
+	def BeginUpdate(self):
+		self.UpdateLevel += 1
+
+	def EndUpdate(self):
+		self.UpdateLevel = max(self.UpdateLevel - 1, 0)
+		if not self.UpdateLevel and self.UpdatePending:
+			self.UpdatePending = False
+			self.ApplyWidgetValue()
+
+	def Defer(self) -> bool:
+		if self.UpdateLevel:
+			self.UpdatePending = True
+		return self.UpdateLevel > 0
+
+	#перенос значения из виджета в опцию по окончании пакета
+	def ApplyWidgetValue(self):
+		pass
+
 	def SetValue(self, NewValue: Any):
 		self.Changed = True
 		self.Value = NewValue
+		if self.Validator:
+			self.Validator.Invalidate(self)
+
+	#опции, от значений которых зависит проверка этой опции
+	def SetDependsOn(self, IDs: List[str]):
+		self.DependsOn = IDs
 
 	def GetChanged(self) -> bool:
 		return self.Changed
@@ -94,6 +125,43 @@ class Option():
 				return res
 		return ErrorDescriptionSuccess
 
+#проверка формы: результат хранится для каждой опции и пересчитывается только для изменённой опции
+#и опций, которые от неё зависят; число непрошедших проверку опций ведётся счётчиком
+class OptionsValidator():
+
+	def __init__(self, Options: List[Option]):
+		self.Options: Dict[str, Option] = {option.GetID(): option for option in Options}
+		self.Dependents: Dict[str, List[Option]] = {}
+		for option in Options:
+			option.Validator = self
+			for ID in option.DependsOn:
+				self.Dependents.setdefault(ID, []).append(option)
+		self.Results: Dict[str, bool] = {}
+		self.Invalid = 0
+		for option in Options:
+			self.Revalidate(option)
+
+	def Revalidate(self, option: Option):
+		Valid = option.Check() == ErrorDescriptionSuccess
+		Old = self.Results.get(option.GetID(), True)
+		self.Results[option.GetID()] = Valid
+		self.Invalid += int(Old) - int(Valid)
+
+	def Invalidate(self, option: Option):
+		Queue = [option]
+		Visited = set()
+		while Queue:
+			option = Queue.pop()
+			if option.GetID() in Visited:
+				continue
+			Visited.add(option.GetID())
+			self.Revalidate(option)
+			Queue.extend(self.Dependents.get(option.GetID(), []))
+
+	def IsValid(self) -> bool:
+		return self.Invalid == 0
+
+
 class BoolOption(Option):
 
 	def __init__(self, ID: str, Caption: str, Value: bool = None, onChanged: Callable[[bool], Any] = None):
@@ -107,6 +175,10 @@ class BoolOption(Option):
 			self.onChanged(NewValue)
 
 	def onStateChanged(self, newState):
+		if not self.Defer():
+			self.ApplyWidgetValue()
+
+	def ApplyWidgetValue(self):
 		self.SetValue(self.cb.isChecked())
 
 	def ShowOption(self, Grid: QGridLayout):
@@ -161,7 +233,11 @@ class StrOption(Option):
 			self.onChanged(NewValue)
 
 	def onTextChange(self, text):
-		self.SetValue(text)
+		if not self.Defer():
+			self.SetValue(text)
+
+	def ApplyWidgetValue(self):
+		self.SetValue(self.edit.text())
 
 	def ShowOption(self, Grid: QGridLayout):
 		self.Grid = Grid
@@ -254,6 +330,10 @@ class ComboBoxOption(Option):
 
 	def onCurrentIndexChange(self, NewIndex):
 		self.CurrentIndex = NewIndex
+		if not self.Defer():
+			self.ApplyWidgetValue()
+
+	def ApplyWidgetValue(self):
 		self.SetValue(self.Values[self.CurrentIndex].Value)
 
 	def GetWidgets(self) -> List[QWidget]:
@@ -285,13 +365,16 @@ class WidgetPosition(Option):
 	FIELDS_SUM_LARGE = 'Сумма полей %s и %s должна быть меньше 100%%.'
 	BSHOW_DISPLAY_CAPTION = 'Показать дисплей'
 	BHIDE_DISPLAY_CAPTION = 'Скрыть дисплей'
+	# перемещения и изменения размера окна предпросмотра сводятся к одному обновлению за кадр
+	FRAME_PERIOD = 16
 
 	def UpdateStyles(self, FileName: str):
 		self.StylesFileName = FileName
 		if self.Display and os.path.isfile(FileName):
-			with open(FileName, 'r') as fp:
-				styles = fp.read()
-			self.Display.setStyleSheet(styles)
+			Styles = LoadStyle(FileName)
+			# тот же текст стилей заново не применяем: setStyleSheet всегда перерисовывает все дочерние виджеты
+			if Styles != self.Display.styleSheet():
+				self.Display.setStyleSheet(Styles)
 
 	def Get(self, Dimension: str) -> float:
 		return float(self.GetValue()[Dimension])
@@ -310,6 +393,11 @@ class WidgetPosition(Option):
 		self.CurrentError = self.CheckNewValue(self.Value)
 		self.InitDisplayFunction = None
 		self.StylesFileName = None
+		self.PendingPos = None
+		self.PendingSize = None
+		self.FrameTimer = QTimer()
+		self.FrameTimer.setSingleShot(True)
+		self.FrameTimer.timeout.connect(self.onFrame)
 		if self.CurrentError != ErrorDescriptionSuccess:
 			self.Value = self.DEFAULT_VALUE
 			self.CurrentError = ErrorDescriptionSuccess
@@ -357,6 +445,10 @@ class WidgetPosition(Option):
 			self.onChanged(NewValue)
 
 	def onPositionChanged(self, text):
+		if not self.Defer():
+			self.ApplyWidgetValue()
+
+	def ApplyWidgetValue(self):
 		NewPosition = {
 			self.POSITION_TOP: self.editTop.text(),
 			self.POSITION_LEFT: self.editLeft.text(),
@@ -366,12 +458,31 @@ class WidgetPosition(Option):
 		self.SetValue(NewPosition)
 
 	def onDisplayMove(self, e: QMoveEvent):
-		self.editLeft.setText("%g" % max(min((round(e.pos().x() / self.ScreenWidth * 100 * 2) / 2), 100), 0))
-		self.editTop.setText("%g" % max(min((round(e.pos().y() / self.ScreenHeight * 100 * 2) / 2), 100), 0))
+		self.PendingPos = e.pos()
+		if not self.FrameTimer.isActive():
+			self.FrameTimer.start(self.FRAME_PERIOD)
 
 	def onDisplayResize(self, e: QResizeEvent):
-		self.editWidth.setText("%g" % max(min((round(e.size().width() / self.ScreenWidth * 100 * 2) / 2), 100), 0))
-		self.editHeight.setText("%g" % max(min((round(e.size().height() / self.ScreenHeight * 100 * 2) / 2), 100), 0))
+		self.PendingSize = e.size()
+		if not self.FrameTimer.isActive():
+			self.FrameTimer.start(self.FRAME_PERIOD)
+
+	def SetPercent(self, Edit: QLineEdit, Value: int, Total: int):
+		Text = "%g" % max(min((round(Value / Total * 100 * 2) / 2), 100), 0)
+		if Edit.text() != Text:
+			Edit.setText(Text)
+
+	def onFrame(self):
+		self.BeginUpdate()
+		if self.PendingPos is not None:
+			self.SetPercent(self.editLeft, self.PendingPos.x(), self.ScreenWidth)
+			self.SetPercent(self.editTop, self.PendingPos.y(), self.ScreenHeight)
+			self.PendingPos = None
+		if self.PendingSize is not None:
+			self.SetPercent(self.editWidth, self.PendingSize.width(), self.ScreenWidth)
+			self.SetPercent(self.editHeight, self.PendingSize.height(), self.ScreenHeight)
+			self.PendingSize = None
+		self.EndUpdate()
 
 	def onDisplayClose(self, event: QCloseEvent):
 		self.onSetEnable(True)
@@ -401,17 +512,10 @@ class WidgetPosition(Option):
 		Top = int(self.ScreenHeight * self.Get(self.POSITION_TOP) / 100)
 		Widget.setGeometry(Left, Top, Width, Height)
 
-	def onShowDisplay(self):
-		if not self.Display:
-			self.Display = QDialog()
-		if self.Display.isVisible():
-			self.Display.hide()
-			self.BShowDisplay.setText(self.BSHOW_DISPLAY_CAPTION)
-			self.onSetEnable(True)
-			return
-		self.SetGeometry(self.Display)
+	#окно предпросмотра и его содержимое создаются при первом показе, дальше только показываются и прячутся
+	def CreateDisplay(self):
+		self.Display = QDialog()
 		self.Display.closeEvent = self.onDisplayClose
-		self.onSetEnable(False)
 		self.Display.setWindowTitle(self.DISPLAY_CAPTION)
 		self.Display.setWindowFlags(Qt.Tool | Qt.CustomizeWindowHint | Qt.WindowStaysOnTopHint)
 		self.Display.mousePressEvent = self.onMousePress
@@ -419,12 +523,23 @@ class WidgetPosition(Option):
 		self.Display.mouseReleaseEvent = self.onMouseRelease
 		self.Display.moveEvent = self.onDisplayMove
 		self.Display.resizeEvent = self.onDisplayResize
-		self.BShowDisplay.setText(self.BHIDE_DISPLAY_CAPTION)
-		self.Display.show()
 		if self.InitDisplayFunction:
 			self.InitDisplayFunction(self.Display)
+
+	def onShowDisplay(self):
+		if not self.Display:
+			self.CreateDisplay()
+		if self.Display.isVisible():
+			self.Display.hide()
+			self.BShowDisplay.setText(self.BSHOW_DISPLAY_CAPTION)
+			self.onSetEnable(True)
+			return
+		self.SetGeometry(self.Display)
+		self.onSetEnable(False)
+		self.BShowDisplay.setText(self.BHIDE_DISPLAY_CAPTION)
 		if self.StylesFileName:
 			self.UpdateStyles(self.StylesFileName)
+		self.Display.show()
 
 	def ShowOption(self, Grid: QGridLayout):
 		self.Grid = Grid
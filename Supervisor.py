@@ -0,0 +1,271 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+import sys
+import os
+import csv
+import math
+import time
+import signal
+import datetime
+import subprocess
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List
+from lib import LoadJSON
+from Control import ControlRequest, DEFAULT_CONTROL_ADDRESS, CONTROL_STATUS, CONTROL_IDLE
+
+
+path, _ = os.path.split(os.path.abspath(__file__))
+
+METRIC_RSS = 'RSS'
+METRIC_FDS = 'FDs'
+METRIC_THREADS = 'Threads'
+METRIC_CPU = 'CPU'
+# метрики, которые со временем должны выходить на плато; рост - признак утечки
+TREND_METRICS = [METRIC_RSS, METRIC_FDS, METRIC_THREADS]
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+
+
+@dataclass
+class ProcessSample():
+	Time: float
+	# RSS в МБ, CPU - загрузка в процентах одного ядра с прошлого замера
+	RSS: float
+	FDs: int
+	Threads: int
+	CPU: float = 0
+
+
+#время CPU процесса в секундах и замер из /proc
+def ReadCPUTime(PID: int) -> float:
+	with open('/proc/%d/stat' % PID, 'r') as fp:
+		Fields = fp.read().rpartition(')')[2].split()
+	return (int(Fields[11]) + int(Fields[12])) / CLOCK_TICKS
+
+
+def ReadSample(PID: int) -> ProcessSample:
+	with open('/proc/%d/statm' % PID, 'r') as fp:
+		RSS = int(fp.read().split()[1]) * PAGE_SIZE / 1024 / 1024
+	with open('/proc/%d/status' % PID, 'r') as fp:
+		Threads = next(int(Line.split()[1]) for Line in fp if Line.startswith('Threads:'))
+	return ProcessSample(Time=time.monotonic(), RSS=RSS, FDs=len(os.listdir('/proc/%d/fd' % PID)), Threads=Threads)
+
+
+#тест Манна-Кендалла: Z > 2.33 - устойчивый рост с уровнем значимости 1%, устойчив к выбросам и не требует линейности
+def MannKendall(Values: List[float]) -> float:
+	n = len(Values)
+	S = 0
+	for i in range(n - 1):
+		for j in range(i + 1, n):
+			S += (Values[j] > Values[i]) - (Values[j] < Values[i])
+	Ties: Dict[float, int] = {}
+	for Value in Values:
+		Ties[Value] = Ties.get(Value, 0) + 1
+	Variance = (n * (n - 1) * (2 * n + 5) - sum(t * (t - 1) * (2 * t + 5) for t in Ties.values())) / 18
+	if Variance <= 0:
+		return 0
+	return (S - 1) / math.sqrt(Variance) if S > 0 else (S + 1) / math.sqrt(Variance) if S < 0 else 0
+
+
+#оценка Тейла-Сена: медиана наклонов по всем парам точек, в единицах метрики за секунду
+def TheilSenSlope(Times: List[float], Values: List[float]) -> float:
+	Slopes = sorted(
+		(Values[j] - Values[i]) / (Times[j] - Times[i])
+		for i in range(len(Values) - 1) for j in range(i + 1, len(Values)) if Times[j] > Times[i]
+	)
+	return Slopes[len(Slopes) // 2] if Slopes else 0
+
+
+class ManagedProcess():
+
+	STOP_TIMEOUT = 15
+
+	def __init__(self, Name: str, Args: List[str], Budgets: Dict[str, float], Window: int):
+		self.Name = Name
+		self.Args = Args
+		self.Budgets = Budgets
+		self.Samples: Deque[ProcessSample] = deque(maxlen=Window)
+		self.Process: subprocess.Popen = None
+		self.LastCPU = 0
+		self.Restarts = 0
+		# причина, по которой процесс ждёт спокойного момента для перезапуска
+		self.Pending = ''
+
+	def Start(self):
+		self.Process = subprocess.Popen([sys.executable] + self.Args, cwd=path)
+		self.Samples.clear()
+		self.LastCPU = 0
+		self.Pending = ''
+
+	#SIGTERM даёт процессу завершиться штатно; зависший процесс снимается через STOP_TIMEOUT секунд
+	def Stop(self):
+		if not self.IsRunning():
+			return
+		self.Process.terminate()
+		try:
+			self.Process.wait(self.STOP_TIMEOUT)
+		except subprocess.TimeoutExpired:
+			self.Process.kill()
+			self.Process.wait()
+
+	def Restart(self):
+		self.Stop()
+		self.Restarts += 1
+		self.Start()
+
+	def IsRunning(self) -> bool:
+		return self.Process is not None and self.Process.poll() is None
+
+	def Sample(self) -> ProcessSample:
+		Sample = ReadSample(self.Process.pid)
+		CPU = ReadCPUTime(self.Process.pid)
+		if self.Samples:
+			Sample.CPU = (CPU - self.LastCPU) / max(Sample.Time - self.Samples[-1].Time, 1e-6) * 100
+		self.LastCPU = CPU
+		self.Samples.append(Sample)
+		return Sample
+
+	#превышение бюджета сейчас или, при устойчивом росте, в пределах горизонта прогноза
+	def Check(self, MinSamples: int, TrendZ: float, Horizon: float) -> str:
+		if not self.Samples:
+			return ''
+		Last = self.Samples[-1]
+		for Metric in TREND_METRICS:
+			Budget = self.Budgets.get(Metric)
+			if not Budget:
+				continue
+			Value = getattr(Last, Metric)
+			if Value > Budget:
+				return '%s: %g больше бюджета %g' % (Metric, Value, Budget)
+			if len(self.Samples) < MinSamples:
+				continue
+			Values = [getattr(Sample, Metric) for Sample in self.Samples]
+			if MannKendall(Values) < TrendZ:
+				continue
+			Slope = TheilSenSlope([Sample.Time for Sample in self.Samples], Values)
+			if Slope > 0 and Value + Slope * Horizon > Budget:
+				return '%s: рост %.3g в час, бюджет %g будет превышен' % (Metric, Slope * 3600, Budget)
+		Budget = self.Budgets.get(METRIC_CPU)
+		if Budget and len(self.Samples) >= MinSamples:
+			CPU = sum(Sample.CPU for Sample in self.Samples) / len(self.Samples)
+			if CPU > Budget:
+				return '%s: в среднем %.0f%% больше бюджета %g%%' % (METRIC_CPU, CPU, Budget)
+		return ''
+
+
+#запускает табло и медиаплеер, следит за их ресурсами и перезапускает штатно:
+#упавший процесс - сразу, а при превышении бюджета или устойчивом росте - когда нет налива топлива
+class Supervisor():
+
+	SETTINGS_FILE_NAME = os.path.join(path, 'Supervisor.json')
+	HISTORY_FILE_NAME = os.path.join(path, 'SupervisorHistory.csv')
+	DISPLAY_SETTINGS_FILE_NAME = os.path.join(path, 'GasStationDisplay.json')
+	SETTINGS_PERIOD = 'Period'
+	SETTINGS_WINDOW = 'Window'
+	SETTINGS_MIN_SAMPLES = 'MinSamples'
+	SETTINGS_TREND_Z = 'TrendZ'
+	SETTINGS_HORIZON = 'HorizonHours'
+	SETTINGS_QUIET = 'QuietSeconds'
+	SETTINGS_HISTORY_SIZE = 'HistoryMB'
+	SETTINGS_BUDGETS = 'Budgets'
+	NAME_DISPLAY = 'Display'
+	NAME_MEDIA_PLAYER = 'MediaPlayer'
+	DEFAULT_SETTINGS = {
+		SETTINGS_PERIOD: 10,
+		SETTINGS_WINDOW: 360,
+		SETTINGS_MIN_SAMPLES: 30,
+		SETTINGS_TREND_Z: 2.33,
+		SETTINGS_HORIZON: 24,
+		SETTINGS_QUIET: 60,
+		SETTINGS_HISTORY_SIZE: 16,
+		SETTINGS_BUDGETS: {
+			NAME_DISPLAY: {METRIC_RSS: 300, METRIC_FDS: 256, METRIC_THREADS: 32, METRIC_CPU: 50},
+			NAME_MEDIA_PLAYER: {METRIC_RSS: 1024, METRIC_FDS: 512, METRIC_THREADS: 96, METRIC_CPU: 150}
+		}
+	}
+	HISTORY_FIELDS = ['Time', 'Name', 'PID', METRIC_RSS, METRIC_FDS, METRIC_THREADS, METRIC_CPU, 'Event']
+
+	def __init__(self):
+		self.Settings = dict(self.DEFAULT_SETTINGS)
+		self.Settings.update(LoadJSON(self.SETTINGS_FILE_NAME))
+		Budgets = self.Settings[self.SETTINGS_BUDGETS]
+		Window = self.Settings[self.SETTINGS_WINDOW]
+		self.Processes = [
+			ManagedProcess(self.NAME_DISPLAY, [os.path.join(path, 'Display.py'), 'run'], Budgets.get(self.NAME_DISPLAY, {}), Window),
+			ManagedProcess(self.NAME_MEDIA_PLAYER, [os.path.join(path, 'MediaPlayer.py'), 'run'], Budgets.get(self.NAME_MEDIA_PLAYER, {}), Window)
+		]
+		self.ControlAddress = LoadJSON(self.DISPLAY_SETTINGS_FILE_NAME).get('ControlAddress', DEFAULT_CONTROL_ADDRESS)
+		self.Terminate = False
+
+	def WriteHistory(self, Process: ManagedProcess, Sample: ProcessSample = None, Event: str = ''):
+		try:
+			if os.path.isfile(self.HISTORY_FILE_NAME) and \
+					os.path.getsize(self.HISTORY_FILE_NAME) > self.Settings[self.SETTINGS_HISTORY_SIZE] * 1024 * 1024:
+				os.replace(self.HISTORY_FILE_NAME, self.HISTORY_FILE_NAME + '.1')
+			New = not os.path.isfile(self.HISTORY_FILE_NAME)
+			with open(self.HISTORY_FILE_NAME, 'a', newline='') as fp:
+				Writer = csv.writer(fp)
+				if New:
+					Writer.writerow(self.HISTORY_FIELDS)
+				Writer.writerow([
+					datetime.datetime.now().isoformat(timespec='seconds'), Process.Name,
+					Process.Process.pid if Process.Process else '',
+					'%.1f' % Sample.RSS if Sample else '', Sample.FDs if Sample else '',
+					Sample.Threads if Sample else '', '%.1f' % Sample.CPU if Sample else '', Event
+				])
+		except OSError as err:
+			print(err)
+
+	#спокойный момент - показания табло не менялись QuietSeconds; табло, которое не отвечает, налив не показывает
+	def IsQuiet(self) -> bool:
+		Status = ControlRequest(self.ControlAddress, {CONTROL_STATUS: True})
+		if not Status or CONTROL_IDLE not in Status:
+			return True
+		return Status[CONTROL_IDLE] >= self.Settings[self.SETTINGS_QUIET]
+
+	def Check(self, Process: ManagedProcess):
+		if not Process.IsRunning():
+			if Process.Process:
+				self.WriteHistory(Process, Event='exit %s' % Process.Process.returncode)
+			Process.Start()
+			self.WriteHistory(Process, Event='start')
+			return
+		try:
+			Sample = Process.Sample()
+		except (OSError, StopIteration, ValueError, IndexError) as err:
+			print(err)
+			return
+		self.WriteHistory(Process, Sample)
+		if not Process.Pending:
+			Process.Pending = Process.Check(
+				self.Settings[self.SETTINGS_MIN_SAMPLES],
+				self.Settings[self.SETTINGS_TREND_Z],
+				self.Settings[self.SETTINGS_HORIZON] * 3600
+			)
+			if Process.Pending:
+				print('%s: %s' % (Process.Name, Process.Pending))
+		if Process.Pending and self.IsQuiet():
+			self.WriteHistory(Process, Event='restart: %s' % Process.Pending)
+			Process.Restart()
+
+	def onTerminate(self, signum, frame):
+		self.Terminate = True
+
+	def Run(self):
+		signal.signal(signal.SIGTERM, self.onTerminate)
+		signal.signal(signal.SIGINT, self.onTerminate)
+		while not self.Terminate:
+			for Process in self.Processes:
+				self.Check(Process)
+			Deadline = time.monotonic() + self.Settings[self.SETTINGS_PERIOD]
+			while not self.Terminate and time.monotonic() < Deadline:
+				time.sleep(0.2)
+		for Process in self.Processes:
+			Process.Stop()
+			self.WriteHistory(Process, Event='stop')
+
+
+if __name__ == '__main__':
+	Supervisor().Run()
@@ -0,0 +1,107 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+import time
+from collections import deque
+from threading import Lock
+from typing import List, Dict
+
+
+class FrameTrace():
+
+	STAGE_READ = 0
+	STAGE_FRAMED = 1
+	STAGE_PARSED = 2
+	STAGE_STATE = 3
+	STAGE_DISPATCH = 4
+	STAGE_PAINT = 5
+	STAGE_NAMES = ['Read', 'Framed', 'Parsed', 'State', 'Dispatch', 'Paint']
+
+	__slots__ = ['Times']
+
+	def __init__(self, ReadTime: int = 0, FrameTime: int = 0):
+		self.Times = [ReadTime, FrameTime, 0, 0, 0, 0]
+
+	def Mark(self, Stage: int):
+		self.Times[Stage] = time.monotonic_ns()
+
+
+class LatencyHistogram():
+
+	# корзины по степеням двойки в микросекундах: 1 мкс .. ~35 минут
+	BUCKETS = 32
+
+	def __init__(self):
+		self.Buckets = [0] * self.BUCKETS
+		self.Count = 0
+		self.Sum = 0
+		self.Max = 0
+
+	def Add(self, Nanoseconds: int):
+		Microseconds = max(Nanoseconds // 1000, 0)
+		self.Buckets[min(Microseconds.bit_length(), self.BUCKETS - 1)] += 1
+		self.Count += 1
+		self.Sum += Microseconds
+		self.Max = max(self.Max, Microseconds)
+
+	def Percentile(self, Percent: float) -> int:
+		if not self.Count:
+			return 0
+		Limit = self.Count * Percent / 100
+		Total = 0
+		for Index, Count in enumerate(self.Buckets):
+			Total += Count
+			if Total >= Limit:
+				return min((1 << Index) - 1 if Index else 0, self.Max)
+		return self.Max
+
+	def Mean(self) -> float:
+		return self.Sum / self.Count if self.Count else 0
+
+
+class TraceRecorder():
+
+	TRACES_SIZE = 1024
+	TOTAL = 'Total'
+	DUMP_HEADER = '%-10s %8s %10s %10s %10s %10s %10s'
+	DUMP_LINE = '%-10s %8d %10.0f %10d %10d %10d %10d'
+
+	def __init__(self, Size: int = TRACES_SIZE):
+		self.Lock = Lock()
+		self.Traces = deque(maxlen=Size)
+		self.Dropped = 0
+		self.Histograms: Dict[str, LatencyHistogram] = {
+			Name: LatencyHistogram() for Name in FrameTrace.STAGE_NAMES[1:] + [self.TOTAL]
+		}
+
+	# вызывается и из потока чтения, и из потока Qt
+	def Drop(self, Trace: FrameTrace):
+		with self.Lock:
+			self.Dropped += 1
+
+	def Commit(self, Trace: FrameTrace):
+		with self.Lock:
+			self.Traces.append(Trace.Times)
+			Previous = Trace.Times[0]
+			for Stage in range(1, len(Trace.Times)):
+				if not Trace.Times[Stage]:
+					continue
+				if Previous:
+					self.Histograms[FrameTrace.STAGE_NAMES[Stage]].Add(Trace.Times[Stage] - Previous)
+				Previous = Trace.Times[Stage]
+			if Trace.Times[0] and Previous:
+				self.Histograms[self.TOTAL].Add(Previous - Trace.Times[0])
+
+	def GetTraces(self) -> List[List[int]]:
+		with self.Lock:
+			return list(self.Traces)
+
+	def Dump(self) -> str:
+		with self.Lock:
+			Lines = [self.DUMP_HEADER % ('Stage, us', 'Count', 'Mean', 'p50', 'p90', 'p99', 'Max')]
+			for Name, Histogram in self.Histograms.items():
+				Lines.append(self.DUMP_LINE % (
+					Name, Histogram.Count, Histogram.Mean(), Histogram.Percentile(50),
+					Histogram.Percentile(90), Histogram.Percentile(99), Histogram.Max
+				))
+			Lines.append('Traces: %d, superseded before paint: %d' % (len(self.Traces), self.Dropped))
+		return '\n'.join(Lines)